@@ -0,0 +1,20 @@
+"""
+Бенчмарки: python -m bench.micro --help
+
+Ни один бенчмарк не трогает data/market_pulse.db: модули db.* создают
+таблицы при импорте, поэтому ещё до первого из них MARKET_PULSE_DB
+переводится на временный файл. Дочерние процессы (воркеры, серверы)
+наследуют тот же файл через BENCH_SCRATCH_DB; удаляет его родитель.
+Свои БД бенчмарки подставляют поверх (database.DB_PATH).
+"""
+
+import atexit
+import os
+import shutil
+import tempfile
+
+if "BENCH_SCRATCH_DB" not in os.environ:
+    _scratch = tempfile.mkdtemp(prefix="bench-db-")
+    os.environ["BENCH_SCRATCH_DB"] = os.path.join(_scratch, "scratch.db")
+    atexit.register(shutil.rmtree, _scratch, ignore_errors=True)
+os.environ["MARKET_PULSE_DB"] = os.environ["BENCH_SCRATCH_DB"]
@@ -0,0 +1,205 @@
+"""
+JSON API (core/api.py): запросов в секунду под конкурентной нагрузкой.
+
+    python -m bench.api run --digests 200 --concurrency 32 --requests 3000
+    python -m bench.api serve --db /tmp/x.db --port 8090     # сервер отдельно
+
+Архив из --digests синтетических дайджестов (bench/corpus.py) пишется во
+временную БД (и всё, что db.* создают при импорте, — тоже во временный
+файл, bench/__init__.py; data/ не трогается), сервер поднимается
+отдельным процессом, клиент на aiohttp
+держит --concurrency запросов в полёте по смеси URL (последний дайджест,
+список, дайджест целиком, секция, архивные выборки с курсором):
+
+    plain     — без сжатия и ETag
+    gzip      — Accept-Encoding: gzip (готовое сжатое тело)
+    304       — If-None-Match с ETag прошлого ответа
+    uncached  — gzip, но сервер с api.cache_entries = 0 (каждый ответ из БД)
+"""
+
+import argparse
+import asyncio
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+import aiohttp
+
+import db.archive as archive
+import db.database as database
+from bench import corpus
+from bench.store import free_port
+from core.api import ApiServer
+from core.config import Api
+from filters.tagger import TopicMatcher
+
+SCENARIOS = ("plain", "gzip", "304", "uncached")
+TOPICS = TopicMatcher(corpus.TOPICS)
+
+
+def build_archive(path: Path, digests: int, seed: int):
+    database.DB_PATH = path
+    database.init_db()
+    archive.init_archive_tables()
+    rng = random.Random(seed)
+    articles = corpus.make_articles(digests * 20, seed)
+    for a in articles:
+        a.tags = TOPICS.find(f"{a.title} {a.summary}".lower())
+    rounds = corpus.make_rounds(digests * 10, seed)
+    vip = [a for a in articles if a.source_type == "vip"]
+    protocols = [a for a in articles if a.source_type == "protocol"]
+    regular = [a for a in articles if a.source_type not in ("vip", "protocol")]
+    trending = [{"key": t, "count": rng.randint(3, 20), "mean": 2.5, "z": 3.1} for t in corpus.TOPICS[:3]]
+    for i in range(digests):
+        sections = {
+            "fundraising": rounds[i * 10:(i + 1) * 10],
+            "research": rng.sample(vip, 3),
+            "protocols": rng.sample(protocols, 3),
+            "news": regular[i * 10:(i + 1) * 10],
+        }
+        archive.archive_digest(f"bench-{i}", corpus.EPOCH + timedelta(hours=12 * i), "en", sections,
+                               ["-100123"], trending)
+
+
+def serve(db: Path, port: int, cache_entries: int):
+    database.DB_PATH = db
+    asyncio.run(ApiServer(Api(port=port, cache_entries=cache_entries)).run())
+
+
+def start_server(db: Path, port: int, cache_entries: int) -> subprocess.Popen:
+    proc = subprocess.Popen([sys.executable, "-m", "bench.api", "serve", "--db", str(db), "--port", str(port),
+                             "--cache-entries", str(cache_entries)], stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"API server did not start on port {port}")
+
+
+async def url_mix(session: aiohttp.ClientSession, base: str, digests: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    urls = ["/api/digests/latest", "/api/digests?limit=20", "/api/items?section=news&limit=50",
+            f"/api/items?topic={corpus.TOPICS[0]}&limit=50"]
+    urls += [f"/api/digests/{rng.randint(1, digests)}" for _ in range(20)]
+    urls += [f"/api/digests/{rng.randint(1, digests)}/{rng.choice(archive.SECTIONS)}" for _ in range(20)]
+    # Вторые страницы архивных выборок — по курсорам из первых
+    for first in ("/api/digests?limit=20", "/api/items?section=news&limit=50", "/api/items?limit=50"):
+        async with session.get(base + first) as resp:
+            cursor = (await resp.json())["next_cursor"]
+        urls.append(f"{first}&cursor={cursor}")
+    return urls
+
+
+async def load(base: str, urls: list[str], scenario: str, concurrency: int, requests: int) -> dict:
+    encoding = "identity" if scenario == "plain" else "gzip"
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, auto_decompress=False) as session:
+        etags = {}
+        for url in urls:
+            async with session.get(base + url, headers={"Accept-Encoding": encoding}) as resp:
+                await resp.read()
+                etags[url] = resp.headers["ETag"]
+
+        latencies = []
+        received = 0
+        statuses = set()
+        queue = [urls[i % len(urls)] for i in range(requests)]
+
+        async def client():
+            nonlocal received
+            while queue:
+                url = queue.pop()
+                headers = {"Accept-Encoding": encoding}
+                if scenario == "304":
+                    headers["If-None-Match"] = etags[url]
+                started = time.perf_counter()
+                async with session.get(base + url, headers=headers) as resp:
+                    received += len(await resp.read())
+                    statuses.add(resp.status)
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*[client() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "rps": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "bytes": received / requests,
+        "statuses": sorted(statuses),
+    }
+
+
+def run(args):
+    tmp = Path(tempfile.mkdtemp(prefix="bench-api-"))
+    servers = []
+    try:
+        db = tmp / "api.db"
+        started = time.perf_counter()
+        build_archive(db, args.digests, args.seed)
+        print(f"{args.digests} digests archived in {time.perf_counter() - started:.1f}s; "
+              f"{args.requests:,} requests per scenario, {args.concurrency} in flight")
+
+        cached_port, uncached_port = free_port(), free_port()
+        servers.append(start_server(db, cached_port, 1024))
+        servers.append(start_server(db, uncached_port, 0))
+
+        async def main():
+            async with aiohttp.ClientSession() as session:
+                urls = await url_mix(session, f"http://127.0.0.1:{cached_port}", args.digests, args.seed)
+            print(f"  {'scenario':<10} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'bytes/req':>10}  statuses")
+            for scenario in args.only.split(","):
+                port = uncached_port if scenario == "uncached" else cached_port
+                result = await load(f"http://127.0.0.1:{port}", urls, scenario, args.concurrency, args.requests)
+                print(f"  {scenario:<10} {result['rps']:>9,.0f} {result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+                      f"{result['bytes']:>10,.0f}  {','.join(map(str, result['statuses']))}")
+
+        asyncio.run(main())
+    finally:
+        for proc in servers:
+            proc.terminate()
+            proc.wait()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON API throughput under concurrent load")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="Build an archive, start the server, load it")
+    run_parser.add_argument("--digests", type=int, default=200)
+    run_parser.add_argument("--concurrency", type=int, default=32)
+    run_parser.add_argument("--requests", type=int, default=3000)
+    run_parser.add_argument("--seed", type=int, default=corpus.DEFAULT_SEED)
+    run_parser.add_argument("--only", default=",".join(SCENARIOS), help="comma-separated scenarios")
+
+    serve_parser = sub.add_parser("serve", help="Serve an existing DB (used by run)")
+    serve_parser.add_argument("--db", type=Path, required=True)
+    serve_parser.add_argument("--port", type=int, default=8090)
+    serve_parser.add_argument("--cache-entries", type=int, default=1024)
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        serve(args.db, args.port, args.cache_entries)
+        return
+    unknown = set(args.only.split(",")) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
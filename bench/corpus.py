@@ -0,0 +1,223 @@
+"""
+Синтетические корпуса для бенчмарков.
+
+Все генераторы детерминированы (random.Random(seed)), так что один и тот же
+seed даёт одинаковые данные на любой машине. Длины заголовков, доля русских
+источников, UTM-хвосты в URL и т.п. подобраны под реальный поток.
+"""
+
+import random
+from datetime import datetime, timedelta
+
+from feedparser import FeedParserDict
+
+from collectors.articles import SOURCE_BONUSES, Article
+from collectors.fundraising import TOP_INVESTORS, FundraisingRound
+from collectors.twitter import Tweet
+
+DEFAULT_SEED = 42
+# Фиксированное "сейчас", чтобы корпус не зависел от даты запуска
+EPOCH = datetime(2025, 1, 15, 12, 0)
+
+EN_WORDS = (
+    "bitcoin ethereum solana stablecoin liquidity staking restaking validator rollup "
+    "bridge exploit governance proposal treasury yield vault lending borrowing oracle "
+    "airdrop token unlock market maker exchange custody regulators lawsuit approval "
+    "inflows outflows whales derivatives options futures funding protocol upgrade "
+    "mainnet testnet launch partnership integration developers users fees revenue"
+).split()
+
+RU_WORDS = (
+    "биткоин эфириум стейблкоин ликвидность стейкинг валидатор мост взлом "
+    "голосование казначейство доходность кредитование оракул аирдроп токен "
+    "разблокировка биржа хранение регулятор иск одобрение приток отток киты "
+    "деривативы опционы фьючерсы протокол обновление запуск партнёрство "
+    "разработчики пользователи комиссии выручка рынок инвесторы фонд"
+).split()
+
+TOPICS = ("DeFi", "L2", "RWA", "ETF", "Restaking", "Stablecoins", "AI", "MEV", "Bitcoin", "Solana")
+
+GENERIC = (
+    "Here's what happened in crypto today",
+    "Daily crypto news roundup",
+    "This week in crypto",
+    "Bitcoin price prediction",
+    "ETH price analysis",
+)
+
+SOURCES = tuple(SOURCE_BONUSES) + ("newsbtc", "dailyhodl", "ambcrypto", "medium/defi")
+RU_SOURCES = ("forklog", "bits_media")
+SOURCE_TYPES = ("news", "news", "news", "substack", "medium", "vip", "protocol")
+
+ROUND_VERBS = ("raises", "closes", "secures", "bags", "lands")
+ROUND_TYPES = ("Pre-Seed", "Seed", "Series A", "Series B", "Series C", "Strategic", "")
+UNITS = ("million", "M", "m", "billion", "B")
+
+TWEET_CATEGORIES = ("regulatory", "institutional", "vc", "research", "founder", "other")
+
+
+def _sentence(rng: random.Random, words, min_len: int, max_len: int, topics=()) -> str:
+    """Текст длиной в [min_len, max_len] символов, иногда с темой"""
+    target = rng.randint(min_len, max_len)
+    parts, length = [], 0
+    while length < target:
+        if topics and rng.random() < 0.08:
+            word = rng.choice(topics)
+        else:
+            word = rng.choice(words)
+        parts.append(word)
+        length += len(word) + 1
+    text = " ".join(parts)[:max_len]
+    return text[0].upper() + text[1:]
+
+
+def make_title(rng: random.Random, russian: bool = False) -> str:
+    if rng.random() < 0.03:
+        return rng.choice(GENERIC)
+    words = RU_WORDS if russian else EN_WORDS
+    # Реальные заголовки: 40–110 символов
+    return _sentence(rng, words, 40, 110, TOPICS)
+
+
+def make_url(rng: random.Random, source: str, i: int) -> str:
+    path = rng.choice(("news", "markets", "policy", "p", "post", "tech"))
+    url = f"https://{source.replace('/', '-')}.example.com/{path}/{i:08d}-story"
+    roll = rng.random()
+    if roll < 0.3:
+        url += f"?utm_source=rss&utm_medium=feed&utm_campaign={rng.randint(1, 999)}"
+    elif roll < 0.35:
+        url += f"?id={i}"
+    return url
+
+
+def make_articles(n: int, seed: int = DEFAULT_SEED, russian_share: float = 0.15) -> list[Article]:
+    rng = random.Random(seed)
+    articles = []
+    for i in range(n):
+        russian = rng.random() < russian_share
+        source = rng.choice(RU_SOURCES) if russian else rng.choice(SOURCES)
+        source_type = "russian" if russian else rng.choice(SOURCE_TYPES)
+        words = RU_WORDS if russian else EN_WORDS
+        articles.append(Article(
+            title=make_title(rng, russian),
+            author="",
+            url=make_url(rng, source, i),
+            source=source,
+            source_type=source_type,
+            published_at=EPOCH - timedelta(minutes=rng.randint(0, 24 * 60)),
+            summary=_sentence(rng, words, 80, 300, TOPICS),
+            tag_appearances=rng.choice((1, 1, 1, 2, 3)) if source.startswith("medium/") else 1,
+            is_vip=source_type in ("vip", "protocol"),
+        ))
+    return articles
+
+
+def make_listing_page(n: int, seed: int = DEFAULT_SEED) -> bytes:
+    """Страница-листинг без RSS: шапка, навигация, n карточек статей, подвал"""
+    rng = random.Random(seed)
+    nav = "".join(f'<li><a href="/section/{i}">Section {i}</a></li>' for i in range(40))
+    cards = []
+    for i in range(n):
+        published = EPOCH - timedelta(minutes=rng.randint(0, 48 * 60))
+        cards.append(
+            f'<article class="post-card grid__item"><a href="/articles/{i:06d}-story">'
+            f'<img src="/img/{i}.jpg" alt=""><h3>{make_title(rng)}</h3></a>'
+            f'<time datetime="{published.isoformat()}Z">{published:%b %d, %Y}</time>'
+            f'<p class="excerpt">{_sentence(rng, EN_WORDS, 80, 200, TOPICS)}</p>'
+            f'<ul class="tags"><li>{rng.choice(TOPICS)}</li></ul></article>'
+        )
+    return (
+        '<!DOCTYPE html><html><head><title>Research</title>'
+        + "".join(f'<script src="/js/{i}.js"></script>' for i in range(20))
+        + f'</head><body><header><nav><ul>{nav}</ul></nav></header>'
+        + f'<main><section class="listing">{"".join(cards)}</section></main>'
+        + f'<footer><ul>{nav}</ul></footer></body></html>'
+    ).encode()
+
+
+def make_feeds(n: int, seed: int = DEFAULT_SEED, per_feed: int = 30) -> list[FeedParserDict]:
+    """n записей RSS, разложенных по фидам по per_feed, как их отдаёт feedparser"""
+    rng = random.Random(seed)
+    feeds = []
+    for start in range(0, n, per_feed):
+        source = rng.choice(SOURCES)
+        entries = []
+        for i in range(start, min(start + per_feed, n)):
+            published = EPOCH - timedelta(minutes=37 * (i - start))
+            url = make_url(rng, source, i)
+            entries.append(FeedParserDict(
+                id=f"{source}-{i}",
+                title=make_title(rng),
+                link=url,
+                author=source,
+                summary=f'<p>{_sentence(rng, EN_WORDS, 80, 300, TOPICS)}</p>'
+                        f'<p><a href="{url}">Read more</a> <img src="/img/{i}.jpg"></p>',
+                published_parsed=published.timetuple(),
+            ))
+        feeds.append(FeedParserDict(entries=entries))
+    return feeds
+
+
+def make_tweets(n: int, seed: int = DEFAULT_SEED) -> list[Tweet]:
+    rng = random.Random(seed)
+    return [
+        Tweet(
+            id=str(i),
+            author=f"user{rng.randint(1, 500)}",
+            author_category=rng.choice(TWEET_CATEGORIES),
+            text=_sentence(rng, EN_WORDS, 60, 280, TOPICS),
+            url=f"https://x.com/user/status/{i}",
+            likes=int(rng.paretovariate(1.2) * 10),
+            retweets=int(rng.paretovariate(1.5) * 3),
+            replies=int(rng.paretovariate(1.5) * 2),
+            created_at=EPOCH - timedelta(minutes=rng.randint(0, 12 * 60)),
+            has_media=rng.random() < 0.3,
+        )
+        for i in range(n)
+    ]
+
+
+def make_project(rng: random.Random) -> str:
+    stem = rng.choice(EN_WORDS).capitalize()
+    return stem + rng.choice(("", " Labs", " Protocol", " Finance", "X", " Network"))
+
+
+def make_fundraising_titles(n: int, seed: int = DEFAULT_SEED) -> list[str]:
+    """Смесь: раунды с суммой, раунды без суммы, русские заголовки, обычные новости"""
+    rng = random.Random(seed)
+    titles = []
+    for _ in range(n):
+        roll = rng.random()
+        if roll < 0.5:
+            amount = round(rng.uniform(0.5, 250), 1)
+            round_type = rng.choice(ROUND_TYPES)
+            title = (f"{make_project(rng)} {rng.choice(ROUND_VERBS)} ${amount} {rng.choice(UNITS)}"
+                     f"{' in ' + round_type if round_type else ''} funding round"
+                     f" led by {rng.choice(TOP_INVESTORS)}")
+        elif roll < 0.65:
+            title = f"{rng.choice(TOP_INVESTORS)} leads {rng.choice(ROUND_TYPES) or 'seed'} round in {make_project(rng)}"
+        elif roll < 0.8:
+            title = f"{make_project(rng)} привлёк ${rng.randint(1, 100)} млн в раунде {rng.choice(('seed', 'Series A'))}"
+        else:
+            title = make_title(rng)
+        titles.append(title)
+    return titles
+
+
+def make_rounds(n: int, seed: int = DEFAULT_SEED) -> list[FundraisingRound]:
+    rng = random.Random(seed)
+    rounds = []
+    for i in range(n):
+        investors = rng.sample(TOP_INVESTORS, rng.randint(0, 3)) + [f"Fund {rng.randint(1, 300)}"]
+        rng.shuffle(investors)
+        rounds.append(FundraisingRound(
+            project=f"{make_project(rng)} {i}",
+            amount=round(rng.uniform(0.5, 250), 1) if rng.random() < 0.85 else None,
+            round_type=rng.choice(ROUND_TYPES) or "Unknown",
+            lead_investors=investors[:1],
+            other_investors=investors[1:],
+            date=EPOCH - timedelta(hours=rng.randint(0, 168)),
+            source_url=f"https://defillama.com/raises/{i}",
+            source=rng.choice(("defillama", "cryptonews_funding")),
+        ))
+    return rounds
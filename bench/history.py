@@ -0,0 +1,116 @@
+"""
+Очистка истории: DELETE по одной таблице против DROP месячной партиции.
+
+    python -m bench.history --rows 10000000 --months 12
+
+Строится история sent_articles старого вида (одна таблица, индекс по
+sent_at) на --rows строк за --months месяцев, копия переводится в
+партиции (миграция db.database — её время тоже печатается), и на обеих
+удаляется самый старый месяц:
+
+    delete   — DELETE ... WHERE sent_at < ?  (как было)
+    drop     — drop_expired_partitions()     (DROP TABLE + пересборка view)
+    vacuum   — incremental_vacuum() после drop: место возвращается ОС
+
+Размер файла до и после показывает, кто место действительно освобождает.
+Обе БД — во временном каталоге; при импорте db.database таблицы ложатся
+во временный файл бенчмарка (bench/__init__.py), не в data/.
+"""
+
+import argparse
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import db.database as database
+from bench.corpus import SOURCES
+
+BATCH = 100_000
+
+
+def build_legacy(path: Path, rows: int, months: int):
+    """Таблица как до партиций; даты равномерно за months месяцев до текущего"""
+    conn = sqlite3.connect(path)
+    conn.execute("""CREATE TABLE sent_articles (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        url TEXT UNIQUE NOT NULL,
+                        title TEXT NOT NULL,
+                        source TEXT,
+                        sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)""")
+    conn.execute("CREATE INDEX idx_articles_sent ON sent_articles(sent_at)")
+    start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    start = (start - timedelta(days=31 * (months - 1))).replace(day=1)
+    span = (datetime.utcnow() - start).total_seconds()
+    for i in range(0, rows, BATCH):
+        conn.executemany(
+            "INSERT INTO sent_articles (url, title, source, sent_at) VALUES (?, ?, ?, ?)",
+            ((f"https://example.com/{SOURCES[j % len(SOURCES)]}/{j}", f"Article {j}", SOURCES[j % len(SOURCES)],
+              (start + timedelta(seconds=span * j / rows)).strftime("%Y-%m-%d %H:%M:%S"))
+             for j in range(i, min(i + BATCH, rows)))
+        )
+        conn.commit()
+    conn.close()
+
+
+def oldest_month_cutoff(conn) -> datetime:
+    """Граница сразу после самого старого месяца"""
+    oldest = datetime.fromisoformat(conn.execute("SELECT MIN(sent_at) FROM sent_articles").fetchone()[0])
+    return (oldest.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - started, result
+
+
+def size_mb(path: Path) -> float:
+    return sum(p.stat().st_size for p in path.parent.glob(path.name + "*")) / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description="History retention: DELETE vs partition drop")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--months", type=int, default=12)
+    args = parser.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench-history-"))
+    try:
+        legacy = tmp / "legacy.db"
+        elapsed, _ = timed(build_legacy, legacy, args.rows, args.months)
+        print(f"{args.rows:,} rows over {args.months} months built in {elapsed:.1f}s, {size_mb(legacy):.0f} MB")
+
+        partitioned = tmp / "partitioned.db"
+        shutil.copy(legacy, partitioned)
+
+        conn = sqlite3.connect(legacy)
+        cutoff = oldest_month_cutoff(conn)
+        elapsed, cursor = timed(conn.execute, "DELETE FROM sent_articles WHERE sent_at < ?",
+                                (cutoff.strftime("%Y-%m-%d %H:%M:%S"),))
+        deleted = cursor.rowcount
+        commit_s, _ = timed(conn.commit)
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        conn.close()
+        print(f"  delete: {deleted:,} rows in {elapsed + commit_s:.2f}s (write lock held throughout), "
+              f"file {size_mb(legacy):.0f} MB, {free:,} pages left on the freelist")
+
+        database.DB_PATH = partitioned
+        elapsed, _ = timed(database.init_db)
+        print(f"  migration to partitions (one-time, incl. vacuum): {elapsed:.1f}s, {size_mb(partitioned):.0f} MB")
+
+        # Удаляем тот же месяц: retention «старше (сейчас − cutoff)»
+        days = (datetime.utcnow() - cutoff).days
+        elapsed, dropped = timed(database.drop_expired_partitions, days)
+        print(f"  drop: {', '.join(dropped) or 'nothing'} in {elapsed * 1000:.1f} ms")
+        elapsed, freed = timed(database.incremental_vacuum)
+        print(f"  vacuum: {freed:,} pages in {elapsed:.2f}s "
+              f"(steps of {database.VACUUM_STEP_PAGES}), file {size_mb(partitioned):.0f} MB")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
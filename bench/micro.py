@@ -0,0 +1,433 @@
+"""
+Микробенчмарки CPU-частей: ранжирование, теги, извлечение, форматирование и страницы.
+
+    python -m bench.micro run --save bench/baselines/main.json
+    python -m bench.micro run --sizes 10000,100000,1000000 --only rank_articles,tag_content
+    python -m bench.micro compare bench/baselines/main.json bench/baselines/branch.json --threshold 0.15
+    python -m bench.micro run --compare bench/baselines/main.json
+    python -m bench.micro run --profile-mem --mem-budget 200
+
+Корпуса синтетические и детерминированные (bench/corpus.py), так что
+разница между двумя JSON — это разница в коде или машине, а не в данных.
+compare завершается с кодом 1, если что-то замедлилось больше порога
+(или вырос пик памяти, если он записан в обоих прогонах).
+
+Для бенчмарков из TARGETS строка показывает ещё материалов в секунду
+против цели. rank_articles — первая встреча с пачкой (термины с нуля),
+rank_articles_warm — повторное ранжирование тех же url; пачка больше
+TERMS_CACHE_SIZE в кэш не помещается и ранжируется как холодная.
+"""
+
+import argparse
+import gc
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable
+
+from feedparser import FeedParserDict
+
+from bench import corpus
+from bot.commands import CommandCache, answer
+from bot.telegram import ALL_SECTIONS, DigestRenderer, format_digest
+from core.memprof import MB, measure_peak
+from collectors.articles import advance_cursor, clean_url, is_generic_title, parse_rss, rank_articles
+from collectors.scraper import compile_site, parse_if_changed, parse_site
+from collectors.fundraising import extract_round, score_fundraising
+from filters.ranker import rank_tweets
+from filters.relevance import TopicScorer, Vocabulary, clear_terms_cache
+from filters.tagger import TopicMatcher, tag_content
+from db.feeds import FeedCursor
+from db.trends import window_stats
+
+DEFAULT_SIZES = (10_000, 100_000)
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.10
+# Цели по пропускной способности, материалов в секунду: печатаются рядом
+# с замером (и сохраняются), на код выхода не влияют
+TARGETS = {
+    "rank_articles": 100_000,
+    "rank_articles_warm": 100_000,
+}
+
+TOPICS = TopicMatcher(corpus.TOPICS)
+
+
+@lru_cache(maxsize=None)
+def articles(n: int, seed: int):
+    return corpus.make_articles(n, seed)
+
+
+@lru_cache(maxsize=None)
+def rounds(n: int, seed: int):
+    return corpus.make_rounds(n, seed)
+
+
+# Каждый бенчмарк: (n, seed) → функция без аргументов, которая и замеряется.
+# Подготовка данных в замер не входит.
+
+def bench_rank_articles(n: int, seed: int) -> Callable:
+    """Первое ранжирование n статей: кэш терминов пуст, каждая токенизируется"""
+    items = articles(n, seed)
+
+    def rank():
+        clear_terms_cache()
+        return rank_articles(list(items), TOPICS)
+    return rank
+
+
+def bench_rank_articles_warm(n: int, seed: int) -> Callable:
+    """Повторное ранжирование тех же n статей (опрос, дайджест, чаты): термины из кэша по url"""
+    items = articles(n, seed)
+    return lambda: rank_articles(list(items), TOPICS)
+
+
+def bench_rank_tweets(n: int, seed: int) -> Callable:
+    tweets = corpus.make_tweets(n, seed)
+    return lambda: rank_tweets(list(tweets), TOPICS)
+
+
+def bench_relevance_fit(n: int, seed: int) -> Callable:
+    """Выделение терминов и дообучение словаря на n материалах"""
+    texts = [a.title + " " + a.summary for a in articles(n, seed)]
+    return lambda: TopicScorer(corpus.TOPICS).fit(texts)
+
+
+def bench_relevance_score(n: int, seed: int) -> Callable:
+    """Косинусы с темами для n уже разобранных материалов (термины готовы)"""
+    texts = [a.title + " " + a.summary for a in articles(n, seed)]
+    scorer = TopicScorer(corpus.TOPICS, Vocabulary())
+    documents = [scorer.terms(t) for t in texts]
+    scorer.vocabulary.partial_fit(documents)
+    return lambda: scorer.score_terms(documents)
+
+
+def bench_trend_windows(n: int, seed: int) -> Callable:
+    """Окна и z-score для n ключей по 8 дням часовых корзин (без SQLite)"""
+    rng = random.Random(seed)
+    now = 500_000
+    keys = [{now - h: rng.randint(1, 5) for h in range(24 * 8) if rng.random() < 0.3} for _ in range(n)]
+    return lambda: [window_stats(buckets, now, 24, 7) for buckets in keys]
+
+
+def bench_parse_rss(n: int, seed: int) -> Callable:
+    """Разбор n записей фидов целиком (как без курсора)"""
+    feeds = corpus.make_feeds(n, seed)
+    return lambda: [parse_rss(feed, "bench", "news", hours=24 * 365 * 100) for feed in feeds]
+
+
+def bench_parse_rss_cursor(n: int, seed: int) -> Callable:
+    """Те же фиды с курсорами прошлого опроса: новых по 2 записи на фид"""
+    feeds = corpus.make_feeds(n, seed)
+    cursors = [
+        advance_cursor(FeedCursor("bench"), FeedParserDict(entries=feed.entries[2:])) for feed in feeds
+    ]
+    return lambda: [
+        parse_rss(feed, "bench", "news", hours=24 * 365 * 100, cursor=cursor) for feed, cursor in zip(feeds, cursors)
+    ]
+
+
+def _listing_site(n: int):
+    return compile_site("bench", {
+        "url": "https://research.example.com/",
+        "item": "//article[re:test(@class, 'card|post')]",
+        "title": ".//h3",
+        "link": "(.//a/@href)[1]",
+        "date": ".//time/@datetime",
+        "keywords": [t.lower() for t in corpus.TOPICS],
+        "limit": n,
+        "hours": 24 * 365,
+    })
+
+
+def bench_scrape_parse(n: int, seed: int) -> Callable:
+    """Листинг на n карточек по описанию сайта из конфига (XPath по lxml)"""
+    page = corpus.make_listing_page(n, seed)
+    site = _listing_site(n)
+    return lambda: parse_site(site, page, now=corpus.EPOCH)
+
+
+def bench_scrape_unchanged(n: int, seed: int) -> Callable:
+    """Тот же листинг с другим оформлением: хеш карточек совпал, разбор полей пропущен"""
+    page = corpus.make_listing_page(n, seed)
+    site = _listing_site(n)
+    known, _ = parse_if_changed(site, page, None, now=corpus.EPOCH)
+    restyled = page.replace(b"<body>", b"<body><div class='banner'>nonce 8f3a</div>", 1)
+    return lambda: parse_if_changed(site, restyled, known, now=corpus.EPOCH)
+
+
+def bench_tag_content(n: int, seed: int) -> Callable:
+    texts = [a.title + " " + a.summary for a in articles(n, seed)]
+    return lambda: [tag_content(t, TOPICS) for t in texts]
+
+
+def bench_score_fundraising(n: int, seed: int) -> Callable:
+    items = rounds(n, seed)
+    return lambda: [score_fundraising(r) for r in items]
+
+
+def bench_is_generic_title(n: int, seed: int) -> Callable:
+    titles = [a.title for a in articles(n, seed)]
+    return lambda: [is_generic_title(t) for t in titles]
+
+
+def bench_clean_url(n: int, seed: int) -> Callable:
+    urls = [a.url for a in articles(n, seed)]
+    return lambda: [clean_url(u) for u in urls]
+
+
+def bench_extract_round(n: int, seed: int) -> Callable:
+    titles = corpus.make_fundraising_titles(n, seed)
+    return lambda: [extract_round(t) for t in titles]
+
+
+def bench_format_digest(n: int, seed: int) -> Callable:
+    items = articles(n, seed)
+    vip = [a for a in items if a.is_vip]
+    regular = [a for a in items if not a.is_vip]
+    raised = rounds(max(n // 10, 1), seed)
+    return lambda: format_digest(raised, vip, regular, priority_topics=list(TOPICS))
+
+
+def bench_render_pages(n: int, seed: int) -> Callable:
+    """Дайджест на n материалов целиком: экранирование, длины, страницы ≤ 4096"""
+    items = articles(n, seed)
+    vip = [a for a in items if a.is_vip]
+    regular = [a for a in items if not a.is_vip]
+    raised = rounds(max(n // 10, 1), seed)
+    return lambda: DigestRenderer().render(raised, vip, regular)
+
+
+def bench_render_audiences(n: int, seed: int) -> Callable:
+    """
+    n материалов на 100 аудиторий (по 20 новостей, 4 языка × секции):
+    строки материалов общие, страницы кэшируются по аудитории.
+    """
+    items = articles(n, seed)
+    regular = [a for a in items if not a.is_vip]
+    raised = rounds(max(n // 10, 1), seed)
+    sections = (ALL_SECTIONS, ("news",))
+    step = max(len(regular) // 100, 1)
+    audiences = [
+        (raised[:10], regular[i * step:i * step + 20], sections[i % 2], ("en", "ru")[i // 2 % 2])
+        for i in range(100)
+    ]
+
+    def render():
+        renderer = DigestRenderer()
+        return [renderer.render(f, [], r, sections=sec, language=lang) for f, r, sec, lang in audiences]
+    return render
+
+
+def bench_commands(n: int, seed: int) -> Callable:
+    """100 команд бота (/latest, /fundraising, /topic, /search) по кэшу из n статей и n/10 раундов"""
+    cache = CommandCache()
+    cache.add(articles(n, seed) + rounds(max(n // 10, 1), seed), TOPICS)
+    rng = random.Random(seed)
+    commands = ["/latest", f"/latest {corpus.SOURCES[0]}", "/fundraising"]
+    commands += [f"/topic {topic}" for topic in corpus.TOPICS]
+    commands += [f"/search {rng.choice(corpus.EN_WORDS)} {rng.choice(corpus.TOPICS)}" for _ in range(20)]
+    queries = [commands[i % len(commands)] for i in range(100)]
+    return lambda: [answer(cache, q) for q in queries]
+
+
+BENCHMARKS: dict[str, Callable[[int, int], Callable]] = {
+    "rank_articles": bench_rank_articles,
+    "rank_articles_warm": bench_rank_articles_warm,
+    "rank_tweets": bench_rank_tweets,
+    "relevance_fit": bench_relevance_fit,
+    "relevance_score": bench_relevance_score,
+    "trend_windows": bench_trend_windows,
+    "parse_rss": bench_parse_rss,
+    "parse_rss_cursor": bench_parse_rss_cursor,
+    "scrape_parse": bench_scrape_parse,
+    "scrape_unchanged": bench_scrape_unchanged,
+    "tag_content": bench_tag_content,
+    "score_fundraising": bench_score_fundraising,
+    "is_generic_title": bench_is_generic_title,
+    "clean_url": bench_clean_url,
+    "extract_round": bench_extract_round,
+    "format_digest": bench_format_digest,
+    "render_pages": bench_render_pages,
+    "render_audiences": bench_render_audiences,
+    "commands": bench_commands,
+}
+
+
+def measure(func: Callable, repeat: int) -> list[float]:
+    func()  # прогрев
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return times
+
+
+def git_revision() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or "unknown"
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+def run(names: list[str], sizes: list[int], seed: int, repeat: int, profile_mem: bool = False) -> dict:
+    results = {}
+    for name in names:
+        results[name] = {}
+        for n in sizes:
+            func = BENCHMARKS[name](n, seed)
+            times = measure(func, repeat)
+            median = statistics.median(times)
+            stats = {
+                "min_s": min(times),
+                "median_s": median,
+                "per_item_ns": median / n * 1e9,
+            }
+            line = f"  {name:<18} n={n:<9} median {median * 1000:9.2f} ms  ({median / n * 1e9:8.1f} ns/item)"
+            if name in TARGETS:
+                stats["per_second"] = n / median
+                line += f"  {n / median:9,.0f}/s of {TARGETS[name]:,}/s"
+                if n / median < TARGETS[name]:
+                    line += " (below target)"
+            if profile_mem:
+                # Отдельный вызов: tracemalloc замедляет код в разы, время меряем без него
+                _, stats["peak_bytes"] = measure_peak(func)
+                line += f"  peak {stats['peak_bytes'] / MB:8.1f} MB"
+            results[name][str(n)] = stats
+            print(line)
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "git": git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "seed": seed,
+            "repeat": repeat,
+            "profile_mem": profile_mem,
+        },
+        "results": results,
+    }
+
+
+def compare(base: dict, new: dict) -> list[tuple]:
+    """
+    Строки (имя, n, base_s, new_s, ratio, mem_ratio) для общих бенчмарков.
+    mem_ratio — None, если в одном из прогонов память не мерили.
+    """
+    rows = []
+    for name, by_size in new["results"].items():
+        for n, stats in by_size.items():
+            old = base["results"].get(name, {}).get(n)
+            if old is None:
+                continue
+            mem_ratio = None
+            if old.get("peak_bytes") and stats.get("peak_bytes"):
+                mem_ratio = stats["peak_bytes"] / old["peak_bytes"]
+            rows.append((name, n, old["median_s"], stats["median_s"],
+                         stats["median_s"] / old["median_s"], mem_ratio))
+    return rows
+
+
+def print_comparison(rows: list[tuple], threshold: float) -> bool:
+    """Печатает таблицу, возвращает True если есть регрессии (время или пик памяти)"""
+    regressions = False
+    print(f"\n{'benchmark':<18} {'n':>9} {'base ms':>10} {'new ms':>10} {'ratio':>7} {'mem':>6}")
+    for name, n, base_s, new_s, ratio, mem_ratio in rows:
+        marks = []
+        if ratio > 1 + threshold:
+            marks.append("SLOWER")
+            regressions = True
+        elif ratio < 1 - threshold:
+            marks.append("faster")
+        if mem_ratio is not None and mem_ratio > 1 + threshold:
+            marks.append("MORE MEMORY")
+            regressions = True
+        mem = f"{mem_ratio:6.2f}" if mem_ratio is not None else f"{'-':>6}"
+        print(f"{name:<18} {n:>9} {base_s * 1000:10.2f} {new_s * 1000:10.2f} {ratio:7.2f} {mem}"
+              + ("  " + ", ".join(marks) if marks else ""))
+    if not rows:
+        print("  (no common benchmarks)")
+    return regressions
+
+
+def load(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save(data: dict, path: str):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    print(f"Saved {path}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Market Pulse microbenchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="Run benchmarks")
+    run_parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                            help="Comma-separated corpus sizes (default %(default)s)")
+    run_parser.add_argument("--only", help="Comma-separated benchmark names")
+    run_parser.add_argument("--seed", type=int, default=corpus.DEFAULT_SEED)
+    run_parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    run_parser.add_argument("--save", metavar="PATH", help="Save results as a JSON baseline")
+    run_parser.add_argument("--compare", metavar="BASELINE", help="Compare against a saved baseline")
+    run_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    run_parser.add_argument("--profile-mem", action="store_true", help="Also record peak traced memory")
+    run_parser.add_argument("--mem-budget", type=float, metavar="MB",
+                            help="Fail if any benchmark peaks above MB (implies --profile-mem)")
+
+    cmp_parser = sub.add_parser("compare", help="Compare two saved results")
+    cmp_parser.add_argument("base")
+    cmp_parser.add_argument("new")
+    cmp_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                            help="Allowed slowdown ratio (default %(default)s = 10%%)")
+
+    sub.add_parser("list", help="List benchmarks")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        print("\n".join(BENCHMARKS))
+        return 0
+
+    if args.command == "compare":
+        regressions = print_comparison(compare(load(args.base), load(args.new)), args.threshold)
+        return 1 if regressions else 0
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    print(f"Running {len(names)} benchmarks, sizes {sizes}, seed {args.seed}, repeat {args.repeat}")
+    data = run(names, sizes, args.seed, args.repeat, profile_mem=args.profile_mem or args.mem_budget is not None)
+    if args.save:
+        save(data, args.save)
+
+    failed = False
+    if args.mem_budget is not None:
+        over = [(name, n, stats["peak_bytes"]) for name, by_size in data["results"].items()
+                for n, stats in by_size.items() if stats["peak_bytes"] > args.mem_budget * MB]
+        for name, n, peak in over:
+            print(f"  Memory budget exceeded: {name} n={n} peak {peak / MB:.1f} MB > {args.mem_budget:g} MB")
+        failed = bool(over)
+    if args.compare:
+        failed = print_comparison(compare(load(args.compare), data), args.threshold) or failed
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
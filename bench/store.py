@@ -0,0 +1,201 @@
+"""
+Бэкенды хранилища состояния (db/store.py): запись и поиск в истории.
+
+    python -m bench.store --rows 20000 --batch 50 --single 2000
+    python -m bench.store --only sqlite,memory
+
+На каждом бэкенде:
+
+    insert   — mark_articles_sent пачками по --batch (как отметка после доставки)
+    lookup   — sent_article_urls пачками по --batch, половина URL новые
+    single   — sent_article_urls по одному URL (--single штук)
+    cursor   — save_cursor + load_cursor фида на 100 GUID
+
+sqlite — временная БД, kv — scripts/local_kv_server.py в отдельном
+процессе на свободном порту (то есть с HTTP на loopback, но без сети).
+Таблицы, которые db.* создают при импорте, ложатся во временный файл
+бенчмарка (bench/__init__.py), а не в data/.
+
+С kv в конце — проверка реплик: две «реплики» (свои SQLite, общий kv)
+по очереди готовят дайджест одному чату; вторая не должна слать то,
+что уже доставила первая.
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import db.audience as audience
+import db.database as database
+import db.feeds as feeds
+import db.outbox as outbox
+import db.pending as pending
+import db.stats as stats
+from bench import corpus
+from bench.corpus import SOURCES
+from bot.telegram import RenderedDigest
+from core.audience import Candidates
+from core.config import Delivery, get_config
+from core.delivery import DeliveryWorkers
+from core.digest import sent_state
+from db.aio import async_db
+from db.feeds import CURSOR_GUIDS, FeedCursor
+from db.store import KVStore, MemoryStore, SqliteStore, set_store
+
+BACKENDS = ("sqlite", "memory", "kv")
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_kv_server(port: int) -> subprocess.Popen:
+    proc = subprocess.Popen([sys.executable, str(ROOT / "scripts" / "local_kv_server.py"), "--port", str(port)],
+                            stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"kv server did not start on port {port}")
+
+
+def open_backend(name: str, tmp: Path, kv_url: str):
+    if name == "sqlite":
+        database.DB_PATH = tmp / "store.db"
+        database.init_db()
+        feeds.init_feed_tables()
+        stats.init_stats_tables()    # триггеры агрегатов на партициях — как в боте
+        return SqliteStore()
+    if name == "memory":
+        return MemoryStore()
+    return KVStore(kv_url)
+
+
+def timed(func) -> float:
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+
+def run(store, rows: int, batch: int, single: int) -> dict[str, float]:
+    """ops/s по каждой нагрузке"""
+    sent = [(f"https://example.com/{SOURCES[i % len(SOURCES)]}/{i}", f"Article {i}", SOURCES[i % len(SOURCES)])
+            for i in range(rows)]
+    # Половина кандидатов уже отправлена, половина — новые
+    candidates = [url for url, _, _ in sent[::2]] + [f"https://example.com/new/{i}" for i in range(rows // 2)]
+
+    def chunks(items):
+        return [items[i:i + batch] for i in range(0, len(items), batch)]
+
+    def insert():
+        for chunk in chunks(sent):
+            store.mark_articles_sent(chunk)
+
+    def lookup():
+        found = 0
+        for chunk in chunks(candidates):
+            found += len(store.sent_article_urls(chunk))
+        assert found == rows // 2 + rows % 2, found
+
+    def lookup_single():
+        for url in candidates[:single]:
+            store.sent_article_urls([url])
+
+    cursor = FeedCursor("bench", tuple(f"guid-{i}" for i in range(CURSOR_GUIDS)), datetime.utcnow())
+
+    def cursor_roundtrip():
+        for _ in range(single):
+            store.save_cursor(cursor)
+            store.load_cursor(cursor.source)
+
+    return {
+        "insert": rows / timed(insert),
+        "lookup": len(candidates) / timed(lookup),
+        "single": single / timed(lookup_single),
+        "cursor": single / timed(cursor_roundtrip),
+    }
+
+
+def check_replicas(kv_url: str, tmp: Path, articles: int = 200) -> tuple[int, int]:
+    """(сколько доставленного первой репликой вторая сочла отправленным, сколько доставлено)"""
+    chat = dataclasses.replace(get_config().default_profile, chat_id="-100replicas")
+    batch = corpus.make_articles(articles, corpus.DEFAULT_SEED)
+    candidates = Candidates([], [], batch, [0.0] * len(batch), [{}] * len(batch))
+
+    async def no_telegram(*_):
+        pass
+
+    seen = []
+    for replica in ("a", "b"):
+        # Своя SQLite у каждой реплики; потоки AsyncDB держат соединение — перезапуск
+        async_db.close()
+        database.DB_PATH = tmp / f"replica-{replica}.db"
+        for init in (database.init_db, audience.init_audience_tables, outbox.init_outbox_tables,
+                     pending.init_pending_tables, stats.init_stats_tables):
+            init()
+        set_store(KVStore(kv_url))
+
+        sent, _ = sent_state([chat], candidates)[chat.chat_id]
+        seen.append(sent)
+        fresh = [a for a in batch if a.url not in sent]
+        items = {"articles": [{"url": a.url, "title": a.title, "source": a.source} for a in fresh], "rounds": []}
+        outbox.enqueue_digests(f"replica-{replica}", [(RenderedDigest("", [""]), items, [chat.chat_id])])
+        asyncio.run(DeliveryWorkers("", Delivery(), send=no_telegram).drain(f"replica-{replica}"))
+    async_db.close()
+    return len(seen[1]), len(batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="State store backends: insert and lookup throughput")
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--batch", type=int, default=50)
+    parser.add_argument("--single", type=int, default=2_000)
+    parser.add_argument("--only", default=",".join(BACKENDS), help="comma-separated backends")
+    args = parser.parse_args()
+    backends = [name for name in args.only.split(",") if name]
+    unknown = set(backends) - set(BACKENDS)
+    if unknown:
+        parser.error(f"unknown backend(s): {', '.join(sorted(unknown))}")
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench-store-"))
+    server = None
+    try:
+        kv_url = ""
+        if "kv" in backends:
+            port = free_port()
+            server = start_kv_server(port)
+            kv_url = f"http://127.0.0.1:{port}"
+
+        print(f"{args.rows:,} rows, batches of {args.batch}, {args.single:,} single lookups / cursor round trips")
+        print(f"  {'backend':<8} {'insert/s':>12} {'lookup/s':>12} {'single/s':>12} {'cursor/s':>12}")
+        for name in backends:
+            result = run(open_backend(name, tmp, kv_url), args.rows, args.batch, args.single)
+            print(f"  {name:<8} " + " ".join(f"{result[k]:>12,.0f}" for k in ("insert", "lookup", "single", "cursor")))
+        if "kv" in backends:
+            skipped, delivered = check_replicas(kv_url, tmp)
+            print(f"  kv replicas: second run skipped {skipped}/{delivered} URLs delivered by the first")
+            assert skipped == delivered, (skipped, delivered)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Пропускная способность пула воркеров сбора (core.scheduler.LeasedScheduler).
+
+    python -m bench.workers --workers 1,2,4 --sources 200 --seconds 15
+
+Каждый прогон — N процессов над общей временной БД и синтетическими
+источниками: «сеть» — пауза --latency, дальше настоящий разбор RSS
+feedparser'ом (CPU, под GIL) и запись в буфер. Интервал опроса меньше,
+чем пул успевает, так что очередь всегда полна и считается чистая
+пропускная способность: опросов в секунду и ускорение к одному воркеру.
+
+БД и модули db.* создаются в каждом процессе заново (таблицы
+инициализируются при импорте), поэтому здесь наверху только stdlib,
+а путь к общей БД задаётся через MARKET_PULSE_DB до импорта db.*.
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from email.utils import format_datetime
+from pathlib import Path
+
+ENTRIES = 30
+
+
+def make_feed(source: int, seed: int = 42) -> bytes:
+    """Детерминированный RSS на ENTRIES записей (новое приносит только первый опрос)"""
+    rng = random.Random(seed + source)
+    now = datetime.now().astimezone()
+    items = []
+    for i in range(ENTRIES):
+        words = " ".join(rng.choice(("DeFi", "ETF", "Bitcoin", "restaking", "vault", "launch", "update",
+                                     "protocol", "market", "liquidity")) for _ in range(8))
+        items.append(
+            f"<item><title>{words} {source}-{i}</title>"
+            f"<link>https://example.com/{source}/{i}</link>"
+            f"<description>{words} {words}</description>"
+            f"<pubDate>{format_datetime(now - timedelta(minutes=37 * i))}</pubDate></item>"
+        )
+    return (f'<?xml version="1.0"?><rss version="2.0"><channel><title>feed {source}</title>'
+            f'{"".join(items)}</channel></rss>').encode()
+
+
+def _use_db(path: Path):
+    """Общая БД пула — до первого импорта db.* в этом процессе (иначе таблицы легли бы не туда)"""
+    assert "db.database" not in sys.modules, "db.* imported before the bench DB was chosen"
+    os.environ["MARKET_PULSE_DB"] = str(path)
+
+
+def _worker(path: Path, worker_id: str, sources: int, seconds: float, latency: float, interval: float):
+    sys.stdout = open(os.devnull, "w")    # лог каждого опроса планировщика здесь не нужен
+    _use_db(path)
+    import asyncio
+    from functools import partial
+
+    import feedparser
+
+    from collectors.articles import feed_publish_times, parse_rss
+    from core.scheduler import LeasedScheduler, PollJob, PollResult
+    from db.aio import async_db
+    from db.pending import add_pending_articles
+
+    feeds = {f"bench:{i}": make_feed(i) for i in range(sources)}
+
+    async def poll(source: str, session, timeout: float) -> PollResult:
+        await asyncio.sleep(latency)
+        feed = await asyncio.to_thread(feedparser.parse, feeds[source])
+        articles = parse_rss(feed, source, "news", hours=72)
+        new = await async_db.write(add_pending_articles, "news", articles, 72)
+        return PollResult(new, feed_publish_times(feed))
+
+    def build(config):
+        return {source: PollJob(source, partial(poll, source), 10, fixed_interval=interval) for source in feeds}
+
+    async def run():
+        stop = asyncio.Event()
+        asyncio.get_running_loop().call_later(seconds, stop.set)
+        await LeasedScheduler(worker_id, build=build).run(stop)
+
+    asyncio.run(run())
+
+
+def run_pool(workers: int, sources: int, seconds: float, latency: float, interval: float) -> dict:
+    tmp = Path(tempfile.mkdtemp(prefix="bench-workers-"))
+    path = tmp / "bench.db"
+    try:
+        ctx = multiprocessing.get_context("spawn")
+        procs = [
+            ctx.Process(target=_worker, args=(path, f"bench-{i}", sources, seconds, latency, interval))
+            for i in range(workers)
+        ]
+        started = time.perf_counter()
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        elapsed = time.perf_counter() - started
+
+        conn = sqlite3.connect(path)
+        polls, stolen = conn.execute("SELECT SUM(polls), SUM(stolen) FROM collection_workers").fetchone()
+        per_worker = [n for n, in conn.execute("SELECT polls FROM collection_workers ORDER BY worker_id")]
+        conn.close()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    # Процессы стартуют не мгновенно: считаем по окну работы, а не по wall time
+    return {"workers": workers, "polls": polls or 0, "per_worker": per_worker, "stolen": stolen or 0,
+            "polls_per_s": (polls or 0) / seconds, "elapsed_s": elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Collection worker pool throughput")
+    parser.add_argument("--workers", default="1,2,4", help="Pool sizes to run, comma-separated")
+    parser.add_argument("--sources", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=15, help="How long each pool runs")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated network latency per poll, s")
+    parser.add_argument("--interval", type=float, default=1.0, help="Poll interval per source, s")
+    args = parser.parse_args()
+
+    base = None
+    # Разбор фида держит GIL: ускорение ограничено числом ядер
+    print(f"{args.sources} sources, {args.seconds:g}s per run, {args.latency * 1000:.0f} ms latency, "
+          f"{os.cpu_count()} CPU(s)")
+    for n in (int(x) for x in args.workers.split(",")):
+        result = run_pool(n, args.sources, args.seconds, args.latency, args.interval)
+        base = base or result["polls_per_s"]
+        print(f"  {n} worker(s): {result['polls_per_s']:7.1f} polls/s  x{result['polls_per_s'] / base:4.2f}  "
+              f"(per worker {result['per_worker']}, taken over {result['stolen']})")
+
+
+if __name__ == "__main__":
+    main()
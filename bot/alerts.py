@@ -0,0 +1,124 @@
+"""
+Срочные алерты между дайджестами.
+
+Планировщик отдаёт сюда новые записи сразу после опроса. Они скорятся
+той же логикой, что и дайджест (rank_articles / score_fundraising);
+всё выше порога уходит в Telegram отдельным сообщением и помечается
+отправленным, чтобы не повториться в дайджесте. Заодно новые материалы
+сразу при сборе дообучают словарь релевантности и попадают в счётчики
+трендов (db/relevance.py, db/trends.py).
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from bot.telegram import format_alert, send_alert
+from collectors.articles import Article, rank_articles
+from collectors.fundraising import FundraisingRound, score_fundraising
+from core.config import get_config
+from db.alerts import log_alert
+from db.aio import async_db
+from db.pending import KIND_ARTICLE, KIND_FUNDRAISING, fundraising_key, remove_pending
+from db.relevance import fit_new, scorer_for
+from db.store import get_store
+from db.trends import record_collected
+from filters.relevance import cached_terms
+
+
+def utc_now() -> datetime:
+    # Даты из фидов (feedparser) — naive UTC
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class AlertPipeline:
+    """Хук FeedScheduler.on_new_items: скоринг → порог → алерт"""
+
+    def __init__(self, bot_token: str = None, chat_ids: list[str] = None):
+        self.bot_token = bot_token
+        self.chat_ids = chat_ids or []
+
+    def analyze(self, items: list):
+        """Словарь релевантности и счётчики трендов — по новым материалам"""
+        articles = [i for i in items if isinstance(i, Article)]
+        rounds = [i for i in items if isinstance(i, FundraisingRound)]
+        scorer = scorer_for(get_config().priority_topics)
+        urls = [a.url for a in articles]
+        documents = cached_terms(scorer, urls, [f"{a.title} {a.summary}" for a in articles])
+        fit_new(scorer, urls, documents)
+        topics = [list(scorer.named(row)) for row in scorer.score_terms(documents)]
+        record_collected(articles, topics, rounds)
+
+    def select(self, items: list) -> list:
+        """Отобрать элементы выше порога (с уже посчитанным score)"""
+        config = get_config()
+        alerts = config.alerts
+        if not alerts.enabled:
+            return []
+
+        max_age = timedelta(hours=alerts.max_age_hours)
+        # Даты DefiLlama — с точностью до дня
+        round_max_age = max_age + timedelta(days=1)
+        now = utc_now()
+
+        articles = [i for i in items if isinstance(i, Article)]
+        rounds = [i for i in items if isinstance(i, FundraisingRound)]
+        selected = []
+
+        if articles:
+            rank_articles(
+                articles, scorer_for(config.priority_topics),
+                source_bonuses=config.source_bonuses,
+                type_bonuses=config.type_bonuses
+            )
+            hot = [a for a in articles if now - a.published_at <= max_age
+                   and (alerts.vip if a.is_vip else a.score >= alerts.article_score)]
+            sent = get_store().sent_article_urls([a.url for a in hot])
+            selected += [a for a in hot if a.url not in sent]
+
+        for r in rounds:
+            score_fundraising(r)
+        hot = [r for r in rounds if not (r.date and now - r.date > round_max_age)
+               and r.score >= alerts.fundraising_score]
+        sent = get_store().sent_fundraising_keys([(r.project, r.round_type or "unknown") for r in hot])
+        selected += [r for r in hot if (r.project.lower(), r.round_type or "unknown") not in sent]
+
+        return selected
+
+    async def deliver(self, item):
+        message = format_alert(item)
+        if not self.bot_token or not self.chat_ids:
+            print("\n--- ALERT PREVIEW ---\n")
+            print(message)
+        else:
+            for chat_id in self.chat_ids:
+                await send_alert(self.bot_token, chat_id, message)
+
+        delivered_at = utc_now()
+        if isinstance(item, FundraisingRound):
+            await async_db.mark_rounds_sent([(item.project, item.round_type or "unknown", item.amount,
+                                              item.source_url, item.source, item.lead_investors)])
+        else:
+            await async_db.mark_articles_sent([(item.url, item.title, item.source)])
+        await async_db.write(self.record_delivery, item, delivered_at)
+
+    @staticmethod
+    def record_delivery(item, delivered_at: datetime):
+        """Отправлено (в историю уже отмечено): из буфера и в журнал алертов — одна запись очереди БД"""
+        if isinstance(item, FundraisingRound):
+            kind, key, published_at = KIND_FUNDRAISING, fundraising_key(item), item.date
+        else:
+            kind, key, published_at = KIND_ARTICLE, item.url, item.published_at
+        remove_pending(kind, [key])
+
+        latency_s = (delivered_at - published_at).total_seconds() if published_at else None
+        log_alert(kind, key, item.source, item.score, published_at, delivered_at, latency_s)
+        latency = f"{latency_s / 60:.1f} min after publish" if latency_s is not None else "unknown latency"
+        print(f"  ⚡ Alert sent: {key} (score {item.score:.0f}, {latency})")
+
+    async def on_new_items(self, source: str, items: list):
+        # Запись и отбор — в потоках БД, цикл тем временем опрашивает фиды
+        await async_db.write(self.analyze, items)
+        for item in await async_db.read(self.select, items):
+            try:
+                await self.deliver(item)
+            except Exception as e:
+                print(f"  Alert delivery failed for {source}: {e}")
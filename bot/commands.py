@@ -0,0 +1,295 @@
+"""
+Команды бота между дайджестами: /latest, /fundraising, /topic, /search.
+
+Ответ собирается из кэша в памяти (CommandCache), а не из нового сбора:
+туда сразу попадает всё, что приносят опросы планировщика и WebSub (тот
+же хук on_new_items, что у алертов), а раз в commands.refresh_seconds —
+новое из буфера db.pending (материалы воркеров --worker). Индексы — по
+источнику, теме (topic_matcher из topics.json) и словам заголовка и
+описания плюс лента (published_at, url) от новых к старым: небольшое
+пересечение множеств сортируется heapq.nlargest, большое — первые n
+находятся проходом по ленте. Единицы миллисекунд и на сотне тысяч
+материалов.
+
+Telegram опрашивается long polling'ом (getUpdates) — webhook и
+публичный адрес не нужны. Отвечаем только чатам из TELEGRAM_CHAT_IDS
+и chats.json (если список пуст — всем).
+
+    /latest [source]   последние статьи, можно одного источника
+    /fundraising       последние раунды
+    /topic <name>      статьи по теме из topics.json
+    /search <words>    статьи, где есть все слова
+"""
+
+import asyncio
+import heapq
+import re
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Iterable, Optional
+
+from telegram import Bot, Update
+from telegram.constants import ParseMode
+from telegram.error import TelegramError
+
+from bot.render import Block, paginate
+from bot.telegram import DigestRenderer
+from collectors.articles import Article
+from collectors.fundraising import FundraisingRound
+from core.config import get_config
+from db.aio import async_db
+from db.pending import fundraising_key, pending_after
+from filters.tagger import TopicMatcher
+
+RETRY_SECONDS = 5       # пауза после ошибки getUpdates
+SCAN_SHARE = 8          # кандидатов больше 1/8 кэша — идти по ленте от новых, а не сортировать их
+
+WORD = re.compile(r"\w+")
+
+HELP = "\n".join([
+    "/latest [source] — latest articles, optionally from one source",
+    "/fundraising — latest fundraising rounds",
+    "/topic &lt;name&gt; — articles on a topic from topics.json",
+    "/search &lt;words&gt; — articles containing all the words",
+])
+
+
+def words(text: str) -> set[str]:
+    return set(WORD.findall(text.lower()))
+
+
+def _round_order(r: FundraisingRound) -> tuple:
+    return r.date or datetime.min, r.amount or 0
+
+
+class CommandCache:
+    """
+    Собранное за последние часы с индексами. Живёт в event loop процесса
+    --schedule, так что без блокировок.
+    """
+
+    def __init__(self):
+        self.articles: dict[str, Article] = {}             # url → статья
+        self.rounds: dict[str, FundraisingRound] = {}      # fundraising_key → раунд
+        self.by_source: dict[str, set[str]] = {}           # source.lower() → url
+        self.by_topic: dict[str, set[str]] = {}            # topic.lower() → url
+        self.by_word: dict[str, set[str]] = {}             # слово → url
+        self.pending_id = 0                                # докуда прочитан буфер db.pending
+        self._feed: list[tuple[datetime, str]] = []        # (published_at, url) от новых к старым
+        self._feed_sorted = True
+        self._matcher: Optional[TopicMatcher] = None
+
+    def _topics(self, a: Article) -> list[str]:
+        return [t.lower() for t in self._matcher.find(f"{a.title} {a.summary}".lower())]
+
+    def _index(self, a: Article):
+        self.by_source.setdefault(a.source.lower(), set()).add(a.url)
+        for topic in self._topics(a):
+            self.by_topic.setdefault(topic, set()).add(a.url)
+        for word in words(f"{a.title} {a.summary} {a.source}"):
+            self.by_word.setdefault(word, set()).add(a.url)
+
+    def _unindex(self, a: Article):
+        index_keys = [
+            (self.by_source, [a.source.lower()]),
+            (self.by_topic, self._topics(a)),
+            (self.by_word, words(f"{a.title} {a.summary} {a.source}")),
+        ]
+        for index, keys in index_keys:
+            for key in keys:
+                urls = index.get(key)
+                if urls is not None:
+                    urls.discard(a.url)
+                    if not urls:
+                        del index[key]
+
+    def add(self, items: Iterable, matcher: TopicMatcher):
+        """Статьи и раунды; уже известные URL/проекты не переиндексируются"""
+        if matcher is not self._matcher:
+            # Темы поменялись (hot reload topics.json) — тематический индекс заново
+            self._matcher = matcher
+            self.by_topic = {}
+            for a in self.articles.values():
+                for topic in self._topics(a):
+                    self.by_topic.setdefault(topic, set()).add(a.url)
+        for item in items:
+            if isinstance(item, FundraisingRound):
+                self.rounds.setdefault(fundraising_key(item), item)
+            elif isinstance(item, Article) and item.url not in self.articles:
+                self.articles[item.url] = item
+                self._index(item)
+                self._feed.append((item.published_at, item.url))
+                self._feed_sorted = False
+
+    def prune(self, now: datetime, article_hours: float, round_hours: float):
+        """Забыть статьи старше article_hours и раунды старше round_hours"""
+        cutoff = now - timedelta(hours=article_hours)
+        expired = [url for url, a in self.articles.items() if a.published_at < cutoff]
+        for url in expired:
+            self._unindex(self.articles.pop(url))
+        if expired:
+            self._feed = [entry for entry in self._feed if entry[1] in self.articles]
+        cutoff = now - timedelta(hours=round_hours)
+        self.rounds = {key: r for key, r in self.rounds.items() if not r.date or r.date >= cutoff}
+
+    def _newest(self, candidates: list[set[str]], n: int) -> list[Article]:
+        """n самых свежих статей из пересечения множеств URL"""
+        if not candidates:
+            return list(map(self.articles.get, self._ordered(n)))
+        candidates = sorted(candidates, key=len)
+        smallest, rest = candidates[0], candidates[1:]
+        if len(smallest) * SCAN_SHARE < len(self.articles):
+            urls = smallest.intersection(*rest) if rest else smallest
+            return heapq.nlargest(n, map(self.articles.get, urls), key=lambda a: a.published_at)
+        # Кандидатов много — первые n по ленте найдутся быстро
+        found = []
+        for url in self._ordered():
+            if url in smallest and all(url in urls for urls in rest):
+                found.append(self.articles[url])
+                if len(found) == n:
+                    break
+        return found
+
+    def _ordered(self, n: int = None) -> Iterable[str]:
+        if not self._feed_sorted:
+            # Лента уже упорядочена, кроме хвоста новых — timsort сливает почти даром
+            self._feed.sort(reverse=True)
+            self._feed_sorted = True
+        return (url for _, url in islice(self._feed, n))
+
+    def latest(self, n: int, source: str = "") -> list[Article]:
+        if not source:
+            return self._newest([], n)
+        source = source.lower()
+        urls = self.by_source.get(source)
+        if urls is None:
+            # «coindesk» найдёт и «CoinDesk Markets»
+            urls = set().union(*[urls for name, urls in self.by_source.items() if source in name])
+        return self._newest([urls], n)
+
+    def fundraising(self, n: int) -> list[FundraisingRound]:
+        return heapq.nlargest(n, self.rounds.values(), key=_round_order)
+
+    def search(self, query: str, n: int) -> list[Article]:
+        query = words(query)
+        candidates = [self.by_word.get(word, set()) for word in query]
+        if not candidates or not all(candidates):
+            return []
+        return self._newest(candidates, n)
+
+    def topic(self, name: str, n: int) -> list[Article]:
+        """Тема из topics.json; иначе — как /search"""
+        urls = self.by_topic.get(name.lower())
+        if urls is None:
+            return self.search(name, n)
+        return self._newest([urls], n)
+
+
+def answer(cache: CommandCache, text: str, results: int = 10, language: str = "en",
+           hours: float = 48) -> list[str]:
+    """Страницы ответа на команду (HTML, каждая ≤ 4096 видимых символов)"""
+    command, _, arg = text.strip().partition(" ")
+    command = command.split("@", 1)[0].lower()    # /latest@MarketPulseBot в группах
+    arg = arg.strip()
+
+    if command == "/latest":
+        items, title = cache.latest(results, arg), f"📰 Latest{f' from {arg}' if arg else ''}"
+    elif command == "/fundraising":
+        items, title = cache.fundraising(results), "💰 Latest fundraising"
+    elif command == "/topic" and arg:
+        items, title = cache.topic(arg, results), f"🏷 {arg}"
+    elif command == "/search" and arg:
+        items, title = cache.search(arg, results), f"🔎 {arg}"
+    else:
+        return [HELP]
+
+    if not items:
+        return [Block.plain(f"{title}: nothing in the last {hours:g}h").html]
+    renderer = DigestRenderer()
+    blocks = [Block.plain(f"{title}\n")]
+    blocks += [renderer.item_block(item, language).prefixed(f"{i}. ") for i, item in enumerate(items, 1)]
+    return paginate(blocks)
+
+
+class CommandServer:
+    """
+    Long polling команд + кэш. on_new_items — хук FeedScheduler /
+    WebSubReceiver, run() — цикл getUpdates и дочитывание буфера.
+    """
+
+    def __init__(self, bot_token: str, chat_ids: list[str] = None):
+        self.bot_token = bot_token
+        self.chat_ids = set(chat_ids or [])
+        self.cache = CommandCache()
+
+    async def on_new_items(self, source: str, items: list):
+        self.cache.add(items, get_config().topic_matcher)
+
+    async def refresh(self):
+        """Новое из буфера (в том числе от --worker) и чистка по возрасту"""
+        config = get_config()
+        pending_id, articles, rounds = await async_db.read(pending_after, self.cache.pending_id)
+        self.cache.pending_id = pending_id
+        self.cache.add(articles + rounds, config.topic_matcher)
+        self.cache.prune(datetime.utcnow(), config.commands.hours,
+                         max(config.commands.hours, config.fundraising_hours))
+
+    async def _refresh_loop(self, stop: asyncio.Event):
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), get_config().commands.refresh_seconds)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"  Commands: cache refresh failed: {e}")
+
+    def allowed(self, chat_id: str) -> bool:
+        allowed = self.chat_ids | set(get_config().chat_profiles)
+        return not allowed or chat_id in allowed
+
+    async def handle(self, bot: Bot, update: Update):
+        message = update.effective_message
+        if message is None or not message.text or not message.text.startswith("/"):
+            return
+        chat_id = str(message.chat_id)
+        if not self.allowed(chat_id):
+            return
+
+        config = get_config()
+        profile = config.chat_profiles.get(chat_id, config.default_profile)
+        started = time.perf_counter()
+        pages = answer(self.cache, message.text, config.commands.results, profile.language, config.commands.hours)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        print(f"  Command {message.text.split(' ', 1)[0]} from {chat_id}: answered from cache in {elapsed_ms:.1f} ms "
+              f"({len(self.cache.articles)} articles, {len(self.cache.rounds)} rounds)")
+        for page in pages:
+            await bot.send_message(chat_id=chat_id, text=page, parse_mode=ParseMode.HTML,
+                                   disable_web_page_preview=True)
+
+    async def run(self, stop: asyncio.Event = None):
+        stop = stop or asyncio.Event()
+        await self.refresh()
+        print(f"Commands: cache warmed with {len(self.cache.articles)} articles, {len(self.cache.rounds)} rounds")
+        refresher = asyncio.create_task(self._refresh_loop(stop))
+        offset = None
+        try:
+            async with Bot(token=self.bot_token) as bot:
+                while not stop.is_set():
+                    try:
+                        updates = await bot.get_updates(offset=offset, timeout=get_config().commands.poll_timeout,
+                                                        allowed_updates=["message"])
+                    except TelegramError as e:
+                        print(f"  Commands: getUpdates failed: {e}")
+                        await asyncio.sleep(RETRY_SECONDS)
+                        continue
+                    for update in updates:
+                        offset = update.update_id + 1
+                        try:
+                            await self.handle(bot, update)
+                        except Exception as e:
+                            print(f"  Commands: reply failed: {e}")
+        finally:
+            refresher.cancel()
@@ -0,0 +1,114 @@
+"""
+Разметка сообщений Telegram (HTML) с известной длиной.
+
+Лимит Telegram — 4096 символов текста ПОСЛЕ разбора разметки: теги
+не считаются, &amp; — один символ, эмодзи вне BMP — два (UTF-16).
+Поэтому длину блока считаем по видимому тексту при сборке, а не по
+готовому HTML, и режем на страницы только по границам блоков — тег
+никогда не рвётся посередине.
+"""
+
+import re
+from html import escape as _escape, unescape
+from typing import Iterable
+
+MAX_MESSAGE = 4096
+ELLIPSIS = "…"
+
+TAG = re.compile(r"<[^>]+>")
+
+
+def escape(text: str) -> str:
+    return _escape(text, quote=False)
+
+
+def visible_len(text: str) -> int:
+    """Длина в единицах UTF-16, как считает Telegram"""
+    if text.isascii():
+        return len(text)
+    return len(text.encode("utf-16-le")) // 2
+
+
+class Block:
+    """
+    Неделимая единица страницы (шапка, заголовок секции, материал):
+    HTML и длина его видимого текста. Каждая строка HTML закрывает свои
+    теги, так что блок можно резать по строкам.
+    keep_with_next — не оставлять в конце страницы (заголовок секции).
+    """
+    __slots__ = ("html", "length", "keep_with_next")
+
+    def __init__(self, html: str, length: int, keep_with_next: bool = False):
+        self.html = html
+        self.length = length
+        self.keep_with_next = keep_with_next
+
+    @classmethod
+    def plain(cls, text: str, keep_with_next: bool = False) -> "Block":
+        return cls(escape(text), visible_len(text), keep_with_next)
+
+    def prefixed(self, prefix: str) -> "Block":
+        """Тот же блок с текстом перед первой строкой (номер в списке)"""
+        return Block(escape(prefix) + self.html, visible_len(prefix) + self.length, self.keep_with_next)
+
+    def lines(self) -> list["Block"]:
+        """По строкам — только для блока длиннее страницы"""
+        return [Block(line, visible_len(unescape(TAG.sub("", line)))) for line in self.html.split("\n")]
+
+
+def join_blocks(blocks: list[Block]) -> Block:
+    return Block("\n".join([b.html for b in blocks]), sum([b.length for b in blocks]) + len(blocks) - 1)
+
+
+def truncate(line: Block, limit: int) -> Block:
+    """Сократить строку до limit видимых символов (разметка теряется — теги не рвём)"""
+    text = unescape(TAG.sub("", line.html))
+    while visible_len(text) > limit - 1:
+        text = text[:max(0, min(len(text) - 1, limit - 1))]
+    return Block.plain(text + ELLIPSIS)
+
+
+def paginate(blocks: Iterable[Block], limit: int = MAX_MESSAGE) -> list[str]:
+    """
+    Один проход: блоки упаковываются в страницы не длиннее limit.
+    Блок длиннее страницы делится по строкам, строка длиннее страницы
+    обрезается. Пустые строки по краям страницы отбрасываются.
+    """
+    pages: list[str] = []
+    parts: list[str] = []
+    size = -1   # страница из k частей: сумма длин + (k - 1) переводов строки
+
+    def flush():
+        nonlocal parts, size
+        page = "\n".join(parts).strip("\n")
+        if page:
+            pages.append(page)
+        parts, size = [], -1
+
+    def add(block: Block):
+        nonlocal size
+        if size + block.length + 1 > limit and parts:
+            flush()
+        parts.append(block.html)
+        size += block.length + 1
+
+    def place(block: Block):
+        if block.length <= limit:
+            add(block)
+            return
+        for line in block.lines():
+            add(truncate(line, limit) if line.length > limit else line)
+
+    held: list[Block] = []
+    for block in blocks:
+        if block.keep_with_next or held:
+            held.append(block)
+            if block.keep_with_next:
+                continue
+            block = join_blocks(held)
+            held = []
+        place(block)
+    if held:
+        place(join_blocks(held))
+    flush()
+    return pages
@@ -1,9 +1,13 @@
 """Telegram bot - без обрезки URL и заголовков"""
 
 import io
+from dataclasses import dataclass
+from typing import Callable, Iterator
+
 from telegram import Bot
 from telegram.constants import ParseMode
 
+from bot.render import MAX_MESSAGE, Block, escape, paginate, visible_len
 from collectors.fundraising import FundraisingRound
 from collectors.articles import Article
 
@@ -82,6 +86,36 @@ VIP_EMOJI = {
 }
 
 
+LABELS = {
+    "en": {
+        "morning": "☀️ MARKET PULSE — Morning",
+        "evening": "🌙 MARKET PULSE — Evening",
+        "fundraising": "🔥 FUNDRAISING",
+        "research": "🔬 RESEARCH & INSIGHTS",
+        "protocols": "⛓️ PROTOCOL UPDATES",
+        "news": "📰 NEWS & ARTICLES",
+        "trending": "📈 TRENDING",
+        "trend": "{count} in {hours}h, avg {mean:.1f}",
+        "lead": "Lead",
+        "undisclosed": "Undisclosed",
+    },
+    "ru": {
+        "morning": "☀️ MARKET PULSE — Утро",
+        "evening": "🌙 MARKET PULSE — Вечер",
+        "fundraising": "🔥 ИНВЕСТИЦИИ",
+        "research": "🔬 ИССЛЕДОВАНИЯ И АНАЛИТИКА",
+        "protocols": "⛓️ ОБНОВЛЕНИЯ ПРОТОКОЛОВ",
+        "news": "📰 НОВОСТИ И СТАТЬИ",
+        "trending": "📈 В ТРЕНДЕ",
+        "trend": "{count} за {hours} ч, в среднем {mean:.1f}",
+        "lead": "Лид",
+        "undisclosed": "Сумма не раскрыта",
+    },
+}
+
+ALL_SECTIONS = ("fundraising", "research", "protocols", "news", "trending")
+
+
 def format_round_type(round_type: str) -> str:
     """Форматирует тип раунда, убирает None/Unknown"""
     if not round_type or round_type.lower() in ['none', 'unknown', '']:
@@ -89,69 +123,178 @@ def format_round_type(round_type: str) -> str:
     return round_type
 
 
-def format_digest(
-    fundraising: list[FundraisingRound],
-    vip_articles: list[Article],
-    regular_articles: list[Article],
-    is_morning: bool = True,
-    priority_topics: list[str] = None
-) -> str:
-    """Форматирует дайджест БЕЗ обрезки"""
-
-    header = "☀️ MARKET PULSE — Morning" if is_morning else "🌙 MARKET PULSE — Evening"
-    parts = [header, ""]
+@dataclass
+class RenderedDigest:
+    text: str          # целиком — для файла с промптом и предпросмотра
+    pages: list[str]   # сообщения, каждое ≤ 4096 видимых символов
 
-    # === FUNDRAISING ===
-    if fundraising:
-        parts.append("🔥 FUNDRAISING\n")
-        for i, r in enumerate(fundraising[:10], 1):
-            amount = f"${r.amount}M" if r.amount else "Undisclosed"
-            lead = r.lead_investors[0] if r.lead_investors else "—"
-            round_type = format_round_type(r.round_type)
 
-            if round_type:
-                parts.append(f"{i}. <b>{r.project}</b> — {amount} {round_type}")
-            else:
-                parts.append(f"{i}. <b>{r.project}</b> — {amount}")
+class DigestRenderer:
+    """
+    Рендер дайджестов одного прогона. Блок материала считается один раз
+    (на язык) и общий для всех аудиторий — номер дописывается отдельно;
+    готовые страницы кэшируются по аудитории: язык, секции, утро/вечер
+    и набор материалов.
+    """
 
-            parts.append(f"   Lead: {lead}")
-            if r.source_url:
-                parts.append(f"   🔗 {r.source_url}")
-            parts.append("")
+    def __init__(self, limit: int = MAX_MESSAGE):
+        self.limit = limit
+        self._items: dict[tuple, Block] = {}
+        self._digests: dict[tuple, RenderedDigest] = {}
 
-    # === VIP: Research & Insights ===
-    if vip_articles:
+    def _round_block(self, r: FundraisingRound, labels: dict, language: str) -> Block:
+        key = ("round", id(r), language)
+        block = self._items.get(key)
+        if block is None:
+            amount = f"${r.amount}M" if r.amount else labels["undisclosed"]
+            lead = r.lead_investors[0] if r.lead_investors else "—"
+            round_type = format_round_type(r.round_type)
+            title = f" — {amount} {round_type}" if round_type else f" — {amount}"
+            link = f"\n   🔗 {r.source_url}" if r.source_url else ""
+            lead_line = f"\n   {labels['lead']}: {lead}"
+            block = self._items[key] = Block(
+                f"<b>{escape(r.project)}</b>{escape(title + lead_line + link)}\n",
+                visible_len(f"{r.project}{title}{lead_line}{link}\n")
+            )
+        return block
+
+    def _article_block(self, a: Article, emoji: str = "") -> Block:
+        key = ("article", id(a), emoji)
+        block = self._items.get(key)
+        if block is None:
+            prefix = f"{emoji} " if emoji else ""
+            rest = f"\n   — {a.source}\n   🔗 {a.url}\n"
+            block = self._items[key] = Block(
+                f"{prefix}<b>{escape(a.title)}</b>{escape(rest)}",
+                visible_len(f"{prefix}{a.title}{rest}")
+            )
+        return block
+
+    def item_block(self, item, language: str = "en") -> Block:
+        """Блок одного материала как в дайджесте (ответы на команды, bot/commands.py)"""
+        if isinstance(item, FundraisingRound):
+            return self._round_block(item, LABELS.get(language, LABELS["en"]), language)
+        emoji = ""
+        if item.source_type == "vip":
+            emoji = VIP_EMOJI.get(item.source, "📝")
+        elif item.source_type == "protocol":
+            emoji = PROTOCOL_EMOJI.get(item.source, "📢")
+        return self._article_block(item, emoji)
+
+    def blocks(self, fundraising: list[FundraisingRound], vip_articles: list[Article],
+               regular_articles: list[Article], is_morning: bool = True,
+               sections=ALL_SECTIONS, language: str = "en",
+               trending: tuple = (), trend_hours: int = 24) -> Iterator[Block]:
+        """Блоки дайджеста по порядку: шапка, тренды, секции, материалы"""
+        labels = LABELS.get(language, LABELS["en"])
+        yield Block.plain((labels["morning"] if is_morning else labels["evening"]) + "\n")
+
+        # === Trending topics ===
+        if trending and "trending" in sections:
+            lines = [labels["trending"]]
+            lines += [f"• {t.key} — " + labels["trend"].format(count=t.count, hours=trend_hours, mean=t.mean)
+                      for t in trending]
+            yield Block.plain("\n".join(lines) + "\n")
+
+        # === FUNDRAISING ===
+        if fundraising and "fundraising" in sections:
+            yield Block.plain(f"{labels['fundraising']}\n", keep_with_next=True)
+            for i, r in enumerate(fundraising, 1):
+                yield self._round_block(r, labels, language).prefixed(f"{i}. ")
+
+        # === VIP: Research & Insights ===
         research = [a for a in vip_articles if a.source_type == "vip"]
         protocols = [a for a in vip_articles if a.source_type == "protocol"]
-
-        if research:
-            parts.append("\n🔬 RESEARCH & INSIGHTS\n")
+        if research and "research" in sections:
+            yield Block.plain(f"\n{labels['research']}\n", keep_with_next=True)
             for a in research[:7]:
-                emoji = VIP_EMOJI.get(a.source, "📝")
-                parts.append(f"{emoji} <b>{a.title}</b>")
-                parts.append(f"   — {a.source}")
-                parts.append(f"   🔗 {a.url}")
-                parts.append("")
-
-        if protocols:
-            parts.append("\n⛓️ PROTOCOL UPDATES\n")
+                yield self._article_block(a, VIP_EMOJI.get(a.source, "📝"))
+        if protocols and "protocols" in sections:
+            yield Block.plain(f"\n{labels['protocols']}\n", keep_with_next=True)
             for a in protocols[:7]:
-                emoji = PROTOCOL_EMOJI.get(a.source, "📢")
-                parts.append(f"{emoji} <b>{a.title}</b>")
-                parts.append(f"   — {a.source}")
-                parts.append(f"   🔗 {a.url}")
-                parts.append("")
+                yield self._article_block(a, PROTOCOL_EMOJI.get(a.source, "📢"))
+
+        # === Regular Articles ===
+        if regular_articles and "news" in sections:
+            yield Block.plain(f"\n{labels['news']}\n", keep_with_next=True)
+            for i, a in enumerate(regular_articles, 1):
+                yield self._article_block(a).prefixed(f"{i}. ")
+
+    def render(self, fundraising: list[FundraisingRound], vip_articles: list[Article],
+               regular_articles: list[Article], is_morning: bool = True,
+               sections=ALL_SECTIONS, language: str = "en",
+               trending: tuple = (), trend_hours: int = 24) -> RenderedDigest:
+        # Объекты живут весь прогон, так что id() — надёжный ключ аудитории
+        key = (language, tuple(sections), is_morning, tuple(map(id, fundraising)),
+               tuple(map(id, vip_articles)), tuple(map(id, regular_articles)), tuple(trending))
+        digest = self._digests.get(key)
+        if digest is None:
+            blocks = list(self.blocks(fundraising, vip_articles, regular_articles,
+                                      is_morning, sections, language, trending, trend_hours))
+            digest = RenderedDigest(
+                text="\n".join([block.html for block in blocks]),
+                pages=paginate(blocks, self.limit),
+            )
+            self._digests[key] = digest
+        return digest
 
-    # === Regular Articles ===
-    if regular_articles:
-        parts.append("\n📰 NEWS & ARTICLES\n")
-        for i, a in enumerate(regular_articles[:10], 1):
-            parts.append(f"{i}. <b>{a.title}</b>")
-            parts.append(f"   — {a.source}")
-            parts.append(f"   🔗 {a.url}")
-            parts.append("")
 
-    return "\n".join(parts)
+def format_digest(
+    fundraising: list[FundraisingRound],
+    vip_articles: list[Article],
+    regular_articles: list[Article],
+    is_morning: bool = True,
+    priority_topics: list[str] = None,
+    sections=ALL_SECTIONS,
+    language: str = "en",
+    trending: tuple = (),
+    trend_hours: int = 24
+) -> str:
+    """
+    Форматирует дайджест БЕЗ обрезки; sections/language — из профиля чата,
+    trending — готовые тренды (db.trends.trending), блок почти бесплатный
+    """
+    blocks = DigestRenderer().blocks(fundraising, vip_articles, regular_articles, is_morning, sections, language,
+                                     trending, trend_hours)
+    return "\n".join([block.html for block in blocks])
+
+
+def format_alert(item) -> str:
+    """Одиночный алерт: Article или FundraisingRound"""
+    if isinstance(item, FundraisingRound):
+        amount = f"${item.amount}M" if item.amount else "Undisclosed"
+        round_type = format_round_type(item.round_type)
+        lines = [
+            "⚡ BREAKING — FUNDRAISING",
+            "",
+            f"<b>{escape(item.project)}</b> — {amount} {round_type}".rstrip(),
+        ]
+        if item.lead_investors:
+            lines.append(f"   Lead: {escape(', '.join(item.lead_investors))}")
+        if item.source_url:
+            lines.append(f"   🔗 {escape(item.source_url)}")
+        return "\n".join(lines)
+
+    emoji = VIP_EMOJI.get(item.source) or PROTOCOL_EMOJI.get(item.source) or "📰"
+    header = "⚡ BREAKING — RESEARCH" if item.is_vip else "⚡ BREAKING"
+    return "\n".join([
+        header,
+        "",
+        f"{emoji} <b>{escape(item.title)}</b>",
+        f"   — {escape(item.source)}",
+        f"   🔗 {escape(item.url)}",
+    ])
+
+
+async def send_alert(bot_token: str, chat_id: str, message: str):
+    """Отправляет одиночный алерт (без файла для Claude)"""
+    bot = Bot(token=bot_token)
+    await bot.send_message(
+        chat_id=chat_id,
+        text=message,
+        parse_mode=ParseMode.HTML,
+        disable_web_page_preview=True
+    )
 
 
 def generate_prompt_file(digest: str) -> io.BytesIO:
@@ -167,48 +310,36 @@ def generate_prompt_file(digest: str) -> io.BytesIO:
     return file_buffer
 
 
-async def send_digest(bot_token: str, chat_id: str, message: str):
-    """Отправляет в Telegram с разбивкой на части если нужно + файл для Claude"""
+async def send_digest(bot_token: str, chat_id: str, message: str, pages: list[str],
+                      document_sent: bool = False, pages_sent: int = 0, on_progress: Callable = None):
+    """
+    Отправляет файл для Claude и дайджест готовыми страницами (см. DigestRenderer).
+
+    document_sent / pages_sent — что уже ушло в прошлой попытке (пропускается);
+    on_progress(document_sent, pages_sent) вызывается после каждой части.
+    """
     bot = Bot(token=bot_token)
 
-    # Отправляем файл с промптом + дайджестом для Claude
-    prompt_file = generate_prompt_file(message)
-    await bot.send_document(
-        chat_id=chat_id,
-        document=prompt_file,
-        filename="digest_for_claude.txt",
-        caption="📎 Файл для отправки в Claude (промпт + дайджест)"
-    )
+    if not document_sent:
+        # Отправляем файл с промптом + дайджестом для Claude
+        prompt_file = generate_prompt_file(message)
+        await bot.send_document(
+            chat_id=chat_id,
+            document=prompt_file,
+            filename="digest_for_claude.txt",
+            caption="📎 Файл для отправки в Claude (промпт + дайджест)"
+        )
+        document_sent = True
+        if on_progress:
+            await on_progress(document_sent, pages_sent)
 
-    # Telegram лимит 4096 символов
-    if len(message) > 4000:
-        # Разбиваем по секциям (двойной перенос строки)
-        sections = message.split("\n\n")
-        chunks = []
-        current = ""
-
-        for section in sections:
-            if len(current) + len(section) + 2 < 4000:
-                current += section + "\n\n"
-            else:
-                if current:
-                    chunks.append(current.strip())
-                current = section + "\n\n"
-
-        if current:
-            chunks.append(current.strip())
-
-        for chunk in chunks:
-            await bot.send_message(
-                chat_id=chat_id,
-                text=chunk,
-                parse_mode=ParseMode.HTML,
-                disable_web_page_preview=True
-            )
-    else:
+    for page in pages[pages_sent:]:
         await bot.send_message(
             chat_id=chat_id,
-            text=message,
+            text=page,
             parse_mode=ParseMode.HTML,
             disable_web_page_preview=True
         )
+        pages_sent += 1
+        if on_progress:
+            await on_progress(document_sent, pages_sent)
@@ -2,11 +2,19 @@
 Articles collector с расширенным списком источников.
 """
 
-import feedparser
+import asyncio
+
 from bs4 import BeautifulSoup
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Mapping, Optional
+
+from collectors.fetch import SingleFlight, fetch_feed, new_session
+from core.deadline import Deadline, run_budgeted
+from db.feeds import CURSOR_GUIDS, FeedCursor
+from filters.relevance import score_texts
+
+MAX_ENTRIES = 30    # сколько верхних записей фида разбирается
 
 
 @dataclass
@@ -24,6 +32,57 @@ class Article:
     is_vip: bool = False
 
 
+@dataclass(frozen=True)
+class FeedSpec:
+    name: str
+    url: str
+    category: str
+    source_type: str
+    is_vip: bool = False
+    hours: Optional[int] = None  # None — окно прогона по умолчанию
+
+
+# (категория в rss_sources.json, source_type, is_vip, окно в часах)
+FEED_CATEGORIES = (
+    ("vip_sources", "vip", True, 48),
+    ("protocol_blogs", "protocol", True, 48),
+    ("news", "news", False, None),
+    ("news_defi", "news", False, None),
+    ("news_regulation", "news", False, None),
+    ("substack", "substack", False, None),
+    ("russian", "russian", False, None),
+)
+
+# Бонусы по источникам
+SOURCE_BONUSES = {
+    # Tier 1
+    "coindesk": 25,
+    "cointelegraph": 25,
+    "theblock": 25,
+    "decrypt": 20,
+    "dlnews": 20,
+    "thedefiant": 20,
+    "blockworks": 20,
+    # Tier 2
+    "bitcoinmagazine": 15,
+    "cryptoslate": 15,
+    "cryptonews": 15,
+    "rekt": 15,
+    "cryptobriefing": 15,
+    # Substack
+    "bankless": 20,
+    "week_in_ethereum": 20,
+    # Russian
+    "forklog": 10,
+    "bits_media": 10,
+}
+DEFAULT_SOURCE_BONUS = 5
+
+TYPE_BONUSES = {"substack": 15, "news": 10, "medium": 5, "russian": 8}
+TOPIC_WEIGHT = 32    # × сумма косинусов с приоритетными темами (типичное попадание ≈ 0.25)
+VIP_SCORE = 1000
+
+
 GENERIC_TITLES = [
     "here's what happened",
     "what happened in crypto today",
@@ -56,28 +115,68 @@ def clean_html(text: str) -> str:
     return soup.get_text(separator=' ', strip=True)
 
 
-def parse_rss(url: str, source: str, source_type: str, hours: int = 24, is_vip: bool = False) -> list[Article]:
-    """Парсит RSS feed"""
+def entry_published(entry) -> Optional[datetime]:
+    """Дата публикации записи фида (published, иначе updated)"""
+    if hasattr(entry, 'published_parsed') and entry.published_parsed:
+        return datetime(*entry.published_parsed[:6])
+    if hasattr(entry, 'updated_parsed') and entry.updated_parsed:
+        return datetime(*entry.updated_parsed[:6])
+    return None
+
+
+def entry_guid(entry) -> str:
+    return entry.get('id') or entry.get('link', '')
+
+
+def advance_cursor(cursor: FeedCursor, feed) -> FeedCursor:
+    """
+    Курсор после разбора: GUID записей feed впереди прежних (push WebSub
+    приносит только новые записи — остальные не забываются) и самая новая дата.
+    """
+    entries = feed.entries[:MAX_ENTRIES]
+    guids = list(dict.fromkeys(filter(None, map(entry_guid, entries))))
+    fresh = set(guids)
+    guids += [g for g in cursor.guids if g not in fresh]
+    newest = max(filter(None, map(entry_published, entries)), default=None)
+    if cursor.newest_at is not None and (newest is None or newest < cursor.newest_at):
+        newest = cursor.newest_at
+    return FeedCursor(cursor.source, tuple(guids[:CURSOR_GUIDS]), newest)
+
+
+def feed_publish_times(feed) -> list[datetime]:
+    """Даты всех записей фида — для оценки частоты публикаций"""
+    times = []
+    for entry in feed.entries:
+        pub_date = entry_published(entry)
+        if pub_date:
+            times.append(pub_date)
+    return times
+
+
+def parse_rss(feed, source: str, source_type: str, hours: int = 24, is_vip: bool = False,
+              cursor: FeedCursor = None) -> list[Article]:
+    """
+    Парсит уже загруженный RSS feed (результат feedparser).
+
+    cursor — записи, разобранные при прошлом опросе, пропускаются сразу,
+    без Article и чистки HTML; новый курсор — advance_cursor(cursor, feed).
+    """
     articles = []
     cutoff = datetime.now() - timedelta(hours=hours)
 
     try:
-        feed = feedparser.parse(url)
+        for entry in feed.entries[:MAX_ENTRIES]:
+            published = entry_published(entry)
+            if cursor is not None and cursor.seen(entry_guid(entry), published):
+                continue
 
-        for entry in feed.entries[:30]:
             title = entry.get('title', 'No title')
 
             # Skip generic (но не для VIP)
             if not is_vip and is_generic_title(title):
                 continue
 
-            pub_date = None
-            if hasattr(entry, 'published_parsed') and entry.published_parsed:
-                pub_date = datetime(*entry.published_parsed[:6])
-            elif hasattr(entry, 'updated_parsed') and entry.updated_parsed:
-                pub_date = datetime(*entry.updated_parsed[:6])
-            else:
-                pub_date = datetime.now()
+            pub_date = published or datetime.now()
 
             if pub_date > cutoff:
                 articles.append(Article(
@@ -96,91 +195,129 @@ def parse_rss(url: str, source: str, source_type: str, hours: int = 24, is_vip:
     return articles
 
 
-def collect_articles(sources: dict, hours: int = 24) -> tuple[list[Article], list[Article]]:
+async def fetch_rss(session, spec: FeedSpec, hours: int = 24, timeout: float = 15,
+                    flights: SingleFlight = None) -> list[Article]:
+    """Скачивает фид с таймаутом и парсит его"""
+    feed = await fetch_feed(session, spec.url, timeout, flights)
+    return parse_rss(feed, spec.name, spec.source_type, hours=spec.hours or hours, is_vip=spec.is_vip)
+
+
+def compile_feeds(sources: dict) -> tuple[FeedSpec, ...]:
+    """Разворачивает rss_sources.json в плоскую таблицу фидов"""
+    feeds = []
+    for category, source_type, is_vip, hours in FEED_CATEGORIES:
+        for name, url in sources.get(category, {}).items():
+            feeds.append(FeedSpec(name, url, category, source_type, is_vip, hours))
+    for tag in sources.get("medium_tags", []):
+        feeds.append(FeedSpec(
+            f"medium/{tag}", f"https://medium.com/feed/tag/{tag}",
+            "medium_tags", "medium", False, None
+        ))
+    return tuple(feeds)
+
+
+async def collect_articles(
+    feeds,
+    hours: int = 24,
+    deadline: Deadline = None,
+    timeout: float = 15,
+    concurrency: int = 16,
+    flights: SingleFlight = None
+) -> tuple[list[Article], list[Article]]:
     """
     Собирает статьи из всех источников.
 
+    feeds: таблица FeedSpec (см. core.config) или сырой rss_sources.json
+
+    Фиды качаются параллельно (не больше concurrency одновременно),
+    каждый в рамках своего бюджета. Не уложившиеся в бюджет попадают
+    в deadline.dropped, остальные результаты используются как есть.
+    flights — общие загрузки прогона (один URL в нескольких категориях
+    качается один раз).
+
+    Returns:
+        (vip_articles, regular_articles)
+    """
+    if isinstance(feeds, Mapping):
+        feeds = compile_feeds(feeds)
+    feeds = list(feeds)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch_one(session, spec: FeedSpec) -> list[Article]:
+        async with semaphore:
+            return await run_budgeted(
+                f"{spec.category}:{spec.name}",
+                fetch_rss(session, spec, hours, timeout, flights),
+                deadline, timeout, default=[]
+            )
+
+    async with new_session() as session:
+        results = await asyncio.gather(*(fetch_one(session, spec) for spec in feeds))
+
+    return merge_articles([(spec.category, articles) for spec, articles in zip(feeds, results)])
+
+
+def merge_articles(batches: list[tuple[str, list[Article]]]) -> tuple[list[Article], list[Article]]:
+    """
+    Раскладывает собранные статьи на VIP и обычные с дедупликацией по URL.
+
+    batches: [(категория фида, статьи фида), ...] в порядке фидов.
+    Приоритет категорий — как в FEED_CATEGORIES; одна и та же статья
+    из нескольких Medium-тегов увеличивает tag_appearances.
+
     Returns:
         (vip_articles, regular_articles)
     """
+    by_category = {}
+    for category, articles in batches:
+        by_category.setdefault(category, []).append(articles)
+
     vip_articles = []
     regular_articles = []
     seen_urls = set()
 
+    def collect(category: str, target: list[Article]) -> int:
+        count = 0
+        for articles in by_category.get(category, []):
+            for a in articles:
+                if a.url not in seen_urls:
+                    seen_urls.add(a.url)
+                    target.append(a)
+                    count += 1
+        return count
+
     # === VIP Sources ===
     print("  Collecting VIP sources...")
-    for name, url in sources.get("vip_sources", {}).items():
-        articles = parse_rss(url, name, "vip", hours=48, is_vip=True)
-        for a in articles:
-            if a.url not in seen_urls:
-                seen_urls.add(a.url)
-                vip_articles.append(a)
+    collect("vip_sources", vip_articles)
     print(f"    VIP research: {len(vip_articles)}")
 
     # === Protocol Blogs ===
     print("  Collecting protocol blogs...")
-    protocol_count = 0
-    for name, url in sources.get("protocol_blogs", {}).items():
-        articles = parse_rss(url, name, "protocol", hours=48, is_vip=True)
-        for a in articles:
-            if a.url not in seen_urls:
-                seen_urls.add(a.url)
-                vip_articles.append(a)
-                protocol_count += 1
+    protocol_count = collect("protocol_blogs", vip_articles)
     print(f"    Protocols: {protocol_count}")
 
     # === Main News ===
     print("  Collecting news...")
-    news_count = 0
-    for name, url in sources.get("news", {}).items():
-        articles = parse_rss(url, name, "news", hours=hours, is_vip=False)
-        for a in articles:
-            if a.url not in seen_urls:
-                seen_urls.add(a.url)
-                regular_articles.append(a)
-                news_count += 1
+    news_count = collect("news", regular_articles)
     print(f"    News: {news_count}")
 
-    # === DeFi News ===
-    for name, url in sources.get("news_defi", {}).items():
-        articles = parse_rss(url, name, "news", hours=hours, is_vip=False)
-        for a in articles:
-            if a.url not in seen_urls:
-                seen_urls.add(a.url)
-                regular_articles.append(a)
-
-    # === Regulation News ===
-    for name, url in sources.get("news_regulation", {}).items():
-        articles = parse_rss(url, name, "news", hours=hours, is_vip=False)
-        for a in articles:
-            if a.url not in seen_urls:
-                seen_urls.add(a.url)
-                regular_articles.append(a)
+    # === DeFi / Regulation News ===
+    collect("news_defi", regular_articles)
+    collect("news_regulation", regular_articles)
 
     # === Substack ===
     print("  Collecting Substack...")
-    for name, url in sources.get("substack", {}).items():
-        articles = parse_rss(url, name, "substack", hours=hours, is_vip=False)
-        for a in articles:
-            if a.url not in seen_urls:
-                seen_urls.add(a.url)
-                regular_articles.append(a)
+    collect("substack", regular_articles)
 
     # === Russian Sources ===
     print("  Collecting Russian sources...")
-    for name, url in sources.get("russian", {}).items():
-        articles = parse_rss(url, name, "russian", hours=hours, is_vip=False)
-        for a in articles:
-            if a.url not in seen_urls:
-                seen_urls.add(a.url)
-                regular_articles.append(a)
+    collect("russian", regular_articles)
 
     # === Medium Tags ===
     print("  Collecting Medium tags...")
     url_to_article = {}
-    for tag in sources.get("medium_tags", []):
-        url = f"https://medium.com/feed/tag/{tag}"
-        articles = parse_rss(url, f"medium/{tag}", "medium", hours=hours, is_vip=False)
+    for articles in by_category.get("medium_tags", []):
         for a in articles:
             if a.url in seen_urls:
                 continue
@@ -196,62 +333,51 @@ def collect_articles(sources: dict, hours: int = 24) -> tuple[list[Article], lis
 
     print(f"    Medium: {len(url_to_article)}")
 
+    # === Institutional scrape (ARK, Grayscale) ===
+    collect("institutional_scrape", vip_articles)
+
     print(f"  Total: {len(vip_articles)} VIP, {len(regular_articles)} regular")
 
     return vip_articles, regular_articles
 
 
-def rank_articles(articles: list[Article], priority_topics: list[str]) -> list[Article]:
-    """Ранжирует статьи"""
-
-    # Бонусы по источникам
-    SOURCE_BONUSES = {
-        # Tier 1
-        "coindesk": 25,
-        "cointelegraph": 25,
-        "theblock": 25,
-        "decrypt": 20,
-        "dlnews": 20,
-        "thedefiant": 20,
-        "blockworks": 20,
-        # Tier 2
-        "bitcoinmagazine": 15,
-        "cryptoslate": 15,
-        "cryptonews": 15,
-        "rekt": 15,
-        "cryptobriefing": 15,
-        # Substack
-        "bankless": 20,
-        "week_in_ethereum": 20,
-        # Russian
-        "forklog": 10,
-        "bits_media": 10,
-    }
-
-    for a in articles:
-        if a.is_vip:
-            a.score = 1000
-            continue
+def base_score(a: Article, source_bonuses: Mapping[str, float], type_bonuses: Mapping[str, float]) -> float:
+    """Скор без учёта тем: источник, популярность Medium, тип источника"""
+    score = 0.0
 
-        score = 0.0
+    # Source bonus
+    score += source_bonuses.get(a.source, DEFAULT_SOURCE_BONUS)
 
-        # Source bonus
-        score += SOURCE_BONUSES.get(a.source, 5)
+    # Tag appearances (Medium popularity)
+    score += a.tag_appearances * 10
 
-        # Tag appearances (Medium popularity)
-        score += a.tag_appearances * 10
+    # Source type bonus
+    score += type_bonuses.get(a.source_type, 0)
 
-        # Source type bonus
-        type_bonuses = {"substack": 15, "news": 10, "medium": 5, "russian": 8}
-        score += type_bonuses.get(a.source_type, 0)
+    return score
 
-        # Topic match
-        text = f"{a.title} {a.summary}".lower()
-        for topic in priority_topics:
-            if topic.lower() in text:
-                score += 8
 
-        a.score = score
+def rank_articles(
+    articles: list[Article],
+    priority_topics,
+    source_bonuses: Mapping[str, float] = None,
+    type_bonuses: Mapping[str, float] = None
+) -> list[Article]:
+    """Ранжирует статьи"""
+    if source_bonuses is None:
+        source_bonuses = SOURCE_BONUSES
+    if type_bonuses is None:
+        type_bonuses = TYPE_BONUSES
+    for a in articles:
+        if a.is_vip:
+            a.score = VIP_SCORE
+
+    # Topic relevance: TF-IDF cosine, one sparse product for the batch;
+    # terms of already seen urls come from the cache
+    regular = [a for a in articles if not a.is_vip]
+    texts = [f"{a.title} {a.summary}" for a in regular]
+    for a, row in zip(regular, score_texts(priority_topics, texts, [a.url for a in regular])):
+        a.score = base_score(a, source_bonuses, type_bonuses) + sum(row.values()) * TOPIC_WEIGHT
 
     articles.sort(key=lambda x: (-x.is_vip, -x.score))
     return articles
@@ -0,0 +1,136 @@
+"""
+HTTP-загрузка для коллекторов.
+
+Все сетевые запросы идут через aiohttp с явным таймаутом;
+feedparser получает уже скачанные байты и парсит их в потоке,
+не блокируя event loop.
+
+SingleFlight — общие загрузки на прогон дайджеста: один и тот же URL
+(фид и в news, и в fundraising_news, пересекающиеся теги Medium) качается
+и разбирается один раз, остальные запросы ждут ту же загрузку или сразу
+получают готовый результат. Фильтры каждый коллектор применяет сам.
+"""
+
+import asyncio
+from collections import Counter
+from functools import partial
+from typing import Awaitable, Callable
+
+import aiohttp
+import feedparser
+
+USER_AGENT = feedparser.USER_AGENT
+BROWSER_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+
+
+def new_session() -> aiohttp.ClientSession:
+    """Общая сессия на прогон коллектора"""
+    return aiohttp.ClientSession(headers={"User-Agent": USER_AGENT})
+
+
+async def fetch_bytes(
+    session: aiohttp.ClientSession,
+    url: str,
+    timeout: float = 30,
+    headers: dict = None,
+    flights: "SingleFlight" = None
+) -> tuple[bytes, dict]:
+    """Скачивает url, возвращает (тело, заголовки ответа)"""
+    if flights is not None:
+        return await flights.bytes(url, timeout, headers)
+    async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+        resp.raise_for_status()
+        body = await resp.read()
+        return body, {k.lower(): v for k, v in resp.headers.items()}
+
+
+async def fetch_text(
+    session: aiohttp.ClientSession,
+    url: str,
+    timeout: float = 30,
+    headers: dict = None
+) -> str:
+    async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+        resp.raise_for_status()
+        return await resp.text()
+
+
+async def fetch_json(session: aiohttp.ClientSession, url: str, timeout: float = 30,
+                     flights: "SingleFlight" = None):
+    if flights is not None:
+        return await flights.json(url, timeout)
+    async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+        resp.raise_for_status()
+        return await resp.json()
+
+
+async def fetch_feed(session: aiohttp.ClientSession, url: str, timeout: float = 15,
+                     flights: "SingleFlight" = None):
+    """Скачивает RSS/Atom с таймаутом и парсит его feedparser'ом в потоке"""
+    if flights is not None:
+        return await flights.feed(url, timeout)
+    body, headers = await fetch_bytes(session, url, timeout)
+    response_headers = {
+        "content-type": headers.get("content-type", ""),
+        "content-location": url,
+    }
+    return await asyncio.to_thread(feedparser.parse, body, response_headers=response_headers)
+
+
+class SingleFlight:
+    """
+    Загрузки одного прогона: одинаковый запрос — одна загрузка и один
+    результат (разобранный фид, JSON, тело). Результат общий, менять его
+    нельзя. Запросы идут через собственную сессию: отмена по бюджету одного
+    коллектора или закрытие его сессии не обрывает загрузку для остальных.
+    """
+
+    def __init__(self):
+        self._calls: dict[tuple, asyncio.Task] = {}
+        self._session = None
+        self.requests = 0
+        self.fetches = 0
+        self.avoided: Counter = Counter()    # url -> сколько повторных запросов не ушло в сеть
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None:
+            self._session = new_session()
+        return self._session
+
+    def _done(self, key: tuple, task: asyncio.Task):
+        # Ошибку получают те, кто ждал; следующий запрос качает заново
+        # (загрузка шла с таймаутом первого запросившего)
+        if task.cancelled() or task.exception() is not None:
+            if self._calls.get(key) is task:
+                del self._calls[key]
+
+    def _shared(self, key: tuple, load: Callable[[], Awaitable]) -> Awaitable:
+        self.requests += 1
+        task = self._calls.get(key)
+        if task is None:
+            task = self._calls[key] = asyncio.ensure_future(load())
+            task.add_done_callback(partial(self._done, key))
+            self.fetches += 1
+        else:
+            self.avoided[key[1]] += 1
+        # Отмена ждущего (бюджет коллектора) не отменяет общую загрузку
+        return asyncio.shield(task)
+
+    async def feed(self, url: str, timeout: float = 15):
+        return await self._shared(("feed", url), lambda: fetch_feed(self.session, url, timeout))
+
+    async def json(self, url: str, timeout: float = 30):
+        return await self._shared(("json", url), lambda: fetch_json(self.session, url, timeout))
+
+    async def bytes(self, url: str, timeout: float = 30, headers: dict = None) -> tuple[bytes, dict]:
+        key = ("bytes", url, tuple(sorted((headers or {}).items())))
+        return await self._shared(key, lambda: fetch_bytes(self.session, url, timeout, headers))
+
+    async def close(self):
+        """Конец прогона: недождавшиеся загрузки отменяются, сессия закрывается"""
+        for task in list(self._calls.values()):
+            task.cancel()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
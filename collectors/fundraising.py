@@ -5,13 +5,17 @@ Fundraising collector.
 - Regex extraction из заголовков
 """
 
-import aiohttp
-import feedparser
+import asyncio
 import re
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from typing import Optional
 
+from collectors.articles import MAX_ENTRIES, entry_guid, entry_published
+from collectors.fetch import SingleFlight, fetch_feed, fetch_json, new_session
+from core.deadline import Deadline, run_budgeted
+from db.feeds import FeedCursor
+
 
 @dataclass
 class FundraisingRound:
@@ -37,6 +41,21 @@ TOP_INVESTORS = [
 ]
 
 
+DEFILLAMA_RAISES_URL = "https://api.llama.fi/raises"
+
+# Паттерны для извлечения fundraising
+FUNDRAISING_PATTERNS = [
+    re.compile(r"(.+?)\s+raises?\s+\$?([\d.]+)\s*(million|m|M|billion|b|B)", re.IGNORECASE),
+    re.compile(r"(.+?)\s+closes?\s+\$?([\d.]+)\s*(million|m|M|billion|b|B)", re.IGNORECASE),
+    re.compile(r"(.+?)\s+secures?\s+\$?([\d.]+)\s*(million|m|M|billion|b|B)", re.IGNORECASE),
+    re.compile(r"(.+?)\s+bags?\s+\$?([\d.]+)\s*(million|m|M|billion|b|B)", re.IGNORECASE),
+    re.compile(r"(.+?)\s+lands?\s+\$?([\d.]+)\s*(million|m|M|billion|b|B)", re.IGNORECASE),
+]
+
+ROUND_KEYWORDS = ["seed", "series", "funding", "raised", "raises", "investment",
+                  "venture", "valuation", "round", "backs", "leads"]
+
+
 def clean_url(url: str) -> str:
     """Убирает UTM параметры из URL"""
     if '?' in url:
@@ -45,129 +64,168 @@ def clean_url(url: str) -> str:
     return url
 
 
-async def fetch_defillama_raises() -> list[dict]:
+async def fetch_defillama_raises(session, timeout: float = 30, flights: SingleFlight = None) -> list[dict]:
     """DefiLlama API"""
-    url = "https://api.llama.fi/raises"
+    data = await fetch_json(session, DEFILLAMA_RAISES_URL, timeout, flights)
+    return data.get("raises", [])
 
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.get(url, timeout=aiohttp.ClientTimeout(total=30)) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    return data.get("raises", [])
-        except Exception as e:
-            print(f"DefiLlama error: {e}")
-    return []
 
+def extract_round(title: str) -> Optional[tuple[str, Optional[float], str]]:
+    """
+    (project, amount в $M, round_type) из заголовка новости.
+    None — заголовок не похож на fundraising.
+    """
+    title_lower = title.lower()
+    if not any(kw in title_lower for kw in ROUND_KEYWORDS):
+        return None
+
+    # Извлекаем сумму и название проекта
+    amount = None
+    project = "Unknown"
+    for pattern in FUNDRAISING_PATTERNS:
+        match = pattern.search(title)
+        if match:
+            try:
+                amount = float(match.group(2))
+                unit = match.group(3).lower()
+                if unit in ['billion', 'b']:
+                    amount *= 1000
+            except ValueError:
+                pass
+            project = match.group(1).strip()
+            break
+
+    if project == "Unknown":
+        # Fallback: первые слова до ключевого слова
+        for kw in ["raises", "closes", "secures", "bags", "lands"]:
+            if kw in title_lower:
+                idx = title_lower.index(kw)
+                project = title[:idx].strip()
+                break
+
+    # Определяем тип раунда
+    round_type = "Unknown"
+    for rt in ["Series D", "Series C", "Series B", "Series A", "Seed", "Pre-Seed", "Strategic"]:
+        if rt.lower() in title_lower:
+            round_type = rt
+            break
 
-def parse_fundraising_rss(feeds: dict, hours: int = 168) -> list[FundraisingRound]:
+    return project, amount, round_type
+
+
+def parse_fundraising_rss(feed, source_name: str, hours: int = 168,
+                          cursor: FeedCursor = None) -> list[FundraisingRound]:
     """
-    Парсит RSS feeds про fundraising и извлекает раунды из заголовков.
+    Извлекает раунды из заголовков уже загруженного RSS feed.
+    cursor — как в parse_rss: уже разобранные записи пропускаются.
     """
     rounds = []
     cutoff = datetime.now() - timedelta(hours=hours)
 
-    # Паттерны для извлечения fundraising
-    patterns = [
-        r"(.+?)\s+raises?\s+\$?([\d.]+)\s*(million|m|M|billion|b|B)",
-        r"(.+?)\s+closes?\s+\$?([\d.]+)\s*(million|m|M|billion|b|B)",
-        r"(.+?)\s+secures?\s+\$?([\d.]+)\s*(million|m|M|billion|b|B)",
-        r"(.+?)\s+bags?\s+\$?([\d.]+)\s*(million|m|M|billion|b|B)",
-        r"(.+?)\s+lands?\s+\$?([\d.]+)\s*(million|m|M|billion|b|B)",
-    ]
-
-    round_keywords = ["seed", "series", "funding", "raised", "raises", "investment",
-                      "venture", "valuation", "round", "backs", "leads"]
-
-    for source_name, feed_url in feeds.items():
-        try:
-            feed = feedparser.parse(feed_url)
-
-            for entry in feed.entries[:30]:
-                title = entry.get('title', '')
-                title_lower = title.lower()
-
-                # Проверяем, похоже ли на fundraising
-                if not any(kw in title_lower for kw in round_keywords):
-                    continue
-
-                # Парсим дату
-                pub_date = None
-                if hasattr(entry, 'published_parsed') and entry.published_parsed:
-                    pub_date = datetime(*entry.published_parsed[:6])
-                else:
-                    pub_date = datetime.now()
-
-                if pub_date < cutoff:
-                    continue
-
-                # Извлекаем сумму
-                amount = None
-                for pattern in patterns:
-                    match = re.search(pattern, title, re.IGNORECASE)
-                    if match:
-                        try:
-                            amount = float(match.group(2))
-                            unit = match.group(3).lower()
-                            if unit in ['billion', 'b']:
-                                amount *= 1000
-                        except:
-                            pass
-                        break
-
-                # Извлекаем название проекта
-                project = "Unknown"
-                for pattern in patterns:
-                    match = re.search(pattern, title, re.IGNORECASE)
-                    if match:
-                        project = match.group(1).strip()
-                        break
-
-                if project == "Unknown":
-                    # Fallback: первые слова до ключевого слова
-                    for kw in ["raises", "closes", "secures", "bags", "lands"]:
-                        if kw in title_lower:
-                            idx = title_lower.index(kw)
-                            project = title[:idx].strip()
-                            break
-
-                # Определяем тип раунда
-                round_type = "Unknown"
-                for rt in ["Series D", "Series C", "Series B", "Series A", "Seed", "Pre-Seed", "Strategic"]:
-                    if rt.lower() in title_lower:
-                        round_type = rt
-                        break
-
-                rounds.append(FundraisingRound(
-                    project=project[:50],  # лимит длины
-                    amount=amount,
-                    round_type=round_type,
-                    lead_investors=[],
-                    other_investors=[],
-                    category="",
-                    date=pub_date,
-                    source_url=clean_url(entry.link),
-                    source=source_name
-                ))
-
-        except Exception as e:
-            print(f"Error parsing {source_name}: {e}")
+    try:
+        for entry in feed.entries[:MAX_ENTRIES]:
+            if cursor is not None and cursor.seen(entry_guid(entry), entry_published(entry)):
+                continue
+
+            title = entry.get('title', '')
+
+            # Проверяем, похоже ли на fundraising
+            extracted = extract_round(title)
+            if extracted is None:
+                continue
+
+            # Парсим дату
+            pub_date = None
+            if hasattr(entry, 'published_parsed') and entry.published_parsed:
+                pub_date = datetime(*entry.published_parsed[:6])
+            else:
+                pub_date = datetime.now()
+
+            if pub_date < cutoff:
+                continue
+
+            project, amount, round_type = extracted
+            rounds.append(FundraisingRound(
+                project=project[:50],  # лимит длины
+                amount=amount,
+                round_type=round_type,
+                lead_investors=[],
+                other_investors=[],
+                category="",
+                date=pub_date,
+                source_url=clean_url(entry.link),
+                source=source_name
+            ))
+
+    except Exception as e:
+        print(f"Error parsing {source_name}: {e}")
 
     return rounds
 
 
-async def collect_fundraising(hours: int = 168, rss_feeds: dict = None) -> list[FundraisingRound]:
+async def fetch_fundraising_rss(session, feed_url: str, source_name: str, hours: int = 168,
+                                timeout: float = 15, flights: SingleFlight = None) -> list[FundraisingRound]:
+    feed = await fetch_feed(session, feed_url, timeout, flights)
+    return parse_fundraising_rss(feed, source_name, hours)
+
+
+async def collect_fundraising(
+    hours: int = 168,
+    rss_feeds: dict = None,
+    deadline: Deadline = None,
+    api_timeout: float = 30,
+    feed_timeout: float = 15,
+    flights: SingleFlight = None
+) -> list[FundraisingRound]:
     """
     Собирает fundraising из:
     1. DefiLlama API
     2. RSS feeds (crypto.news, theblock, coindesk)
+
+    Все запросы идут параллельно, каждый в рамках своего бюджета;
+    фиды, которые уже качает сбор статей, через flights берутся у него.
     """
     all_rounds = []
-    cutoff = datetime.now() - timedelta(hours=hours)
+    rss_feeds = rss_feeds or {}
+
+    print("  Fetching DefiLlama and fundraising RSS...")
+    async with new_session() as session:
+        raw_raises, *rss_results = await asyncio.gather(
+            run_budgeted(
+                "fundraising:defillama",
+                fetch_defillama_raises(session, api_timeout, flights),
+                deadline, api_timeout, default=[]
+            ),
+            *(
+                run_budgeted(
+                    f"fundraising_news:{name}",
+                    fetch_fundraising_rss(session, url, name, hours, feed_timeout, flights),
+                    deadline, feed_timeout, default=[]
+                )
+                for name, url in rss_feeds.items()
+            )
+        )
 
     # 1. DefiLlama API
-    print("  Fetching DefiLlama...")
-    raw_raises = await fetch_defillama_raises()
+    all_rounds.extend(parse_defillama_raises(raw_raises, hours))
+    print(f"  DefiLlama: {len(all_rounds)} rounds")
+
+    # 2. RSS feeds
+    if rss_feeds:
+        rss_rounds = [r for rounds in rss_results for r in rounds]
+        all_rounds.extend(rss_rounds)
+        print(f"  RSS: {len(rss_rounds)} rounds")
+
+    unique = merge_fundraising(all_rounds)
+    print(f"  Total unique: {len(unique)} rounds")
+
+    return unique
+
+
+def parse_defillama_raises(raw_raises: list[dict], hours: int = 168) -> list[FundraisingRound]:
+    """Раунды DefiLlama за последние N часов"""
+    rounds = []
+    cutoff = datetime.now() - timedelta(hours=hours)
 
     # Sort by date descending
     raw_raises_sorted = sorted(raw_raises, key=lambda x: x.get('date', 0), reverse=True)
@@ -180,7 +238,7 @@ async def collect_fundraising(hours: int = 168, rss_feeds: dict = None) -> list[
             continue
 
         if date > cutoff:
-            all_rounds.append(FundraisingRound(
+            rounds.append(FundraisingRound(
                 project=r.get("name", "Unknown"),
                 amount=r.get("amount"),
                 round_type=r.get("round", "Unknown"),
@@ -194,16 +252,11 @@ async def collect_fundraising(hours: int = 168, rss_feeds: dict = None) -> list[
         else:
             break  # Sorted by date, can stop early
 
-    print(f"  DefiLlama: {len(all_rounds)} rounds")
+    return rounds
 
-    # 2. RSS feeds
-    if rss_feeds:
-        print("  Parsing RSS feeds...")
-        rss_rounds = parse_fundraising_rss(rss_feeds, hours)
-        all_rounds.extend(rss_rounds)
-        print(f"  RSS: {len(rss_rounds)} rounds")
 
-    # Dedupe по project name (case insensitive)
+def merge_fundraising(all_rounds: list[FundraisingRound]) -> list[FundraisingRound]:
+    """Dedupe по project name (case insensitive) + scoring, лучшие сверху"""
     seen = {}
     unique = []
     for r in all_rounds:
@@ -222,8 +275,6 @@ async def collect_fundraising(hours: int = 168, rss_feeds: dict = None) -> list[
                 unique.append(r)
 
     unique.sort(key=lambda x: x.score, reverse=True)
-    print(f"  Total unique: {len(unique)} rounds")
-
     return unique
 
 
@@ -1,14 +1,65 @@
 """
-Scraper для сайтов без RSS (ARK Invest, Grayscale, Bitwise)
+Scraper для сайтов без RSS (ARK Invest, Grayscale, Bitwise, ...)
+
+Сайты описываются в rss_sources.json → institutional_scrape, код на
+каждый сайт не нужен:
+
+    "ark_invest": {
+        "url": "https://www.ark-invest.com/articles",
+        "item": "//a[contains(@href, '/articles/')]",
+        "title": ["(.//h2 | .//h3 | .//h4)[1]", "."],
+        "link": "@href",
+        "date": ".//time/@datetime",
+        "keywords": ["bitcoin", "crypto"],
+        "author": "ARK Invest"
+    }
+
+item — XPath карточек на странице, title / link / date — XPath внутри
+карточки (строка или список: берётся первый непустой). keywords —
+карточка проходит, если слово есть в заголовке или тексте карточки.
+Необязательные: date_format (strptime; иначе ISO 8601 / RFC 822),
+limit (5), min_title_length (0), hours (72). В XPath доступны
+регулярные выражения EXSLT: re:test(@class, 'card|post').
+
+Страница разбирается lxml без дерева BeautifulSoup, выражения
+компилируются один раз при загрузке конфига; все сайты качаются
+параллельно, каждый в своём бюджете.
+
+Неизменившаяся страница не разбирается (состояние — db/pages.py):
+
+    sitemap   — необязательный URL sitemap.xml: если lastmod страниц под
+                url сайта не вырос, сама страница даже не качается
+    хеш тела  — тот же ответ байт в байт
+    хеш карточек — поменялось только оформление вокруг списка
+
+Тогда статьи берутся из scraped_urls. У каждого URL хранится, когда он
+впервые появился на странице, — это дата публикации для карточек без
+даты (и верхняя граница для остальных).
 """
 
-import re
+import asyncio
+import hashlib
 from dataclasses import dataclass, field
-from datetime import datetime
-from typing import Optional
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import Mapping, Optional
+from urllib.parse import urljoin
 
 import aiohttp
-from bs4 import BeautifulSoup
+from lxml import etree, html
+
+from collectors.articles import Article
+from collectors.fetch import BROWSER_USER_AGENT, SingleFlight, fetch_bytes, new_session
+from core.deadline import Deadline, run_budgeted
+from db.aio import async_db
+from db.pages import ListedUrl, PageState, listed_urls, load_page_state, record_listing, save_page_state
+
+NAMESPACES = {"re": "http://exslt.org/regular-expressions"}
+SITEMAP_URLS = etree.XPath("//*[local-name()='url' or local-name()='sitemap']")
+SITEMAP_LOC = etree.XPath("string(*[local-name()='loc'])")
+SITEMAP_LASTMOD = etree.XPath("string(*[local-name()='lastmod'])")
+DEFAULT_LIMIT = 5
+DEFAULT_HOURS = 72
 
 
 @dataclass
@@ -21,133 +72,287 @@ class ScrapedArticle:
     summary: str = ""
     tags: list = field(default_factory=list)
 
-
-async def scrape_ark_invest(hours: int = 72) -> list[ScrapedArticle]:
-    """
-    Scrape ARK Invest articles
-    https://www.ark-invest.com/articles
-    """
-    url = "https://www.ark-invest.com/articles"
+    def to_article(self) -> Article:
+        """Scraped → VIP Article для дайджеста"""
+        return Article(
+            title=self.title,
+            author=self.author,
+            url=self.url,
+            source=self.source,
+            source_type="vip",
+            published_at=self.published_at or datetime.now(),
+            is_vip=True
+        )
+
+
+@dataclass(frozen=True)
+class SiteSpec:
+    """Скомпилированное описание сайта из institutional_scrape"""
+    name: str
+    url: str
+    item: etree.XPath
+    title: tuple[etree.XPath, ...]
+    link: tuple[etree.XPath, ...]
+    date: tuple[etree.XPath, ...] = ()
+    date_format: str = ""
+    keywords: tuple[str, ...] = ()
+    author: str = ""
+    limit: int = DEFAULT_LIMIT
+    min_title_length: int = 0
+    hours: int = DEFAULT_HOURS
+    sitemap: str = ""
+
+
+def compile_xpath(expr: str) -> etree.XPath:
+    """XPath с пространством re:; синтаксическая ошибка — ValueError"""
+    try:
+        return etree.XPath(expr, namespaces=NAMESPACES)
+    except etree.XPathSyntaxError as e:
+        raise ValueError(f"invalid XPath {expr!r}: {e}")
+
+
+def _compile_field(value) -> tuple[etree.XPath, ...]:
+    if value is None:
+        return ()
+    return tuple(compile_xpath(expr) for expr in ([value] if isinstance(value, str) else value))
+
+
+def compile_site(name: str, site: Mapping) -> SiteSpec:
+    return SiteSpec(
+        name=name,
+        url=site["url"],
+        item=compile_xpath(site["item"]),
+        title=_compile_field(site.get("title", ".")),
+        link=_compile_field(site.get("link", "@href")),
+        date=_compile_field(site.get("date")),
+        date_format=site.get("date_format", ""),
+        # filter_tags — старое имя того же фильтра
+        keywords=tuple(k.lower() for k in site.get("keywords", site.get("filter_tags", ()))),
+        author=site.get("author", ""),
+        limit=site.get("limit", DEFAULT_LIMIT),
+        min_title_length=site.get("min_title_length", 0),
+        hours=site.get("hours", DEFAULT_HOURS),
+        sitemap=site.get("sitemap", ""),
+    )
+
+
+def compile_sites(sites: Mapping[str, Mapping]) -> tuple[SiteSpec, ...]:
+    """institutional_scrape → таблица SiteSpec (как compile_feeds для RSS)"""
+    return tuple(compile_site(name, site) for name, site in sites.items())
+
+
+def _first_text(item, paths: tuple[etree.XPath, ...]) -> str:
+    """Первое непустое значение: текст элемента, атрибут или строка XPath"""
+    for path in paths:
+        result = path(item)
+        for value in result if isinstance(result, list) else [result]:
+            if hasattr(value, "text_content"):
+                value = value.text_content()
+            text = " ".join(str(value).split())
+            if text:
+                return text
+    return ""
+
+
+def parse_date(value: str, date_format: str = "") -> Optional[datetime]:
+    """Дата карточки → naive UTC, как даты из фидов"""
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        if date_format:
+            parsed = datetime.strptime(value, date_format)
+        else:
+            try:
+                parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+            except ValueError:
+                parsed = parsedate_to_datetime(value)
+    except (ValueError, TypeError):
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def listing_items(site: SiteSpec, root) -> list:
+    return [item for item in site.item(root) if isinstance(item, html.HtmlElement)]
+
+
+def region_hash(items: list) -> str:
+    """Хеш области с карточками — оформление страницы вокруг не влияет"""
+    digest = hashlib.blake2b(digest_size=16)
+    for item in items:
+        digest.update(etree.tostring(item))
+    return digest.hexdigest()
+
+
+def extract_articles(site: SiteSpec, items: list, now: datetime = None) -> list[ScrapedArticle]:
+    """Карточки → статьи: ссылка, заголовок, фильтр по словам, дата, limit"""
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(hours=site.hours)
     articles = []
-
-    async with aiohttp.ClientSession() as session:
-        headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
-
-        try:
-            async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=30)) as resp:
-                html = await resp.text()
-                soup = BeautifulSoup(html, 'lxml')
-
-                # ARK uses cards with links
-                article_links = soup.find_all('a', href=re.compile(r'/articles/'))
-
-                seen_urls = set()
-                for link in article_links:
-                    href = link.get('href', '')
-                    if href in seen_urls or not href:
-                        continue
-                    seen_urls.add(href)
-
-                    # Получаем заголовок
-                    title_elem = link.find(['h2', 'h3', 'h4'])
-                    if not title_elem:
-                        title_elem = link
-
-                    title = title_elem.get_text(strip=True)
-                    if not title or len(title) < 10:
-                        continue
-
-                    # Фильтруем только crypto-related
-                    crypto_keywords = ['bitcoin', 'crypto', 'blockchain', 'defi',
-                                       'stablecoin', 'digital asset', 'ethereum']
-                    title_lower = title.lower()
-                    if not any(kw in title_lower for kw in crypto_keywords):
-                        # Проверяем теги если есть
-                        tags_text = str(link.parent)
-                        if not any(kw in tags_text.lower() for kw in crypto_keywords):
-                            continue
-
-                    full_url = f"https://www.ark-invest.com{href}" if href.startswith('/') else href
-
-                    articles.append(ScrapedArticle(
-                        title=title,
-                        url=full_url,
-                        source="ark_invest",
-                        published_at=datetime.now(),
-                        author="ARK Invest"
-                    ))
-
-                    if len(articles) >= 10:
-                        break
-
-        except Exception as e:
-            print(f"    Error scraping ARK: {e}")
-
-    return articles[:5]
-
-
-async def scrape_grayscale_research(hours: int = 72) -> list[ScrapedArticle]:
+    seen_urls = set()
+    for item in items:
+        href = _first_text(item, site.link)
+        if not href:
+            continue
+        url = urljoin(site.url, href)
+        if url in seen_urls:
+            continue
+
+        title = _first_text(item, site.title)
+        if len(title) < max(site.min_title_length, 1):
+            continue
+        if site.keywords:
+            title_lower = title.lower()
+            if not any(kw in title_lower for kw in site.keywords):
+                text = item.text_content().lower()
+                if not any(kw in text for kw in site.keywords):
+                    continue
+
+        published_at = parse_date(_first_text(item, site.date), site.date_format) if site.date else None
+        if published_at is not None and published_at < cutoff:
+            continue
+
+        seen_urls.add(url)
+        articles.append(ScrapedArticle(
+            title=title,
+            url=url,
+            source=site.name,
+            published_at=published_at,
+            author=site.author
+        ))
+        if len(articles) >= site.limit:
+            break
+    return articles
+
+
+def _read_listing(site: SiteSpec, body: bytes) -> list:
+    try:
+        root = html.fromstring(body, base_url=site.url)
+    except (etree.ParserError, ValueError):
+        return []
+    return listing_items(site, root)
+
+
+def parse_site(site: SiteSpec, body: bytes, now: datetime = None) -> list[ScrapedArticle]:
+    """Карточки страницы по описанию сайта"""
+    return extract_articles(site, _read_listing(site, body), now)
+
+
+def parse_if_changed(site: SiteSpec, body: bytes, known_region: Optional[str],
+                     now: datetime = None) -> tuple[str, Optional[list[ScrapedArticle]]]:
+    """(хеш карточек, статьи); None вместо статей — карточки те же, что known_region"""
+    items = _read_listing(site, body)
+    region = region_hash(items)
+    if region == known_region:
+        return region, None
+    return region, extract_articles(site, items, now)
+
+
+def parse_sitemap(body: bytes, prefix: str) -> dict[str, datetime]:
     """
-    Scrape Grayscale Research
-    https://research.grayscale.com/
+    {loc: lastmod} из sitemap.xml — только URL под prefix. У индекса
+    sitemap'ов (<sitemapindex>) берутся все вложенные: их lastmod — признак
+    изменений на сайте вообще.
     """
-    url = "https://research.grayscale.com/"
-    articles = []
-
-    async with aiohttp.ClientSession() as session:
-        headers = {"User-Agent": "Mozilla/5.0"}
-
-        try:
-            async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=30)) as resp:
-                html = await resp.text()
-                soup = BeautifulSoup(html, 'lxml')
-
-                # Grayscale использует карточки
-                cards = soup.find_all(['article', 'div'], class_=re.compile(r'card|post|article'))
-
-                for card in cards[:10]:
-                    link = card.find('a', href=True)
-                    if not link:
-                        continue
-
-                    title_elem = card.find(['h2', 'h3', 'h4'])
-                    if not title_elem:
-                        continue
-
-                    title = title_elem.get_text(strip=True)
-                    href = link.get('href', '')
+    try:
+        root = etree.fromstring(body, etree.XMLParser(resolve_entities=False, no_network=True, huge_tree=True))
+    except etree.XMLSyntaxError:
+        return {}
+    is_index = etree.QName(root).localname == "sitemapindex"
+    lastmods = {}
+    for entry in SITEMAP_URLS(root):
+        loc = SITEMAP_LOC(entry).strip()
+        lastmod = parse_date(SITEMAP_LASTMOD(entry))
+        if loc and lastmod and (is_index or loc.startswith(prefix)):
+            lastmods[loc] = lastmod
+    return lastmods
+
+
+def _listed_articles(site: SiteSpec, listed: list[ListedUrl]) -> list[ScrapedArticle]:
+    # Дата с карточки или из sitemap, но не позже первого появления на странице
+    return [
+        ScrapedArticle(
+            title=u.title,
+            url=u.url,
+            source=site.name,
+            published_at=min(u.published_at, u.first_seen_at) if u.published_at else u.first_seen_at,
+            author=site.author
+        )
+        for u in listed
+    ]
+
+
+def _fresh(site: SiteSpec, articles: list[ScrapedArticle], now: datetime) -> list[ScrapedArticle]:
+    cutoff = now - timedelta(hours=site.hours)
+    return [a for a in articles if a.published_at >= cutoff][:site.limit]
+
+
+async def _sitemap_lastmods(site: SiteSpec, session: aiohttp.ClientSession, timeout: float,
+                            flights: SingleFlight = None) -> dict[str, datetime]:
+    try:
+        body, _ = await fetch_bytes(session, site.sitemap, timeout, {"User-Agent": BROWSER_USER_AGENT}, flights)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        print(f"    {site.name}: sitemap unavailable ({type(e).__name__}), checking the page")
+        return {}
+    return await asyncio.to_thread(parse_sitemap, body, site.url.rstrip("/"))
+
+
+async def _unchanged(site: SiteSpec, state: PageState, reason: str, now: datetime) -> list[ScrapedArticle]:
+    """Страница та же — статьи прошлого разбора из scraped_urls"""
+    await async_db.write(save_page_state, state, False)
+    listed = await async_db.read(listed_urls, site.name, state.listed_at)
+    print(f"    {site.name}: unchanged ({reason}), parse skipped")
+    return _fresh(site, _listed_articles(site, listed), now)
+
+
+async def scrape_site(site: SiteSpec, session: aiohttp.ClientSession, timeout: float = 30,
+                      now: datetime = None, flights: SingleFlight = None) -> list[ScrapedArticle]:
+    now = now or datetime.utcnow()
+    state = await async_db.read(load_page_state, site.name)
+    state.checked_at = now
+
+    lastmods = {}
+    if site.sitemap:
+        lastmods = await _sitemap_lastmods(site, session, timeout, flights)
+        latest = max(lastmods.values(), default=None)
+        if latest and state.listed_at and state.sitemap_lastmod and latest <= state.sitemap_lastmod:
+            return await _unchanged(site, state, "sitemap", now)
+        state.sitemap_lastmod = latest or state.sitemap_lastmod
+
+    body, _ = await fetch_bytes(session, site.url, timeout, {"User-Agent": BROWSER_USER_AGENT}, flights)
+    body_hash = hashlib.blake2b(body, digest_size=16).hexdigest()
+    if state.listed_at and body_hash == state.body_hash:
+        return await _unchanged(site, state, "same page", now)
+    state.body_hash = body_hash
+
+    known_region = state.region_hash if state.listed_at else None
+    state.region_hash, scraped = await asyncio.to_thread(parse_if_changed, site, body, known_region, now)
+    if scraped is None:
+        return await _unchanged(site, state, "same cards", now)
+
+    listing = [(s.url, s.title, s.published_at or lastmods.get(s.url)) for s in scraped]
+    listed = await async_db.write(record_listing, site.name, listing, now)
+    state.listed_at = now
+    await async_db.write(save_page_state, state, True)
+    return _fresh(site, _listed_articles(site, listed), now)
+
+
+async def collect_scraped_articles(sites: tuple[SiteSpec, ...], deadline: Deadline = None,
+                                   timeout: float = 30, flights: SingleFlight = None) -> list[ScrapedArticle]:
+    """Собирает статьи со всех scrape источников (параллельно, с бюджетом на сайт)"""
+    if not sites:
+        return []
+    print(f"  Scraping {', '.join(site.name for site in sites)}...")
+    async with new_session() as session:
+        results = await asyncio.gather(*(
+            run_budgeted(f"scrape:{site.name}", scrape_site(site, session, timeout, flights=flights), deadline, timeout, default=[])
+            for site in sites
+        ))
 
-                    if not title or not href:
-                        continue
-
-                    full_url = f"https://research.grayscale.com{href}" if href.startswith('/') else href
-
-                    articles.append(ScrapedArticle(
-                        title=title,
-                        url=full_url,
-                        source="grayscale",
-                        published_at=datetime.now(),
-                        author="Grayscale Research"
-                    ))
-
-        except Exception as e:
-            print(f"    Error scraping Grayscale: {e}")
-
-    return articles[:5]
-
-
-async def collect_scraped_articles() -> list[ScrapedArticle]:
-    """Собирает статьи со всех scrape источников"""
     all_articles = []
-
-    print("  Scraping ARK Invest...")
-    ark = await scrape_ark_invest()
-    all_articles.extend(ark)
-    print(f"    ARK: {len(ark)} articles")
-
-    print("  Scraping Grayscale...")
-    grayscale = await scrape_grayscale_research()
-    all_articles.extend(grayscale)
-    print(f"    Grayscale: {len(grayscale)} articles")
-
+    for site, articles in zip(sites, results):
+        all_articles.extend(articles)
+        print(f"    {site.name}: {len(articles)} articles")
     return all_articles
@@ -10,6 +10,7 @@ RSS format: https://{instance}/{handle}/rss
 """
 
 import asyncio
+import time
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from typing import Optional
@@ -41,18 +42,38 @@ class Tweet:
     tags: list = field(default_factory=list)
 
 
-async def get_working_nitter() -> Optional[str]:
-    """Find a working Nitter instance."""
+async def get_working_nitter(health=None) -> Optional[str]:
+    """
+    Find a working Nitter instance.
+
+    health: optional db.health.SourceHealth — instances with an open
+    circuit breaker are skipped, every probe is recorded.
+    """
     async with aiohttp.ClientSession() as session:
         for instance in NITTER_INSTANCES:
+            source = f"nitter:{instance}"
+            if health is not None and not health.allow(source):
+                health.record(source, "skipped")
+                continue
+
+            started = time.monotonic()
             try:
                 async with session.get(
                     f"https://{instance}",
                     timeout=aiohttp.ClientTimeout(total=5)
                 ) as resp:
+                    latency_ms = int((time.monotonic() - started) * 1000)
                     if resp.status == 200:
+                        if health is not None:
+                            health.record(source, "ok", latency_ms, entries=1)
                         return instance
-            except Exception:
+                    if health is not None:
+                        health.record(source, "error", latency_ms, f"HTTP {resp.status}")
+            except Exception as e:
+                if health is not None:
+                    latency_ms = int((time.monotonic() - started) * 1000)
+                    status = "timeout" if isinstance(e, asyncio.TimeoutError) else "error"
+                    health.record(source, status, latency_ms, type(e).__name__)
                 continue
     return None
 
@@ -106,13 +127,13 @@ def parse_nitter_rss(
     return tweets
 
 
-async def collect_tweets(accounts: list[dict], hours: int = 12) -> list[Tweet]:
+async def collect_tweets(accounts: list[dict], hours: int = 12, health=None) -> list[Tweet]:
     """
     Collect tweets from all accounts.
 
     accounts: [{"handle": "cobie", "category": "defi"}, ...]
     """
-    nitter = await get_working_nitter()
+    nitter = await get_working_nitter(health)
     if not nitter:
         print("No working Nitter instance found!")
         return []
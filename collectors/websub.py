@@ -0,0 +1,248 @@
+"""
+WebSub (PubSubHubbub) подписчик.
+
+Многие фиды (Substack, Medium, WordPress) объявляют hub через
+<link rel="hub">. Планировщик сообщает найденные hub'ы, мы подписываемся,
+подтверждаем подписку (GET с hub.challenge) и принимаем контент
+(POST с подписью X-Hub-Signature). Новые записи идут в тот же буфер
+db.pending, что и при опросе; пока подписка активна, фид не опрашивается.
+"""
+
+import asyncio
+import hashlib
+import hmac
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+import aiohttp
+import feedparser
+from aiohttp import web
+
+from collectors.articles import FeedSpec, advance_cursor, parse_rss
+from core.config import WebSub, get_config
+from db.aio import async_db
+from db.pending import add_pending_articles
+from db.store import get_store
+from db.websub import (
+    STATE_ACTIVE,
+    STATE_DENIED,
+    STATE_PENDING,
+    STATE_UNSUBSCRIBED,
+    Subscription,
+    get_subscription,
+    list_subscriptions,
+    mark_requested,
+    set_state,
+    upsert_subscription,
+)
+
+ARTICLE_HOURS = 24
+RENEW_CHECK_INTERVAL = timedelta(minutes=10).total_seconds()
+RESUBSCRIBE_AFTER = timedelta(hours=1)   # нет подтверждения от hub'а — пробуем снова
+
+SIGNATURE_ALGORITHMS = {
+    "sha1": hashlib.sha1,
+    "sha256": hashlib.sha256,
+    "sha384": hashlib.sha384,
+    "sha512": hashlib.sha512,
+}
+
+
+def discover_hub(feed) -> Optional[tuple[str, str]]:
+    """(hub, topic) из <link rel="hub"> / <link rel="self"> фида"""
+    hub = topic = None
+    for link in feed.feed.get("links", []):
+        rel = link.get("rel")
+        if rel == "hub" and not hub:
+            hub = link.get("href")
+        elif rel == "self" and not topic:
+            topic = link.get("href")
+    if not hub or not topic:
+        return None
+    return hub, topic
+
+
+def verify_signature(secret: str, body: bytes, header: Optional[str]) -> bool:
+    """Проверка X-Hub-Signature: "<алгоритм>=<hex hmac тела>" """
+    if not header or "=" not in header:
+        return False
+    algorithm, _, signature = header.partition("=")
+    digest = SIGNATURE_ALGORITHMS.get(algorithm.lower())
+    if digest is None:
+        return False
+    expected = hmac.new(secret.encode(), body, digest).hexdigest()
+    return hmac.compare_digest(expected, signature.strip())
+
+
+def needs_renewal(sub: Subscription, lease_seconds: int, now: datetime) -> bool:
+    if sub.state in (STATE_DENIED, STATE_UNSUBSCRIBED):
+        return False
+    if sub.state == STATE_PENDING:
+        return sub.requested_at is None or now - sub.requested_at > RESUBSCRIBE_AFTER
+    if sub.lease_expires_at is None:
+        return True
+    # Продлеваем заранее: за 10% аренды, но не меньше чем за час
+    margin = max(timedelta(seconds=lease_seconds * 0.1), timedelta(hours=1))
+    return sub.lease_expires_at - now < margin
+
+
+class WebSubReceiver:
+    """
+    Встроенный aiohttp-endpoint для push-доставки.
+
+    on_new_items(source, items) — тот же хук, что у FeedScheduler (алерты).
+    """
+
+    def __init__(self, settings: WebSub, on_new_items: Callable = None):
+        self.settings = settings
+        self.on_new_items = on_new_items
+        self.active: set[str] = set()
+        self.pushed = 0
+
+    async def refresh_active(self):
+        """Какие фиды сейчас приходят push'ем (до старта планировщика и после продлений)"""
+        now = datetime.now()
+        self.active = {s.source for s in await async_db.read(list_subscriptions) if s.is_active(now)}
+
+    def is_pushed(self, source: str) -> bool:
+        """Фид доставляется push'ем — опрашивать не нужно"""
+        return source in self.active
+
+    def callback_url(self, sub: Subscription) -> str:
+        return f"{self.settings.callback_url.rstrip('/')}/websub/{sub.id}"
+
+    # === Подписка ===
+
+    async def on_hub_discovered(self, source: str, hub: str, topic: str):
+        sub = await async_db.write(upsert_subscription, source, topic, hub)
+        if needs_renewal(sub, self.settings.lease_seconds, datetime.now()):
+            async with aiohttp.ClientSession() as session:
+                await self.subscribe(session, sub)
+
+    async def subscribe(self, session: aiohttp.ClientSession, sub: Subscription, mode: str = "subscribe"):
+        """Запрос подписки; hub подтвердит её отдельным GET на callback"""
+        data = {
+            "hub.mode": mode,
+            "hub.topic": sub.topic,
+            "hub.callback": self.callback_url(sub),
+            "hub.secret": sub.secret,
+            "hub.lease_seconds": str(self.settings.lease_seconds),
+        }
+        await async_db.write(mark_requested, sub.id)
+        try:
+            async with session.post(sub.hub, data=data, timeout=aiohttp.ClientTimeout(total=15)) as resp:
+                if resp.status not in (202, 204):
+                    print(f"  WebSub {mode} {sub.source} rejected by hub: HTTP {resp.status}")
+                    return False
+        except Exception as e:
+            print(f"  WebSub {mode} {sub.source} failed: {e}")
+            return False
+        print(f"  WebSub {mode} requested: {sub.source} via {sub.hub}")
+        return True
+
+    async def renew_loop(self, stop: asyncio.Event):
+        """Продление аренды и повтор неподтверждённых подписок"""
+        async with aiohttp.ClientSession() as session:
+            while not stop.is_set():
+                now = datetime.now()
+                for sub in await async_db.read(list_subscriptions):
+                    if needs_renewal(sub, self.settings.lease_seconds, now):
+                        await self.subscribe(session, sub)
+                await self.refresh_active()
+                try:
+                    await asyncio.wait_for(stop.wait(), RENEW_CHECK_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+
+    # === HTTP ===
+
+    async def handle_verify(self, request: web.Request) -> web.Response:
+        """Подтверждение (не)подписки от hub'а"""
+        sub = await async_db.read(get_subscription, int(request.match_info["sub_id"]))
+        query = request.query
+        mode = query.get("hub.mode")
+        if sub is None or query.get("hub.topic") != sub.topic:
+            return web.Response(status=404)
+
+        if mode == "denied":
+            await async_db.write(set_state, sub.id, STATE_DENIED)
+            self.active.discard(sub.source)
+            print(f"  WebSub denied: {sub.source} ({query.get('hub.reason', '')})")
+            return web.Response(text="ok")
+
+        challenge = query.get("hub.challenge")
+        if challenge is None:
+            return web.Response(status=400)
+
+        if mode == "subscribe":
+            try:
+                lease = int(query.get("hub.lease_seconds", self.settings.lease_seconds))
+            except ValueError:
+                lease = self.settings.lease_seconds
+            await async_db.write(set_state, sub.id, STATE_ACTIVE, datetime.now() + timedelta(seconds=lease))
+            self.active.add(sub.source)
+            print(f"  WebSub active: {sub.source} (lease {lease // 3600}h)")
+        elif mode == "unsubscribe":
+            await async_db.write(set_state, sub.id, STATE_UNSUBSCRIBED)
+            self.active.discard(sub.source)
+        else:
+            return web.Response(status=400)
+
+        return web.Response(text=challenge)
+
+    async def handle_push(self, request: web.Request) -> web.Response:
+        """Новый контент от hub'а"""
+        sub = await async_db.read(get_subscription, int(request.match_info["sub_id"]))
+        if sub is None:
+            return web.Response(status=410)
+
+        body = await request.read()
+        # По спецификации на неверную подпись отвечаем 2xx, но контент игнорируем
+        if not verify_signature(sub.secret, body, request.headers.get("X-Hub-Signature")):
+            print(f"  WebSub push for {sub.source} with bad signature, ignored")
+            return web.Response(status=202)
+
+        spec = self._feed_spec(sub.source)
+        if spec is None:
+            return web.Response(status=202)
+
+        feed = await asyncio.to_thread(feedparser.parse, body)
+        hours = spec.hours or ARTICLE_HOURS
+        # Курсор общий со страховочным опросом того же фида
+        cursor = await async_db.read(get_store().load_cursor, sub.source)
+        articles = parse_rss(feed, spec.name, spec.source_type, hours=hours, is_vip=spec.is_vip, cursor=cursor)
+        new = await async_db.write(add_pending_articles, spec.category, articles, hours)
+        await async_db.store_write(get_store().save_cursor, advance_cursor(cursor, feed))
+        self.pushed += len(new)
+        if new:
+            print(f"  [{datetime.now():%H:%M}] {sub.source}: {len(new)} new (push)")
+            if self.on_new_items:
+                await self.on_new_items(sub.source, new)
+        return web.Response(status=202)
+
+    @staticmethod
+    def _feed_spec(source: str) -> Optional[FeedSpec]:
+        for spec in get_config().feeds:
+            if f"{spec.category}:{spec.name}" == source:
+                return spec
+        return None
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/websub/{sub_id:\\d+}", self.handle_verify)
+        app.router.add_post("/websub/{sub_id:\\d+}", self.handle_push)
+        return app
+
+    async def run(self, stop: asyncio.Event = None):
+        """HTTP-сервер + цикл продления, до stop"""
+        stop = stop or asyncio.Event()
+        runner = web.AppRunner(self.app())
+        await runner.setup()
+        site = web.TCPSite(runner, self.settings.host, self.settings.port)
+        await site.start()
+        print(f"WebSub receiver on {self.settings.host}:{self.settings.port}, "
+              f"{len(self.active)} active subscriptions")
+        try:
+            await self.renew_loop(stop)
+        finally:
+            await runner.cleanup()
@@ -0,0 +1,260 @@
+"""
+JSON API только для чтения поверх архива дайджестов (db/archive.py) —
+для сервисов, которым дайджест нужен данными, а не сообщением Telegram.
+
+    GET /api/digests                  ?chat= &cursor= &limit=   список, от новых к старым
+    GET /api/digests/latest           ?chat=                    последний дайджест целиком
+    GET /api/digests/{id}                                       дайджест целиком
+    GET /api/digests/{id}/{section}                             одна секция (fundraising, research, ...)
+    GET /api/items                    ?section= &source= &topic= &since= &cursor= &limit=
+
+Документы дайджестов собираются один раз при записи в архив. Ответ API
+строится один раз на «поколение» архива (id последнего дайджеста) и
+держится в LRU готовым: тело, его gzip и ETag (хеш тела). If-None-Match
+с тем же ETag — 304 без тела, Accept-Encoding: gzip — сжатое тело без
+сжатия на запрос. Новый дайджест сбрасывает кэш (проверка раз в
+api.refresh_seconds); одновременные промахи по одному URL строят ответ
+один раз. Пагинация курсорная: next_cursor из ответа передаётся как
+?cursor= в следующий запрос.
+"""
+
+import asyncio
+import base64
+import gzip
+import hashlib
+import json
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+
+from aiohttp import web
+
+from core.config import Api
+from db.aio import async_db
+from db.archive import (
+    SECTIONS,
+    archive_generation,
+    latest_digest_id,
+    list_digests,
+    load_document,
+    query_items,
+)
+
+GZIP_MIN_BYTES = 512    # меньше — сжатие не окупается
+GZIP_LEVEL = 6
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class Prepared:
+    """Готовый ответ: тело, gzip (если стоит сжимать) и ETag"""
+    body: bytes
+    gzipped: Optional[bytes]
+    etag: str
+
+
+def prepare(body: bytes) -> Prepared:
+    etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+    gzipped = gzip.compress(body, GZIP_LEVEL) if len(body) >= GZIP_MIN_BYTES else None
+    return Prepared(body, gzipped, etag)
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(f"id:{last_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        prefix, value = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().split(":", 1)
+        if prefix != "id":
+            raise ValueError(prefix)
+        return int(value)
+    except (ValueError, UnicodeDecodeError):
+        raise ApiError(400, "invalid cursor") from None
+
+
+def page_json(rows: list[tuple[int, str]], limit: int, key: str) -> bytes:
+    """rows запрошены с limit + 1: лишняя строка — признак следующей страницы"""
+    next_cursor = encode_cursor(rows[limit - 1][0]) if len(rows) > limit else None
+    payloads = ",".join([payload for _, payload in rows[:limit]])
+    return f'{{"{key}":[{payloads}],"next_cursor":{json.dumps(next_cursor)}}}'.encode()
+
+
+class ApiServer:
+    """aiohttp-приложение + кэш готовых ответов по поколению архива"""
+
+    def __init__(self, settings: Api):
+        self.settings = settings
+        self.generation = 0
+        self.cache: OrderedDict[str, Prepared] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._building: dict[str, asyncio.Future] = {}
+
+    # === Параметры ===
+
+    def _limit(self, request: web.Request) -> int:
+        value = request.query.get("limit")
+        if value is None:
+            return self.settings.page_size
+        try:
+            limit = int(value)
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= self.settings.max_page_size:
+            raise ApiError(400, f"limit must be 1..{self.settings.max_page_size}")
+        return limit
+
+    @staticmethod
+    def _cursor(request: web.Request) -> Optional[int]:
+        cursor = request.query.get("cursor")
+        return decode_cursor(cursor) if cursor else None
+
+    @staticmethod
+    def _section(section: Optional[str]) -> Optional[str]:
+        if section and section not in SECTIONS:
+            raise ApiError(400, f"section must be one of {', '.join(SECTIONS)}")
+        return section
+
+    @staticmethod
+    async def _document(digest_id: Optional[int]) -> str:
+        document = await async_db.read(load_document, digest_id) if digest_id is not None else None
+        if document is None:
+            raise ApiError(404, "digest not found")
+        return document
+
+    # === Ответы (тело JSON; кэшируются в respond) ===
+
+    async def digests(self, request: web.Request) -> bytes:
+        limit = self._limit(request)
+        rows = await async_db.read(list_digests, self._cursor(request), limit + 1, request.query.get("chat"))
+        return page_json(rows, limit, "digests")
+
+    async def latest(self, request: web.Request) -> bytes:
+        digest_id = await async_db.read(latest_digest_id, request.query.get("chat"))
+        return (await self._document(digest_id)).encode()
+
+    async def digest(self, request: web.Request) -> bytes:
+        return (await self._document(int(request.match_info["digest_id"]))).encode()
+
+    async def section(self, request: web.Request) -> bytes:
+        digest_id = int(request.match_info["digest_id"])
+        section = request.match_info["section"]
+        if section not in SECTIONS:
+            raise ApiError(404, f"section must be one of {', '.join(SECTIONS)}")
+        items = json.loads(await self._document(digest_id))["sections"].get(section)
+        if items is None:
+            raise ApiError(404, f"section {section!r} is not in this digest")
+        return json.dumps({"digest_id": digest_id, "section": section, "items": items},
+                          ensure_ascii=False).encode()
+
+    async def items(self, request: web.Request) -> bytes:
+        query = request.query
+        limit = self._limit(request)
+        since = None
+        if query.get("since"):
+            try:
+                since = datetime.fromisoformat(query["since"])
+            except ValueError:
+                raise ApiError(400, "since must be an ISO date or datetime") from None
+        rows = await async_db.read(
+            query_items, self._section(query.get("section")), query.get("source"), query.get("topic"), since,
+            self._cursor(request), limit + 1
+        )
+        return page_json(rows, limit, "items")
+
+    # === Кэш и HTTP ===
+
+    async def _build(self, key: str, build: Callable[[web.Request], Awaitable[bytes]],
+                     request: web.Request) -> Prepared:
+        generation = self.generation
+        prepared = prepare(await build(request))
+        # Пока строили, мог прийти новый дайджест — тогда ответ не кэшируем
+        if self.settings.cache_entries and generation == self.generation:
+            self.cache[key] = prepared
+            while len(self.cache) > self.settings.cache_entries:
+                self.cache.popitem(last=False)
+        return prepared
+
+    async def respond(self, request: web.Request, build: Callable[[web.Request], Awaitable[bytes]]) -> web.Response:
+        key = request.path_qs
+        prepared = self.cache.get(key)
+        if prepared is not None:
+            self.cache.move_to_end(key)
+            self.hits += 1
+        else:
+            self.misses += 1
+            building = self._building.get(key)
+            if building is None:
+                building = self._building[key] = asyncio.ensure_future(self._build(key, build, request))
+                building.add_done_callback(lambda _: self._building.pop(key, None))
+            try:
+                prepared = await asyncio.shield(building)
+            except ApiError as e:
+                return web.json_response({"error": str(e)}, status=e.status)
+
+        headers = {"ETag": prepared.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if etag_matches(request.headers.get("If-None-Match"), prepared.etag):
+            return web.Response(status=304, headers=headers)
+        body = prepared.body
+        if prepared.gzipped is not None and "gzip" in request.headers.get("Accept-Encoding", ""):
+            headers["Content-Encoding"] = "gzip"
+            body = prepared.gzipped
+        return web.Response(body=body, headers=headers, content_type="application/json", charset="utf-8")
+
+    def route(self, build: Callable[[web.Request], Awaitable[bytes]]):
+        async def handler(request: web.Request) -> web.Response:
+            return await self.respond(request, build)
+        return handler
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/api/digests", self.route(self.digests))
+        app.router.add_get("/api/digests/latest", self.route(self.latest))
+        app.router.add_get("/api/digests/{digest_id:\\d+}", self.route(self.digest))
+        app.router.add_get("/api/digests/{digest_id:\\d+}/{section}", self.route(self.section))
+        app.router.add_get("/api/items", self.route(self.items))
+        return app
+
+    async def refresh(self):
+        """Новый дайджест в архиве — готовые ответы устарели"""
+        generation = await async_db.read(archive_generation)
+        if generation != self.generation:
+            self.generation = generation
+            self.cache.clear()
+
+    async def run(self, stop: asyncio.Event = None):
+        """HTTP-сервер + проверка поколения архива, до stop"""
+        stop = stop or asyncio.Event()
+        await self.refresh()
+        runner = web.AppRunner(self.app())
+        await runner.setup()
+        site = web.TCPSite(runner, self.settings.host, self.settings.port)
+        await site.start()
+        print(f"JSON API on http://{self.settings.host}:{self.settings.port}/api/digests "
+              f"(archive generation {self.generation})")
+        try:
+            while not stop.is_set():
+                try:
+                    await asyncio.wait_for(stop.wait(), self.settings.refresh_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                try:
+                    await self.refresh()
+                except Exception as e:
+                    print(f"  API: archive check failed: {e}")
+        finally:
+            await runner.cleanup()
@@ -0,0 +1,182 @@
+"""
+Дайджесты по чатам из одного прохода сбора.
+
+Дорогое считается один раз на прогон (extract_features): базовый скор
+статьи без тем и косинусы TF-IDF с темами (filters/relevance.py) —
+сразу для объединения тем всех профилей. На чат остаётся дешёвое: скор =
+база + вес × сумма косинусов с темами профиля, обход готового порядка с
+пропуском уже отправленного этому чату и top-K. Порядок статей
+кэшируется по набору тем, так что сотня чатов с одним профилем
+ранжируется один раз.
+"""
+
+from dataclasses import dataclass, field
+from typing import Mapping
+
+from collectors.articles import TOPIC_WEIGHT, VIP_SCORE, Article, base_score
+from collectors.fundraising import FundraisingRound
+from core.config import ChatProfile, RuntimeConfig
+from db.audience import fundraising_sent_key
+from db.pending import fundraising_key
+from filters.relevance import TopicScorer
+
+VIP_PER_SECTION = 7   # столько показывает DigestRenderer в research / protocols
+
+
+def profile_for(config: RuntimeConfig, chat_id: str) -> ChatProfile:
+    profile = config.chat_profiles.get(chat_id)
+    if profile is not None:
+        return profile
+    # Чат без своего профиля — профиль по умолчанию под его chat_id
+    return ChatProfile(
+        chat_id=chat_id,
+        name=chat_id,
+        topics=config.default_profile.topics,
+        topic_matcher=config.default_profile.topic_matcher,
+        sections=config.default_profile.sections,
+        limits=config.default_profile.limits,
+        language=config.default_profile.language,
+    )
+
+
+def audience(config: RuntimeConfig, chat_ids: list[str]) -> list[ChatProfile]:
+    """Чаты из окружения плюс чаты, описанные в chats.json"""
+    ids = list(dict.fromkeys(list(chat_ids) + list(config.chat_profiles)))
+    return [profile_for(config, chat_id) for chat_id in ids]
+
+
+@dataclass
+class Candidates:
+    """Общие для всех чатов кандидаты и их признаки"""
+    fundraising: list[FundraisingRound]
+    vip: list[Article]
+    regular: list[Article]
+    base_scores: list[float]                 # по regular
+    topic_scores: list[dict[str, float]]     # по regular: тема (нижний регистр) → косинус
+    _orders: dict = field(default_factory=dict)
+
+    def order_for(self, topics: tuple[str, ...]) -> list[int]:
+        """Индексы regular по убыванию скора для набора тем (кэш по набору)"""
+        key = frozenset(t.lower() for t in topics)
+        order = self._orders.get(key)
+        if order is None:
+            scores = [
+                base + sum(map(hits.__getitem__, key & hits.keys())) * TOPIC_WEIGHT if hits else base
+                for base, hits in zip(self.base_scores, self.topic_scores)
+            ]
+            # sorted стабилен — при равенстве порядок как у rank_articles
+            order = sorted(range(len(scores)), key=lambda i: -scores[i])
+            self._orders[key] = order
+        return order
+
+    def keys(self) -> tuple[list[str], list[str]]:
+        """Ключи дедупликации: (статьи, раунды)"""
+        urls = [a.url for a in self.vip] + [a.url for a in self.regular]
+        rounds = [fundraising_sent_key(r.project, r.round_type) for r in self.fundraising]
+        return urls, rounds
+
+
+def relevance_topics(profiles: list[ChatProfile], global_topics) -> tuple[str, ...]:
+    """Объединение тем всех профилей и глобальных (нижний регистр)"""
+    topics = {t.lower() for p in profiles for t in p.topics}
+    topics.update(t.lower() for t in global_topics)
+    return tuple(sorted(topics))
+
+
+def extract_features(fundraising: list[FundraisingRound], articles: tuple[list[Article], list[Article]],
+                     relevance: tuple[TopicScorer, list[set[str]]], global_topics,
+                     source_bonuses: Mapping[str, float], type_bonuses: Mapping[str, float]) -> Candidates:
+    """
+    relevance — скорер по relevance_topics и термины vip + regular (стадия
+    relevance). Заодно ставит a.tags по глобальным темам (как раньше) —
+    объекты общие, по чатам их не меняем.
+    """
+    vip, regular = articles
+    scorer, documents = relevance
+    rows = [scorer.named(row) for row in scorer.score_terms(documents)]
+    global_pairs = [(t, t.lower()) for t in global_topics]
+
+    for a, hits in zip(vip + regular, rows):
+        a.tags = [t for t, low in global_pairs if low in hits]
+
+    base_scores, topic_scores = [], []
+    for a, hits in zip(regular, rows[len(vip):]):
+        if a.is_vip:
+            # Как в rank_articles: VIP всегда сверху, темы не влияют
+            base_scores.append(VIP_SCORE)
+            topic_scores.append({})
+        else:
+            base_scores.append(base_score(a, source_bonuses, type_bonuses))
+            topic_scores.append(hits)
+
+    return Candidates(fundraising, vip, regular, base_scores, topic_scores)
+
+
+@dataclass
+class Selection:
+    """Что уходит в один чат"""
+    profile: ChatProfile
+    fundraising: list[FundraisingRound]
+    vip: list[Article]
+    regular: list[Article]
+
+    def items(self) -> dict:
+        """Материалы подборки для outbox: ключи отметки и поля общей истории"""
+        return {
+            "articles": [{"url": a.url, "title": a.title, "source": a.source}
+                         for a in self.vip + self.regular],
+            "rounds": [{"project": r.project, "round_type": r.round_type, "amount": r.amount,
+                        "source_url": r.source_url, "source": r.source, "lead_investors": r.lead_investors,
+                        "sent_key": fundraising_sent_key(r.project, r.round_type),
+                        "pending_key": fundraising_key(r)}
+                       for r in self.fundraising],
+        }
+
+    def sections(self) -> dict[str, list]:
+        """Материалы по секциям профиля в порядке дайджеста (архив для JSON API)"""
+        split = {
+            "fundraising": self.fundraising,
+            "research": [a for a in self.vip if a.source_type == "vip"],
+            "protocols": [a for a in self.vip if a.source_type == "protocol"],
+            "news": self.regular,
+        }
+        return {section: items for section, items in split.items() if section in self.profile.sections}
+
+    def __len__(self):
+        return len(self.fundraising) + len(self.vip) + len(self.regular)
+
+
+def select_for(candidates: Candidates, profile: ChatProfile,
+               sent_articles: set[str], sent_rounds: set[str]) -> Selection:
+    sections = profile.sections
+    limits = profile.limits
+
+    fundraising = []
+    if "fundraising" in sections:
+        for r in candidates.fundraising:
+            if len(fundraising) >= limits.fundraising_per_digest:
+                break
+            if fundraising_sent_key(r.project, r.round_type) not in sent_rounds:
+                fundraising.append(r)
+
+    vip = []
+    per_type = {"vip": 0, "protocol": 0}
+    wanted = {"vip": "research" in sections, "protocol": "protocols" in sections}
+    for a in candidates.vip:
+        if not wanted.get(a.source_type) or a.url in sent_articles:
+            continue
+        if per_type[a.source_type] < VIP_PER_SECTION:
+            per_type[a.source_type] += 1
+            vip.append(a)
+
+    regular = []
+    if "news" in sections:
+        for i in candidates.order_for(profile.topics):
+            if len(regular) >= limits.articles_per_digest:
+                break
+            a = candidates.regular[i]
+            if a.url not in sent_articles:
+                regular.append(a)
+
+    return Selection(profile, fundraising, vip, regular)
+
@@ -0,0 +1,604 @@
+"""
+Runtime-конфиг.
+
+rss_sources.json, topics.json, settings.json и необязательный chats.json
+компилируются один раз в неизменяемый RuntimeConfig (таблицы фидов,
+матчер тем, бонусы, лимиты, профили чатов).
+get_config() перечитывает файлы только при изменении mtime и
+подменяет объект целиком — читатели всегда видят согласованную версию.
+"""
+
+import json
+import os
+import threading
+from dataclasses import dataclass, replace
+from pathlib import Path
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+import pytz
+
+from collectors.articles import (
+    FEED_CATEGORIES,
+    SOURCE_BONUSES,
+    TYPE_BONUSES,
+    FeedSpec,
+    compile_feeds,
+)
+from collectors.scraper import SiteSpec, compile_site, compile_sites
+from filters.tagger import TopicMatcher
+
+CONFIG_DIR = Path(__file__).parent.parent / "config"
+CONFIG_FILES = ("rss_sources.json", "topics.json", "settings.json")
+OPTIONAL_FILES = ("chats.json",)
+
+SECTIONS = ("fundraising", "research", "protocols", "news", "trending")
+LANGUAGES = ("en", "ru")
+
+
+class ConfigError(ValueError):
+    """Невалидный или нечитаемый конфиг"""
+
+
+@dataclass(frozen=True)
+class Limits:
+    fundraising_per_digest: int = 10
+    articles_per_digest: int = 10
+    memory_budget_mb: Optional[int] = None   # пик памяти стадии в --profile-mem
+
+
+@dataclass(frozen=True)
+class Collection:
+    deadline_seconds: Optional[float] = None
+    feed_timeout: float = 15
+    api_timeout: float = 30
+    scrape_timeout: float = 30
+    concurrency: int = 16
+    cpu_pool: str = "thread"   # где ранжировать: "thread" или "process"
+
+
+@dataclass(frozen=True)
+class Schedule:
+    times: tuple[str, ...] = ("10:00", "20:00")
+    timezone: str = "Europe/Moscow"
+
+
+@dataclass(frozen=True)
+class Alerts:
+    enabled: bool = False
+    article_score: float = 70
+    fundraising_score: float = 60
+    vip: bool = True
+    max_age_hours: float = 6
+
+
+@dataclass(frozen=True)
+class WebSub:
+    enabled: bool = False
+    callback_url: str = ""        # публичный адрес, по которому hub достучится до бота
+    host: str = "0.0.0.0"
+    port: int = 8080
+    lease_seconds: int = 864000   # 10 дней
+
+
+@dataclass(frozen=True)
+class Delivery:
+    workers: int = 8               # одновременных отправок в Telegram
+    max_attempts: int = 5
+    retry_seconds: float = 15      # пауза перед повтором, удваивается с каждой попыткой
+    lease_seconds: float = 300     # через сколько брошенная отправка снова берётся в работу
+    max_age_hours: float = 12      # старше — не доставлять
+    drain_seconds: float = 60      # разовый прогон ждёт повторов не дольше; остальное — --deliver
+
+
+@dataclass(frozen=True)
+class Trending:
+    enabled: bool = True
+    window_hours: int = 24         # текущее окно
+    history_days: int = 7          # с чем сравнивать: столько прошлых окон того же размера
+    min_count: int = 3             # меньше упоминаний в окне — не тренд
+    min_z: float = 2.0             # порог всплеска (z-score к прошлым окнам)
+    top: int = 5
+
+
+@dataclass(frozen=True)
+class Workers:
+    enabled: bool = False          # --schedule тоже берёт источники через аренду (вместе с --worker)
+    lease_seconds: float = 120     # аренда источника; не продлённая — достаётся другому воркеру
+    heartbeat_seconds: float = 30  # как часто продлевать аренды опросов в работе
+
+
+MAX_COMMAND_RESULTS = 30    # ответ должен уместиться в одно сообщение (4096 символов)
+
+
+@dataclass(frozen=True)
+class Commands:
+    enabled: bool = False          # --schedule отвечает на /latest, /fundraising, /topic, /search
+    poll_timeout: int = 30         # long polling getUpdates, с
+    results: int = 10              # материалов в ответе
+    hours: float = 48              # сколько держать собранное в кэше
+    refresh_seconds: float = 60    # как часто дочитывать буфер (материалы воркеров --worker)
+
+
+@dataclass(frozen=True)
+class Api:
+    enabled: bool = False          # --schedule поднимает JSON API (иначе — отдельно: python main.py --api)
+    host: str = "127.0.0.1"
+    port: int = 8090
+    page_size: int = 50            # материалов / дайджестов на страницу по умолчанию
+    max_page_size: int = 200
+    cache_entries: int = 1024      # готовых ответов в памяти (LRU); 0 — без кэша
+    refresh_seconds: float = 5     # как часто проверять, не появился ли новый дайджест
+
+
+STORE_BACKENDS = ("sqlite", "memory", "kv")
+
+
+@dataclass(frozen=True)
+class Store:
+    backend: str = "sqlite"        # история отправленного, курсоры фидов, счётчики (db/store.py)
+    url: str = ""                  # kv: адрес сервера, например http://127.0.0.1:8091
+    timeout: float = 5             # kv: таймаут запроса, с
+    retention_days: int = 30       # kv: TTL записей истории на сервере
+
+
+@dataclass(frozen=True)
+class ChatProfile:
+    """Подписка чата: свои темы, секции, лимиты и язык"""
+    chat_id: str
+    name: str
+    topics: tuple[str, ...]
+    topic_matcher: TopicMatcher
+    sections: tuple[str, ...]
+    limits: Limits
+    language: str = "en"
+
+
+@dataclass(frozen=True)
+class RuntimeConfig:
+    sources: Mapping
+    feeds: tuple[FeedSpec, ...]
+    fundraising_feeds: Mapping[str, str]
+    scrape_sites: Mapping[str, Mapping]
+    scrapers: tuple[SiteSpec, ...]
+    priority_topics: tuple[str, ...]
+    topic_matcher: TopicMatcher
+    source_bonuses: Mapping[str, float]
+    type_bonuses: Mapping[str, float]
+    limits: Limits
+    collection: Collection
+    schedule: Schedule
+    alerts: Alerts
+    websub: WebSub
+    delivery: Delivery
+    trending: Trending
+    workers: Workers
+    commands: Commands
+    api: Api
+    store: Store
+    default_profile: ChatProfile
+    chat_profiles: Mapping[str, ChatProfile]
+    fundraising_hours: int
+    settings: Mapping
+    config_dir: Path
+    mtimes: tuple
+
+
+def freeze(value):
+    """Рекурсивно делает dict/list неизменяемыми"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def _read_json(path: Path) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        raise ConfigError(f"{path.name}: file not found ({path})")
+    except json.JSONDecodeError as e:
+        raise ConfigError(f"{path.name}: invalid JSON at line {e.lineno}, column {e.colno}: {e.msg}")
+    if not isinstance(data, dict):
+        raise ConfigError(f"{path.name}: top level must be an object")
+    return data
+
+
+def _check_url_table(file: str, key: str, table) -> None:
+    if not isinstance(table, dict):
+        raise ConfigError(f"{file}: '{key}' must be an object of name -> url")
+    for name, url in table.items():
+        if not isinstance(url, str) or not url.startswith(("http://", "https://")):
+            raise ConfigError(f"{file}: '{key}.{name}' must be an http(s) URL, got {url!r}")
+
+
+def _check_number_table(file: str, key: str, table) -> None:
+    if not isinstance(table, dict):
+        raise ConfigError(f"{file}: '{key}' must be an object of name -> number")
+    for name, value in table.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ConfigError(f"{file}: '{key}.{name}' must be a number, got {value!r}")
+
+
+def _positive_number(file: str, key: str, value) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+        raise ConfigError(f"{file}: '{key}' must be a positive number, got {value!r}")
+    return value
+
+
+def _positive_int(file: str, key: str, value) -> int:
+    if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+        raise ConfigError(f"{file}: '{key}' must be a positive integer, got {value!r}")
+    return value
+
+
+def _is_hhmm(value: str) -> bool:
+    hours, sep, minutes = value.partition(":")
+    return (sep == ":" and hours.isdigit() and minutes.isdigit() and len(minutes) == 2
+            and 0 <= int(hours) < 24 and 0 <= int(minutes) < 60)
+
+
+def validate_sources(sources: dict) -> None:
+    file = "rss_sources.json"
+    for category, *_ in FEED_CATEGORIES:
+        if category in sources:
+            _check_url_table(file, category, sources[category])
+    if "fundraising_news" in sources:
+        _check_url_table(file, "fundraising_news", sources["fundraising_news"])
+
+    tags = sources.get("medium_tags", [])
+    if not isinstance(tags, list) or not all(isinstance(t, str) and t for t in tags):
+        raise ConfigError(f"{file}: 'medium_tags' must be a list of non-empty strings")
+
+    sites = sources.get("institutional_scrape", {})
+    if not isinstance(sites, dict):
+        raise ConfigError(f"{file}: 'institutional_scrape' must be an object")
+    for name, site in sites.items():
+        key = f"institutional_scrape.{name}"
+        if not isinstance(site, dict) or not isinstance(site.get("url"), str) or not isinstance(site.get("item"), str):
+            raise ConfigError(f"{file}: '{key}' must be an object with 'url' and 'item' (XPath of a card)")
+        _check_url_table(file, "institutional_scrape", {name: site["url"]})
+        if "sitemap" in site:
+            _check_url_table(file, "institutional_scrape", {f"{name}.sitemap": site["sitemap"]})
+        for field in ("title", "link", "date"):
+            value = site.get(field)
+            if value is not None and not (
+                isinstance(value, str) or isinstance(value, list) and value and all(isinstance(v, str) for v in value)
+            ):
+                raise ConfigError(f"{file}: '{key}.{field}' must be an XPath or a list of XPaths")
+        keywords = site.get("keywords", site.get("filter_tags", []))
+        if not isinstance(keywords, list) or not all(isinstance(k, str) and k for k in keywords):
+            raise ConfigError(f"{file}: '{key}.keywords' must be a list of non-empty strings")
+        for field in ("limit", "hours"):
+            if field in site:
+                _positive_int(file, f"{key}.{field}", site[field])
+        min_title = site.get("min_title_length", 0)
+        if isinstance(min_title, bool) or not isinstance(min_title, int) or min_title < 0:
+            raise ConfigError(f"{file}: '{key}.min_title_length' must be a non-negative integer, got {min_title!r}")
+        try:
+            compile_site(name, site)
+        except ValueError as e:
+            raise ConfigError(f"{file}: '{key}': {e}")
+
+
+def validate_topics(topics: dict) -> None:
+    priority = topics.get("priority_topics", [])
+    if not isinstance(priority, list) or not all(isinstance(t, str) and t.strip() for t in priority):
+        raise ConfigError("topics.json: 'priority_topics' must be a list of non-empty strings")
+
+
+def validate_chats(chats: dict) -> None:
+    file = "chats.json"
+
+    def check_profile(key: str, profile):
+        if not isinstance(profile, dict):
+            raise ConfigError(f"{file}: '{key}' must be an object")
+        topics = profile.get("topics")
+        if topics is not None and (not isinstance(topics, list)
+                                   or not all(isinstance(t, str) and t.strip() for t in topics)):
+            raise ConfigError(f"{file}: '{key}.topics' must be a list of non-empty strings")
+        sections = profile.get("sections", list(SECTIONS))
+        if not isinstance(sections, list) or not all(s in SECTIONS for s in sections):
+            raise ConfigError(f"{file}: '{key}.sections' must be a list of {', '.join(SECTIONS)}, got {sections!r}")
+        limits = profile.get("limits", {})
+        if not isinstance(limits, dict):
+            raise ConfigError(f"{file}: '{key}.limits' must be an object")
+        for name, value in limits.items():
+            if name not in ("fundraising_per_digest", "articles_per_digest"):
+                raise ConfigError(f"{file}: '{key}.limits.{name}' is not a per-chat limit")
+            _positive_int(file, f"{key}.limits.{name}", value)
+        language = profile.get("language", "en")
+        if language not in LANGUAGES:
+            raise ConfigError(f"{file}: '{key}.language' must be one of {', '.join(LANGUAGES)}, got {language!r}")
+
+    check_profile("default", chats.get("default", {}))
+    profiles = chats.get("chats", {})
+    if not isinstance(profiles, dict):
+        raise ConfigError(f"{file}: 'chats' must be an object of chat_id → profile")
+    for chat_id, profile in profiles.items():
+        check_profile(f"chats.{chat_id}", profile)
+
+
+def compile_profile(chat_id: str, profile: dict, base: Optional[ChatProfile],
+                    priority_topics: tuple[str, ...], limits: Limits) -> ChatProfile:
+    """Профиль поверх base (профиля по умолчанию); без base — поверх глобальных настроек"""
+    if base is not None:
+        priority_topics, limits = base.topics, base.limits
+    topics = tuple(profile["topics"]) if profile.get("topics") is not None else priority_topics
+    return ChatProfile(
+        chat_id=chat_id,
+        name=profile.get("name", chat_id),
+        topics=topics,
+        topic_matcher=TopicMatcher(topics),
+        sections=tuple(profile.get("sections", base.sections if base else SECTIONS)),
+        limits=replace(limits, **profile.get("limits", {})),
+        language=profile.get("language", base.language if base else "en"),
+    )
+
+
+def validate_settings(settings: dict) -> None:
+    file = "settings.json"
+    _positive_int(file, "fundraising_hours", settings.get("fundraising_hours", 168))
+
+    limits = settings.get("limits", {})
+    if not isinstance(limits, dict):
+        raise ConfigError(f"{file}: 'limits' must be an object")
+    for key, value in limits.items():
+        if key == "memory_budget_mb" and value is None:
+            continue
+        _positive_int(file, f"limits.{key}", value)
+
+    collection = settings.get("collection", {})
+    if not isinstance(collection, dict):
+        raise ConfigError(f"{file}: 'collection' must be an object")
+    for key, value in collection.items():
+        if key == "deadline_seconds" and value is None:
+            continue
+        if key == "cpu_pool":
+            if value not in ("thread", "process"):
+                raise ConfigError(f"{file}: 'collection.cpu_pool' must be \"thread\" or \"process\", got {value!r}")
+        elif key == "concurrency":
+            _positive_int(file, f"collection.{key}", value)
+        else:
+            _positive_number(file, f"collection.{key}", value)
+
+    schedule = settings.get("schedule", {})
+    if not isinstance(schedule, dict):
+        raise ConfigError(f"{file}: 'schedule' must be an object")
+    times = schedule.get("times", [])
+    if not isinstance(times, list) or not all(isinstance(t, str) and _is_hhmm(t) for t in times):
+        raise ConfigError(f"{file}: 'schedule.times' must be a list of \"HH:MM\" strings, got {times!r}")
+    timezone = schedule.get("timezone", Schedule.timezone)
+    try:
+        pytz.timezone(timezone)
+    except pytz.UnknownTimeZoneError:
+        raise ConfigError(f"{file}: 'schedule.timezone' is not a known timezone: {timezone!r}")
+
+    alerts = settings.get("alerts", {})
+    if not isinstance(alerts, dict):
+        raise ConfigError(f"{file}: 'alerts' must be an object")
+    for key, value in alerts.items():
+        if key in ("enabled", "vip"):
+            if not isinstance(value, bool):
+                raise ConfigError(f"{file}: 'alerts.{key}' must be true or false, got {value!r}")
+        else:
+            _positive_number(file, f"alerts.{key}", value)
+
+    websub = settings.get("websub", {})
+    if not isinstance(websub, dict):
+        raise ConfigError(f"{file}: 'websub' must be an object")
+    if not isinstance(websub.get("enabled", False), bool):
+        raise ConfigError(f"{file}: 'websub.enabled' must be true or false")
+    for key in ("port", "lease_seconds"):
+        if key in websub:
+            _positive_int(file, f"websub.{key}", websub[key])
+    callback_url = websub.get("callback_url", "")
+    if not isinstance(callback_url, str) or (callback_url and not callback_url.startswith(("http://", "https://"))):
+        raise ConfigError(f"{file}: 'websub.callback_url' must be an http(s) URL, got {callback_url!r}")
+    if websub.get("enabled") and not callback_url:
+        raise ConfigError(f"{file}: 'websub.callback_url' is required when websub is enabled")
+
+    delivery = settings.get("delivery", {})
+    if not isinstance(delivery, dict):
+        raise ConfigError(f"{file}: 'delivery' must be an object")
+    for key, value in delivery.items():
+        if key in ("workers", "max_attempts"):
+            _positive_int(file, f"delivery.{key}", value)
+        else:
+            _positive_number(file, f"delivery.{key}", value)
+
+    trending = settings.get("trending", {})
+    if not isinstance(trending, dict):
+        raise ConfigError(f"{file}: 'trending' must be an object")
+    for key, value in trending.items():
+        if key == "enabled":
+            if not isinstance(value, bool):
+                raise ConfigError(f"{file}: 'trending.enabled' must be true or false, got {value!r}")
+        elif key in ("window_hours", "history_days", "min_count", "top"):
+            _positive_int(file, f"trending.{key}", value)
+        else:
+            _positive_number(file, f"trending.{key}", value)
+
+    workers = settings.get("workers", {})
+    if not isinstance(workers, dict):
+        raise ConfigError(f"{file}: 'workers' must be an object")
+    for key, value in workers.items():
+        if key == "enabled":
+            if not isinstance(value, bool):
+                raise ConfigError(f"{file}: 'workers.enabled' must be true or false, got {value!r}")
+        else:
+            _positive_number(file, f"workers.{key}", value)
+    if workers.get("heartbeat_seconds", Workers.heartbeat_seconds) >= workers.get("lease_seconds", Workers.lease_seconds):
+        raise ConfigError(f"{file}: 'workers.heartbeat_seconds' must be shorter than 'workers.lease_seconds'")
+
+    commands = settings.get("commands", {})
+    if not isinstance(commands, dict):
+        raise ConfigError(f"{file}: 'commands' must be an object")
+    for key, value in commands.items():
+        if key == "enabled":
+            if not isinstance(value, bool):
+                raise ConfigError(f"{file}: 'commands.enabled' must be true or false, got {value!r}")
+        elif key in ("poll_timeout", "results"):
+            _positive_int(file, f"commands.{key}", value)
+        else:
+            _positive_number(file, f"commands.{key}", value)
+    if commands.get("results", Commands.results) > MAX_COMMAND_RESULTS:
+        raise ConfigError(f"{file}: 'commands.results' must be at most {MAX_COMMAND_RESULTS}")
+
+    api = settings.get("api", {})
+    if not isinstance(api, dict):
+        raise ConfigError(f"{file}: 'api' must be an object")
+    for key, value in api.items():
+        if key == "enabled":
+            if not isinstance(value, bool):
+                raise ConfigError(f"{file}: 'api.enabled' must be true or false, got {value!r}")
+        elif key == "host":
+            if not isinstance(value, str) or not value:
+                raise ConfigError(f"{file}: 'api.host' must be a non-empty string, got {value!r}")
+        elif key == "cache_entries":
+            if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+                raise ConfigError(f"{file}: 'api.cache_entries' must be a non-negative integer, got {value!r}")
+        elif key in ("port", "page_size", "max_page_size"):
+            _positive_int(file, f"api.{key}", value)
+        else:
+            _positive_number(file, f"api.{key}", value)
+    if api.get("page_size", Api.page_size) > api.get("max_page_size", Api.max_page_size):
+        raise ConfigError(f"{file}: 'api.page_size' must not exceed 'api.max_page_size'")
+
+    store = settings.get("store", {})
+    if not isinstance(store, dict):
+        raise ConfigError(f"{file}: 'store' must be an object")
+    backend = store.get("backend", Store.backend)
+    if backend not in STORE_BACKENDS:
+        raise ConfigError(f"{file}: 'store.backend' must be one of {', '.join(STORE_BACKENDS)}, got {backend!r}")
+    if backend == "kv":
+        _check_url_table(file, "store", {"url": store.get("url")})
+    if "timeout" in store:
+        _positive_number(file, "store.timeout", store["timeout"])
+    if "retention_days" in store:
+        _positive_int(file, "store.retention_days", store["retention_days"])
+
+    ranking = settings.get("ranking", {})
+    if not isinstance(ranking, dict):
+        raise ConfigError(f"{file}: 'ranking' must be an object")
+    for key in ("source_bonuses", "type_bonuses"):
+        if key in ranking:
+            _check_number_table(file, f"ranking.{key}", ranking[key])
+
+
+def compile_config(rss_sources: dict, topics: dict, settings: dict, chats: dict = None,
+                   config_dir: Path = CONFIG_DIR, mtimes: tuple = ()) -> RuntimeConfig:
+    """Валидирует сырые JSON и собирает RuntimeConfig"""
+    chats = chats or {}
+    validate_sources(rss_sources)
+    validate_topics(topics)
+    validate_settings(settings)
+    validate_chats(chats)
+
+    priority_topics = tuple(topics.get("priority_topics", []))
+    ranking = settings.get("ranking", {})
+    limits = settings.get("limits", {})
+    collection = settings.get("collection", {})
+    schedule = settings.get("schedule", {})
+    alerts = settings.get("alerts", {})
+    websub = settings.get("websub", {})
+    delivery = settings.get("delivery", {})
+    trending = settings.get("trending", {})
+    workers = settings.get("workers", {})
+    commands = settings.get("commands", {})
+    api = settings.get("api", {})
+    store = settings.get("store", {})
+
+    compiled_limits = Limits(**{k: v for k, v in limits.items() if k in Limits.__dataclass_fields__})
+    default_profile = compile_profile("", chats.get("default", {}), None, priority_topics, compiled_limits)
+    chat_profiles = {
+        str(chat_id): compile_profile(str(chat_id), profile, default_profile, priority_topics, compiled_limits)
+        for chat_id, profile in chats.get("chats", {}).items()
+    }
+
+    return RuntimeConfig(
+        sources=freeze(rss_sources),
+        feeds=compile_feeds(rss_sources),
+        fundraising_feeds=freeze(rss_sources.get("fundraising_news", {})),
+        scrape_sites=freeze(rss_sources.get("institutional_scrape", {})),
+        scrapers=compile_sites(rss_sources.get("institutional_scrape", {})),
+        priority_topics=priority_topics,
+        topic_matcher=TopicMatcher(priority_topics),
+        source_bonuses=freeze(ranking.get("source_bonuses", SOURCE_BONUSES)),
+        type_bonuses=freeze(ranking.get("type_bonuses", TYPE_BONUSES)),
+        limits=compiled_limits,
+        collection=Collection(**{k: v for k, v in collection.items() if k in Collection.__dataclass_fields__}),
+        schedule=Schedule(
+            times=tuple(schedule.get("times", Schedule.times)),
+            timezone=schedule.get("timezone", Schedule.timezone),
+        ),
+        alerts=Alerts(**{k: v for k, v in alerts.items() if k in Alerts.__dataclass_fields__}),
+        websub=WebSub(**{k: v for k, v in websub.items() if k in WebSub.__dataclass_fields__}),
+        delivery=Delivery(**{k: v for k, v in delivery.items() if k in Delivery.__dataclass_fields__}),
+        trending=Trending(**{k: v for k, v in trending.items() if k in Trending.__dataclass_fields__}),
+        workers=Workers(**{k: v for k, v in workers.items() if k in Workers.__dataclass_fields__}),
+        commands=Commands(**{k: v for k, v in commands.items() if k in Commands.__dataclass_fields__}),
+        api=Api(**{k: v for k, v in api.items() if k in Api.__dataclass_fields__}),
+        store=Store(**{k: v for k, v in store.items() if k in Store.__dataclass_fields__}),
+        default_profile=default_profile,
+        chat_profiles=MappingProxyType(chat_profiles),
+        fundraising_hours=settings.get("fundraising_hours", 168),
+        settings=freeze(settings),
+        config_dir=config_dir,
+        mtimes=mtimes,
+    )
+
+
+def _config_mtimes(config_dir: Path) -> tuple:
+    mtimes = []
+    for name in CONFIG_FILES + OPTIONAL_FILES:
+        try:
+            mtimes.append(os.stat(config_dir / name).st_mtime_ns)
+        except FileNotFoundError:
+            mtimes.append(None)
+    return tuple(mtimes)
+
+
+def load_config(config_dir: Path = CONFIG_DIR) -> RuntimeConfig:
+    """Читает и компилирует конфиг без кэша"""
+    mtimes = _config_mtimes(config_dir)
+    rss_sources, topics, settings = (_read_json(config_dir / name) for name in CONFIG_FILES)
+    chats_path = config_dir / "chats.json"
+    chats = _read_json(chats_path) if chats_path.exists() else {}
+    return compile_config(rss_sources, topics, settings, chats, config_dir, mtimes)
+
+
+_lock = threading.Lock()
+_current: Optional[RuntimeConfig] = None
+_failed_mtimes: Optional[tuple] = None     # невалидная версия: не перечитывать, пока файлы не изменятся
+
+
+def get_config(config_dir: Path = CONFIG_DIR) -> RuntimeConfig:
+    """
+    Текущий конфиг. Перекомпилируется, только если изменился mtime
+    одного из файлов. Если новая версия невалидна — остаётся прежняя
+    (и не перечитывается, пока файлы снова не изменятся).
+    """
+    global _current, _failed_mtimes
+    current = _current
+    mtimes = _config_mtimes(config_dir)
+    if current is not None and current.config_dir == config_dir and mtimes in (current.mtimes, _failed_mtimes):
+        return current
+
+    with _lock:
+        current = _current
+        if current is not None and current.config_dir == config_dir and mtimes in (current.mtimes, _failed_mtimes):
+            return current
+        try:
+            fresh = load_config(config_dir)
+        except ConfigError as e:
+            if current is None or current.config_dir != config_dir:
+                raise
+            _failed_mtimes = mtimes
+            print(f"Config reload failed, keeping previous version: {e}")
+            return current
+        _current = fresh
+        _failed_mtimes = None
+        return fresh
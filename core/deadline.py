@@ -0,0 +1,106 @@
+"""
+Общий дедлайн прогона и бюджеты на отдельные источники.
+
+Каждый источник получает min(свой таймаут, остаток дедлайна).
+Источник, не уложившийся в бюджет, отменяется и попадает в dropped —
+дайджест собирается из того, что успело прийти.
+
+Если к дедлайну привязан SourceHealth (db.health), каждый запрос
+записывается в историю, а источники с открытым breaker'ом пропускаются.
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Optional
+
+
+class Deadline:
+    """Дедлайн прогона (monotonic) + список отброшенных источников"""
+
+    def __init__(self, seconds: Optional[float] = None, health=None):
+        self.seconds = seconds
+        self.health = health
+        self.started = time.monotonic()
+        self.end = self.started + seconds if seconds else None
+        self.dropped: list[tuple[str, str]] = []
+
+    def remaining(self) -> Optional[float]:
+        if self.end is None:
+            return None
+        return max(0.0, self.end - time.monotonic())
+
+    def budget(self, cap: float) -> float:
+        """Бюджет источника: его таймаут, но не дальше дедлайна"""
+        remaining = self.remaining()
+        if remaining is None:
+            return cap
+        return min(cap, remaining)
+
+    @property
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def drop(self, source: str, reason: str):
+        self.dropped.append((source, reason))
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+
+def _error_class(e: Exception) -> str:
+    status = getattr(e, "status", None)
+    if isinstance(status, int):
+        return f"HTTP {status}"
+    return type(e).__name__
+
+
+async def run_budgeted(
+    source: str,
+    coro: Awaitable,
+    deadline: Optional[Deadline],
+    timeout: float,
+    default=None
+):
+    """
+    Выполняет coro в рамках бюджета источника.
+
+    Таймаут/дедлайн → источник в deadline.dropped, ошибка → лог;
+    в обоих случаях возвращается default, прогон продолжается.
+    """
+    health = deadline.health if deadline else None
+    if health is not None and not health.allow(source):
+        coro.close()
+        health.record(source, "skipped")
+        return default
+
+    budget = deadline.budget(timeout) if deadline else timeout
+    if budget <= 0:
+        coro.close()
+        if deadline:
+            deadline.drop(source, "deadline exceeded before start")
+        if health is not None:
+            health.record(source, "dropped")
+        return default
+
+    started = time.monotonic()
+    status, error_class, result = "ok", None, default
+    try:
+        result = await asyncio.wait_for(coro, budget)
+    except asyncio.TimeoutError:
+        # Не успел в свой таймаут — вина источника; срезан общим дедлайном — нет
+        own_timeout = budget >= timeout
+        reason = f"timeout {budget:.0f}s" if own_timeout else "deadline"
+        status = "timeout" if own_timeout else "dropped"
+        if deadline:
+            deadline.drop(source, reason)
+        print(f"    Dropped {source}: {reason}")
+    except Exception as e:
+        status, error_class = "error", _error_class(e)
+        print(f"    Error fetching {source}: {e}")
+
+    if health is not None:
+        latency_ms = int((time.monotonic() - started) * 1000)
+        entries = len(result) if status == "ok" and hasattr(result, "__len__") else 0
+        health.record(source, status, latency_ms, error_class, entries)
+    return result
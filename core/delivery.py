@@ -0,0 +1,203 @@
+"""
+Доставка дайджестов из outbox (db/outbox.py).
+
+Дайджест рендерится и сохраняется один раз, дальше пул воркеров
+разбирает доставки по чатам: временная ошибка — повтор с удвоением
+паузы (или через retry_after от Telegram), постоянная (чат не найден,
+бот удалён) — dead. Материалы отмечаются в истории чата (db/store.py)
+сразу перед подтверждением доставки, поэтому упавший посреди рассылки
+прогон при следующем запуске досылает только недоставленное.
+
+Отправка по частям (файл, затем страницы) запоминает, докуда дошла:
+повтор после ошибки на третьей странице из четырёх начнёт с третьей.
+Гарантия — «хотя бы один раз» для каждой части: если процесс упал после
+ответа Telegram, но до отметки, эта часть уйдёт повторно.
+
+Разовый прогон ждёт повторов своего дайджеста не дольше
+delivery.drain_seconds; остальное дошлют --deliver или фоновые воркеры.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+from telegram.error import BadRequest, Forbidden, RetryAfter
+
+from bot.telegram import send_digest
+from core.config import Delivery
+from db.aio import async_db
+from db.audience import KIND_ARTICLE, KIND_FUNDRAISING
+from db.outbox import (
+    ack_delivery,
+    claim_delivery,
+    delivered_items,
+    expire_stale,
+    fail_delivery,
+    item_keys,
+    next_attempt_at,
+    run_chats,
+    save_progress,
+)
+from db.pending import remove_pending
+from db.store import get_store
+
+IDLE_SECONDS = 60   # фоновый режим: как часто заглядывать в outbox без уведомлений
+
+# Повтор не поможет: чат удалён, бота выгнали, сообщение не принимается
+PERMANENT_ERRORS = (BadRequest, Forbidden)
+
+
+def retry_delay(settings: Delivery, attempts: int, error: Exception) -> Optional[float]:
+    """Через сколько секунд повторить; None — не повторять"""
+    if isinstance(error, PERMANENT_ERRORS) or attempts >= settings.max_attempts:
+        return None
+    if isinstance(error, RetryAfter):
+        retry_after = error.retry_after
+        return retry_after.total_seconds() if isinstance(retry_after, timedelta) else float(retry_after)
+    return settings.retry_seconds * 2 ** (attempts - 1)
+
+
+def run_delivered(run_id: str) -> tuple[dict, dict]:
+    """Материалы прогона, доставленные хотя бы в один чат: (url → статья, sent_key → раунд)"""
+    articles, rounds = {}, {}
+    for items in delivered_items(run_id):
+        articles.update((a["url"], a) for a in items["articles"])
+        rounds.update((r["sent_key"], r) for r in items["rounds"])
+    return articles, rounds
+
+
+async def settle_run(run_id: str):
+    """
+    Доставленное — в общую историю (статистика, отчёт по источникам, алерты);
+    из буфера уходит только то, что теперь есть у всех чатов прогона.
+    История пишется вне транзакции писателя SQLite (async_db.store_write).
+    """
+    articles, rounds = await async_db.read(run_delivered, run_id)
+    if not articles and not rounds:
+        return
+    await async_db.mark_rounds_sent([(r["project"], r["round_type"] or "unknown", r["amount"], r["source_url"],
+                                      r["source"], r.get("lead_investors")) for r in rounds.values()])
+    await async_db.mark_articles_sent([(a["url"], a["title"], a["source"]) for a in articles.values()])
+
+    store = get_store()
+    chats = await async_db.read(run_chats, run_id)
+    have = await async_db.read(store.chat_sent_keys, chats, KIND_ARTICLE, list(articles))
+    have_rounds = await async_db.read(store.chat_sent_keys, chats, KIND_FUNDRAISING, list(rounds))
+    await async_db.write(remove_pending, KIND_ARTICLE, [u for u in articles if all(u in have[c] for c in chats)])
+    await async_db.write(remove_pending, KIND_FUNDRAISING, [r["pending_key"] for k, r in rounds.items()
+                                                            if all(k in have_rounds[c] for c in chats)])
+
+
+@dataclass
+class DeliveryReport:
+    sent: int = 0
+    retrying: int = 0
+    dead: int = 0
+    expired: int = 0
+
+    def add(self, other: "DeliveryReport"):
+        self.sent += other.sent
+        self.retrying += other.retrying
+        self.dead += other.dead
+        self.expired += other.expired
+
+    def __str__(self):
+        return (f"{self.sent} sent, {self.retrying} retries, {self.dead} failed"
+                + (f", {self.expired} expired" if self.expired else ""))
+
+
+class DeliveryWorkers:
+    """
+    Разовый прогон: drain(run_id) — доставить всё готовое и дождаться
+    повторов своего прогона. Фоновый режим: run() — крутится всё время,
+    notify() будит после постановки нового дайджеста.
+    """
+
+    def __init__(self, bot_token: str, settings: Delivery, send=send_digest):
+        self.bot_token = bot_token
+        self.settings = settings
+        self.send = send
+        self._wake = asyncio.Event()
+
+    def notify(self):
+        self._wake.set()
+
+    async def _worker(self, report: DeliveryReport, touched: set[str]):
+        while True:
+            job = await async_db.write(claim_delivery, self.settings.lease_seconds)
+            if job is None:
+                return
+            chat_id = job["chat_id"]
+
+            async def progress(document_sent: bool, pages_sent: int, digest_id: int = job["digest_id"]):
+                await async_db.write(save_progress, digest_id, chat_id, document_sent, pages_sent)
+
+            if job["pages_sent"]:
+                print(f"   Resuming chat_id {chat_id} from page {job['pages_sent'] + 1}/{len(job['pages'])}")
+            try:
+                await self.send(self.bot_token, chat_id, job["message"], job["pages"],
+                                job["document_sent"], job["pages_sent"], progress)
+            except Exception as e:
+                delay = retry_delay(self.settings, job["attempts"], e)
+                if delay is None:
+                    await async_db.write(fail_delivery, job["digest_id"], chat_id, str(e), None)
+                    report.dead += 1
+                    print(f"   Failed to send to chat_id {chat_id} (attempt {job['attempts']}, giving up): {e}")
+                else:
+                    await async_db.write(fail_delivery, job["digest_id"], chat_id, str(e),
+                                         datetime.now() + timedelta(seconds=delay))
+                    report.retrying += 1
+                    print(f"   Failed to send to chat_id {chat_id} (attempt {job['attempts']}, "
+                          f"retry in {delay:.0f}s): {e}")
+                continue
+            # Сначала история чата, потом подтверждение: упали между ними — повтор, а не пропуск
+            await async_db.store_write(get_store().mark_chat_sent, chat_id, item_keys(job["items"]))
+            await async_db.write(ack_delivery, job["digest_id"], chat_id)
+            touched.add(job["run_id"])
+            report.sent += 1
+            print(f"   Sent to chat_id: {chat_id}")
+
+    async def deliver_due(self) -> DeliveryReport:
+        """Один проход: всё, что готово к отправке сейчас"""
+        report = DeliveryReport(expired=await async_db.write(expire_stale, self.settings.max_age_hours))
+        touched: set[str] = set()
+        await asyncio.gather(*(self._worker(report, touched) for _ in range(self.settings.workers)))
+        for run_id in touched:
+            await settle_run(run_id)
+        return report
+
+    async def drain(self, run_id: str) -> DeliveryReport:
+        """
+        Доставить прогон: все чаты получили или сдались — либо до
+        drain_seconds, дальше повторы остаются в outbox
+        """
+        report = DeliveryReport()
+        deadline = time.monotonic() + self.settings.drain_seconds
+        while True:
+            report.add(await self.deliver_due())
+            due = await async_db.read(next_attempt_at, self.settings.lease_seconds, run_id)
+            if due is None:
+                return report
+            wait = max(0.0, (due - datetime.now()).total_seconds())
+            if time.monotonic() + wait > deadline:
+                print(f"   Retries left in outbox (next at {due:%H:%M:%S}): python main.py --deliver")
+                return report
+            await asyncio.sleep(wait)
+
+    async def run(self):
+        """Фоновая доставка: готовое сразу, повторы — по next_attempt_at"""
+        while True:
+            report = await self.deliver_due()
+            if report.sent or report.dead:
+                print(f"Outbox: {report}")
+            due = await async_db.read(next_attempt_at, self.settings.lease_seconds)
+            timeout = IDLE_SECONDS
+            if due is not None:
+                timeout = min(timeout, max(0.0, (due - datetime.now()).total_seconds()))
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
@@ -0,0 +1,313 @@
+"""
+Дайджест как граф стадий.
+
+    fundraising ─┐
+    articles_rss ┼─ articles ─ relevance ─ features ─ sent_state ─ select ─ format ─ enqueue ─ deliver
+    scraped ─────┘                         └─ trends ───────────────────────┘        └─ archive
+    (+ health: запись здоровья источников после сбора, flights: отчёт общих загрузок)
+
+Сбор и признаки (features) считаются один раз на прогон; подборка,
+формат и отправка — по чатам (профили из chats.json, см. core/audience.py).
+Отрендеренное уходит в outbox, доставляют воркеры (core/delivery.py):
+отметка «отправлено» — по подтверждению доставки в конкретный чат.
+При сборке из буфера коллекторы заменяет одна стадия drain.
+Блокирующая работа (SQLite, признаки) уходит в пулы, см. core/pipeline.py.
+"""
+
+import uuid
+from datetime import datetime
+from functools import partial
+from typing import Optional
+
+import pytz
+
+from bot.telegram import DigestRenderer, RenderedDigest
+from collectors.articles import Article, collect_articles, merge_articles
+from collectors.fetch import SingleFlight
+from collectors.fundraising import collect_fundraising, merge_fundraising
+from collectors.scraper import collect_scraped_articles
+from core.audience import Candidates, Selection, audience, extract_features, relevance_topics, select_for
+from core.config import ChatProfile, Delivery, RuntimeConfig, Trending
+from core.deadline import Deadline
+from core.delivery import DeliveryWorkers
+from core.pipeline import Stage
+from db.archive import archive_digest, cleanup_archive
+from db.audience import KIND_ARTICLE, KIND_FUNDRAISING
+from db.database import incremental_vacuum
+from db.health import SourceHealth, cleanup_health
+from db.outbox import cleanup_outbox, enqueue_digests
+from db.pages import cleanup_scraped_urls
+from db.pending import drain_pending
+from db.relevance import cleanup_relevance_docs, fit_new, scorer_for
+from db.stats import record_dedupe
+from db.store import get_store
+from db.trends import DIM_TOPIC, Trend, cleanup_trends, record_collected, trending
+from filters.relevance import TopicScorer, cached_terms
+
+ARTICLE_HOURS = 24
+SHOW_CHATS = 10   # сколько чатов расписывать в логе
+
+
+# === Сбор ===
+
+def report_collection(deadline: Deadline, health: SourceHealth, *_):
+    """Записать здоровье источников и напечатать пропущенные/отброшенные"""
+    skipped = health.skipped()
+    health.flush()
+    print(f"\nCollected in {deadline.elapsed():.1f}s")
+    if skipped:
+        print(f"   Skipped {len(skipped)} sources (circuit open): {', '.join(skipped)}")
+    if deadline.dropped:
+        print(f"   Dropped {len(deadline.dropped)} sources:")
+        for source, reason in deadline.dropped:
+            print(f"     - {source}: {reason}")
+
+
+async def close_flights(flights: SingleFlight, *_):
+    """Общие загрузки прогона: сколько повторных запросов не ушло в сеть"""
+    await flights.close()
+    avoided = sum(flights.avoided.values())
+    if avoided:
+        print(f"   Shared fetches: {flights.requests} requests, {flights.fetches} downloads, "
+              f"{avoided} duplicate(s) avoided")
+        for url, n in flights.avoided.most_common():
+            print(f"     - {url}: x{n + 1}")
+
+
+def combine_articles(collected: tuple[list[Article], list[Article]], scraped: list) -> tuple[list, list]:
+    """Scrape institutional → VIP"""
+    vip_articles, regular_articles = collected
+    vip_articles.extend(s.to_article() for s in scraped)
+    return vip_articles, regular_articles
+
+
+def drain_buffer():
+    """Сбор уже сделан планировщиком — забираем буфер"""
+    batches, pending_rounds = drain_pending()
+    print(f"\nTaking {sum(len(b) for _, b in batches)} articles, "
+          f"{len(pending_rounds)} rounds from the pending buffer...")
+    return batches, pending_rounds
+
+
+# === Признаки, дедупликация и подборка по чатам ===
+
+def relevance_stage(topics: tuple[str, ...],
+                    articles: tuple[list[Article], list[Article]]) -> tuple[TopicScorer, list[set[str]]]:
+    """
+    Термины каждой статьи выделяются один раз: ими дообучается словарь
+    (только новые материалы) и по ним же считаются косинусы в features.
+    """
+    vip, regular = articles
+    items = vip + regular
+    scorer = scorer_for(topics)
+    urls = [a.url for a in items]
+    documents = cached_terms(scorer, urls, [f"{a.title} {a.summary}" for a in items])
+    fit_new(scorer, urls, documents)
+    return scorer, documents
+
+
+def trends_stage(settings: Trending, topics: tuple[str, ...], candidates: Candidates) -> tuple[Trend, ...]:
+    """
+    Новые материалы прогона — в часовые счётчики (уже учтённые алертами
+    или прошлым прогоном пропускаются), затем всплески тем: O(корзин).
+    """
+    articles = candidates.vip + candidates.regular
+    record_collected(articles, [a.tags for a in articles], candidates.fundraising)
+    if not settings.enabled:
+        return ()
+    trends = tuple(trending(DIM_TOPIC, settings.window_hours, settings.history_days, settings.min_count,
+                            settings.min_z, settings.top, keys=topics))
+    if trends:
+        print("   Trending: " + ", ".join(f"{t.key} (z={t.z:.1f})" for t in trends))
+    return trends
+
+
+def sent_state(profiles: list[ChatProfile], candidates: Candidates) -> dict[str, tuple[set, set]]:
+    """
+    Что из кандидатов каждый чат уже получил — два запроса на все чаты
+    в общее хранилище (db/store.py), так что реплики не шлют одно и то же
+    """
+    store = get_store()
+    chat_ids = [p.chat_id for p in profiles]
+    store.seed_chats(chat_ids)
+    urls, round_keys = candidates.keys()
+    sent_articles = store.chat_sent_keys(chat_ids, KIND_ARTICLE, urls)
+    sent_rounds = store.chat_sent_keys(chat_ids, KIND_FUNDRAISING, round_keys)
+    # Доля дублей для --stats: кандидаты × чаты против уже полученного
+    record_dedupe(KIND_ARTICLE, len(set(urls)) * len(chat_ids), sum(map(len, sent_articles.values())))
+    record_dedupe(KIND_FUNDRAISING, len(set(round_keys)) * len(chat_ids), sum(map(len, sent_rounds.values())))
+    return {chat_id: (sent_articles[chat_id], sent_rounds[chat_id]) for chat_id in chat_ids}
+
+
+def select_stage(profiles: list[ChatProfile], candidates: Candidates, sent: dict) -> list[Selection]:
+    print(f"   Candidates: {len(candidates.fundraising)} fundraising, "
+          f"{len(candidates.vip)} VIP, {len(candidates.regular)} regular")
+    selections = [select_for(candidates, p, *sent[p.chat_id]) for p in profiles]
+    for s in selections[:SHOW_CHATS]:
+        print(f"   {s.profile.name or 'preview'}: {len(s.fundraising)} fundraising, "
+              f"{len(s.vip)} VIP, {len(s.regular)} regular")
+    if len(selections) > SHOW_CHATS:
+        print(f"   ... and {len(selections) - SHOW_CHATS} more chats")
+    return selections
+
+
+# === Формат, outbox, доставка ===
+
+def format_stage(now: datetime, trend_hours: int, selections: list[Selection],
+                 trends: tuple[Trend, ...] = ()) -> list[tuple[RenderedDigest, list[Selection]]]:
+    """(дайджест, подборки с ним): одинаковые подборки рендерятся один раз"""
+    is_morning = now.hour < 14
+    renderer = DigestRenderer()
+    rendered: dict[int, tuple[RenderedDigest, list[Selection]]] = {}
+    for s in selections:
+        digest = renderer.render(
+            s.fundraising,
+            s.vip,
+            s.regular,
+            is_morning=is_morning,
+            sections=s.profile.sections,
+            language=s.profile.language,
+            trending=trends,
+            trend_hours=trend_hours
+        )
+        rendered.setdefault(id(digest), (digest, []))[1].append(s)
+    if len(selections) > 1:
+        print(f"   Rendered {len(rendered)} distinct digests for {len(selections)} chats")
+    return list(rendered.values())
+
+
+def enqueue_stage(run_id: str, bot_token: Optional[str],
+                  rendered: list[tuple[RenderedDigest, list[Selection]]]) -> Optional[str]:
+    """Дайджесты прогона в outbox одной транзакцией; None — режим предпросмотра"""
+    digests = [(digest, group[0].items(), [s.profile.chat_id for s in group if s.profile.chat_id])
+               for digest, group in rendered]
+    digests = [d for d in digests if d[2]]
+    if not bot_token or not digests:
+        print("\nTELEGRAM_BOT_TOKEN or TELEGRAM_CHAT_IDS not set")
+        for digest, group in rendered:
+            chat_id = group[0].profile.chat_id
+            print(f"\n--- PREVIEW{' ' + chat_id if chat_id else ''} ({len(digest.pages)} messages) ---\n")
+            print(digest.text)
+        return None
+    count = enqueue_digests(run_id, digests)
+    print(f"\nQueued {len(digests)} digests for {count} chats (run {run_id})")
+    return run_id
+
+
+def archive_stage(now: datetime, rendered: list[tuple[RenderedDigest, list[Selection]]],
+                  trends: tuple[Trend, ...], run_id: Optional[str]):
+    """Поставленные в outbox дайджесты — в архив JSON API (core/api.py); предпросмотр не архивируется"""
+    if run_id is None:
+        return
+    trending = [{"key": t.key, "count": t.count, "mean": round(t.mean, 2), "z": round(t.z, 2)} for t in trends]
+    for _, group in rendered:
+        chats = [s.profile.chat_id for s in group if s.profile.chat_id]
+        archive_digest(run_id, now, group[0].profile.language, group[0].sections(), chats, trending)
+
+
+async def deliver_stage(bot_token: Optional[str], settings: Delivery,
+                        background: Optional[DeliveryWorkers], run_id: Optional[str]):
+    """Разово — доставить прогон до конца; с фоновыми воркерами — только разбудить их"""
+    if run_id is None:
+        return
+    if background is not None:
+        background.notify()
+        return
+    report = await DeliveryWorkers(bot_token, settings).drain(run_id)
+    print(f"\nDigest delivery: {report}")
+
+
+def housekeeping(now: datetime, *_):
+    # Cleanup old records (once a day)
+    if now.hour == 10:
+        get_store().cleanup(days=30)
+        cleanup_outbox(days=30)
+        cleanup_health(days=30)
+        cleanup_relevance_docs(days=30)
+        cleanup_trends(days=30)
+        cleanup_scraped_urls(days=30)
+        cleanup_archive(days=30)
+        # Освободившиеся страницы — обратно ОС, короткими порциями
+        freed = incremental_vacuum()
+        if freed:
+            print(f"Vacuum: {freed} free page(s) returned")
+
+
+# === Граф ===
+
+def collection_stages(config: RuntimeConfig, deadline_seconds: Optional[float] = None) -> list[Stage]:
+    """Все коллекторы параллельно под общим дедлайном"""
+    collection = config.collection
+    health = SourceHealth()
+    deadline = Deadline(deadline_seconds or collection.deadline_seconds, health=health)
+    flights = SingleFlight()
+    if deadline.seconds:
+        print(f"\nCollecting (deadline {deadline.seconds:.0f}s)...")
+    else:
+        print("\nCollecting...")
+
+    return [
+        Stage("fundraising", partial(
+            collect_fundraising,
+            hours=config.fundraising_hours,
+            rss_feeds=config.fundraising_feeds,
+            deadline=deadline,
+            api_timeout=collection.api_timeout,
+            feed_timeout=collection.feed_timeout,
+            flights=flights
+        ), mode="async"),
+        Stage("articles_rss", partial(
+            collect_articles,
+            config.feeds,
+            hours=ARTICLE_HOURS,
+            deadline=deadline,
+            timeout=collection.feed_timeout,
+            concurrency=collection.concurrency,
+            flights=flights
+        ), mode="async"),
+        Stage("scraped", partial(collect_scraped_articles, config.scrapers, deadline=deadline,
+                                 timeout=collection.scrape_timeout, flights=flights), mode="async"),
+        Stage("health", partial(report_collection, deadline, health),
+              deps=("fundraising", "articles_rss", "scraped")),
+        Stage("flights", partial(close_flights, flights), deps=("health",), mode="async"),
+        Stage("articles", combine_articles, deps=("articles_rss", "scraped")),
+    ]
+
+
+def pending_stages() -> list[Stage]:
+    return [
+        Stage("drain", drain_buffer),
+        Stage("fundraising", lambda drained: merge_fundraising(drained[1]), deps=("drain",)),
+        Stage("articles", lambda drained: merge_articles(drained[0]), deps=("drain",)),
+    ]
+
+
+def digest_stages(config: RuntimeConfig, bot_token: Optional[str], chat_ids: list[str],
+                  deadline_seconds: Optional[float] = None, from_pending: bool = False,
+                  delivery: Optional[DeliveryWorkers] = None) -> list[Stage]:
+    """delivery — фоновые воркеры (режим --schedule); без них прогон доставляет сам"""
+    now = datetime.now(pytz.timezone(config.schedule.timezone))
+    run_id = now.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+    # Без чатов — предпросмотр профиля по умолчанию
+    profiles = audience(config, chat_ids) or [config.default_profile]
+    # MappingProxyType не сериализуется в пул процессов
+    source_bonuses = dict(config.source_bonuses)
+    type_bonuses = dict(config.type_bonuses)
+
+    stages = pending_stages() if from_pending else collection_stages(config, deadline_seconds)
+    return stages + [
+        Stage("relevance", partial(relevance_stage, relevance_topics(profiles, config.priority_topics)),
+              deps=("articles",)),
+        Stage("features", partial(extract_features, global_topics=config.priority_topics,
+                                  source_bonuses=source_bonuses, type_bonuses=type_bonuses),
+              deps=("fundraising", "articles", "relevance"), mode=config.collection.cpu_pool),
+        Stage("sent_state", partial(sent_state, profiles), deps=("features",)),
+        Stage("select", partial(select_stage, profiles), deps=("features", "sent_state")),
+        Stage("trends", partial(trends_stage, config.trending, config.priority_topics), deps=("features",)),
+        Stage("format", partial(format_stage, now, config.trending.window_hours), deps=("select", "trends")),
+        Stage("enqueue", partial(enqueue_stage, run_id, bot_token), deps=("format",)),
+        Stage("archive", partial(archive_stage, now), deps=("format", "trends", "enqueue")),
+        Stage("deliver", partial(deliver_stage, bot_token, config.delivery, delivery),
+              deps=("enqueue",), mode="async"),
+        Stage("housekeeping", partial(housekeeping, now), deps=("deliver",)),
+    ]
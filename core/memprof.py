@@ -0,0 +1,146 @@
+"""
+Профилирование памяти по стадиям (tracemalloc).
+
+На каждой границе стадии снимается snapshot: разница с предыдущим
+показывает, что стадия оставила в памяти (топ мест аллокации и сводка
+по пакетам — feedparser, bs4, collectors…), а reset_peak/get_traced_memory
+дают пик внутри стадии, включая временные объекты, которые к концу
+стадии уже освобождены.
+
+Стадии в пуле процессов не видны: при профилировании всё идёт в потоках.
+"""
+
+import os
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+MB = 1024 * 1024
+
+
+class MemoryBudgetExceeded(RuntimeError):
+    pass
+
+
+@dataclass
+class StageMemory:
+    name: str
+    peak: int          # пик трассируемой памяти во время стадии, байты
+    retained: int      # прирост после стадии относительно её начала
+    top_sites: list[tuple[str, int, int]] = field(default_factory=list)   # (место, байты, блоки)
+    packages: list[tuple[str, int]] = field(default_factory=list)         # (пакет, байты)
+
+
+def package_of(filename: str) -> str:
+    """'.../site-packages/feedparser/util.py' → 'feedparser', 'collectors/articles.py' → 'collectors'"""
+    parts = filename.replace("\\", "/").split("/")
+    for marker in ("site-packages", "dist-packages"):
+        if marker in parts:
+            idx = parts.index(marker)
+            if idx + 1 < len(parts):
+                return parts[idx + 1].removesuffix(".py")
+    root = os.getcwd().replace("\\", "/").rstrip("/") + "/"
+    path = filename.replace("\\", "/")
+    if path.startswith(root):
+        rel = path[len(root):]
+        return rel.split("/", 1)[0].removesuffix(".py")
+    if "/lib/python" in path:
+        return "stdlib:" + parts[-1].removesuffix(".py")
+    return parts[-1]
+
+
+class MemoryProfiler:
+    """
+    stage_started/stage_finished вызываются исполнителем (core.pipeline)
+    вокруг каждой стадии. budget_mb — предел пика; превышение после стадии
+    бросает MemoryBudgetExceeded и валит прогон.
+    """
+
+    def __init__(self, top: int = 10, frames: int = 1, budget_mb: Optional[float] = None):
+        self.top = top
+        self.frames = frames
+        self.budget_mb = budget_mb
+        self.stages: list[StageMemory] = []
+        self._snapshot = None
+        self._started_at = 0
+        self._owns_tracing = False
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._owns_tracing = True
+        self._snapshot = self._take_snapshot()
+
+    def stop(self):
+        if self._owns_tracing:
+            tracemalloc.stop()
+            self._owns_tracing = False
+
+    @staticmethod
+    def _take_snapshot():
+        return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+
+    def stage_started(self, name: str):
+        # Стадии идут по одной: snapshot конца предыдущей и есть начало этой
+        if self._snapshot is None:
+            self._snapshot = self._take_snapshot()
+        self._started_at = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+
+    def stage_finished(self, name: str):
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = self._take_snapshot()
+        diff = snapshot.compare_to(self._snapshot, "lineno")
+        self._snapshot = snapshot
+
+        top_sites = []
+        packages: dict[str, int] = {}
+        for stat in diff:
+            frame = stat.traceback[0]
+            if stat.size_diff > 0 and len(top_sites) < self.top:
+                top_sites.append((f"{frame.filename}:{frame.lineno}", stat.size_diff, stat.count_diff))
+            pkg = package_of(frame.filename)
+            packages[pkg] = packages.get(pkg, 0) + stat.size_diff
+        by_package = sorted(((p, s) for p, s in packages.items() if s > 0), key=lambda x: -x[1])
+
+        stage = StageMemory(name, peak, current - self._started_at, top_sites, by_package[:self.top])
+        self.stages.append(stage)
+
+        if self.budget_mb is not None and peak > self.budget_mb * MB:
+            raise MemoryBudgetExceeded(
+                f"stage {name}: peak {peak / MB:.1f} MB exceeds budget {self.budget_mb:g} MB"
+            )
+
+    @property
+    def peak(self) -> int:
+        return max((s.peak for s in self.stages), default=0)
+
+    def report(self) -> str:
+        lines = [f"Memory by stage (peak {self.peak / MB:.1f} MB"
+                 + (f", budget {self.budget_mb:g} MB)" if self.budget_mb else ")")]
+        for s in self.stages:
+            lines.append(f"  {s.name:<20} peak {s.peak / MB:8.1f} MB   retained {s.retained / MB:+8.1f} MB")
+        for s in sorted(self.stages, key=lambda s: -s.peak)[:3]:
+            if not s.top_sites:
+                continue
+            lines.append(f"\n  {s.name}: retained by package: "
+                         + ", ".join(f"{p} {size / MB:.1f} MB" for p, size in s.packages[:5]))
+            for site, size, count in s.top_sites:
+                lines.append(f"    {size / 1024:10.1f} KiB {count:+8d} blocks  {site}")
+        return "\n".join(lines)
+
+
+def measure_peak(func: Callable) -> tuple[object, int]:
+    """(результат, пик трассируемой памяти в байтах) одного вызова"""
+    started_here = not tracemalloc.is_tracing()
+    if started_here:
+        tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        result = func()
+        peak = tracemalloc.get_traced_memory()[1] - base
+    finally:
+        if started_here:
+            tracemalloc.stop()
+    return result, peak
@@ -0,0 +1,183 @@
+"""
+Исполнитель графа стадий.
+
+Стадия — функция от результатов своих зависимостей (в порядке deps).
+Стадии без взаимных зависимостей идут параллельно; блокирующие
+выполняются в пуле потоков ("thread") или процессов ("process"),
+корутины — прямо в event loop ("async"). После прогона по таймингам
+строится критический путь: цепочка стадий, определившая общее время.
+"""
+
+import asyncio
+import contextlib
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+MODES = ("async", "thread", "process")
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    func: Callable
+    deps: tuple[str, ...] = ()
+    mode: str = "thread"
+
+
+@dataclass
+class StageTiming:
+    name: str
+    deps: tuple[str, ...]
+    mode: str
+    started: float
+    finished: float
+
+    @property
+    def duration(self) -> float:
+        return self.finished - self.started
+
+
+@dataclass
+class PipelineRun:
+    results: dict[str, Any] = field(default_factory=dict)
+    timings: dict[str, StageTiming] = field(default_factory=dict)
+    started: float = 0.0
+    finished: float = 0.0
+
+    @property
+    def elapsed(self) -> float:
+        return self.finished - self.started
+
+    def critical_path(self) -> list[StageTiming]:
+        """
+        От последней завершившейся стадии назад по самой поздней зависимости.
+        Сумма длительностей пути (плюс ожидание) и есть время прогона.
+        """
+        if not self.timings:
+            return []
+        current = max(self.timings.values(), key=lambda t: t.finished)
+        path = [current]
+        while current.deps:
+            current = max((self.timings[d] for d in current.deps), key=lambda t: t.finished)
+            path.append(current)
+        return path[::-1]
+
+    def report(self) -> str:
+        """Тайминги стадий и критический путь"""
+        path = self.critical_path()
+        on_path = {t.name for t in path}
+        lines = [f"Stages ({self.elapsed:.2f}s total):"]
+        for t in sorted(self.timings.values(), key=lambda t: t.started):
+            mark = "*" if t.name in on_path else " "
+            lines.append(f"  {mark} {t.name:<20} {t.mode:<7} "
+                         f"+{t.started - self.started:6.2f}s  {t.duration:6.2f}s")
+        lines.append("Critical path: " + " → ".join(f"{t.name} ({t.duration:.2f}s)" for t in path))
+        return "\n".join(lines)
+
+
+def validate_stages(stages: list[Stage]) -> list[Stage]:
+    """Проверка имён/зависимостей, стадии в топологическом порядке"""
+    by_name = {}
+    for stage in stages:
+        if stage.name in by_name:
+            raise ValueError(f"Duplicate stage: {stage.name}")
+        if stage.mode not in MODES:
+            raise ValueError(f"Stage {stage.name}: unknown mode {stage.mode!r}")
+        by_name[stage.name] = stage
+    for stage in stages:
+        for dep in stage.deps:
+            if dep not in by_name:
+                raise ValueError(f"Stage {stage.name} depends on unknown stage {dep}")
+
+    ordered, done, visiting = [], set(), set()
+
+    def visit(stage: Stage):
+        if stage.name in done:
+            return
+        if stage.name in visiting:
+            raise ValueError(f"Dependency cycle through stage {stage.name}")
+        visiting.add(stage.name)
+        for dep in stage.deps:
+            visit(by_name[dep])
+        visiting.discard(stage.name)
+        done.add(stage.name)
+        ordered.append(stage)
+
+    for stage in stages:
+        visit(stage)
+    return ordered
+
+
+class Pipeline:
+    """
+    Граф стадий одного прогона.
+
+    Пулы можно передать снаружи (долгоживущий процесс); иначе создаются
+    на прогон. Ошибка стадии отменяет остальные и пробрасывается из run().
+
+    profiler (core.memprof.MemoryProfiler) — стадии идут по одной и без
+    пула процессов, чтобы память можно было отнести к конкретной стадии.
+    """
+
+    def __init__(self, stages: list[Stage], threads: Optional[Executor] = None,
+                 processes: Optional[Executor] = None, max_workers: int = 8,
+                 profiler=None):
+        stages = validate_stages(stages)
+        if profiler is not None:
+            stages = [Stage(s.name, s.func, s.deps, "thread") if s.mode == "process" else s
+                      for s in stages]
+        self.stages = stages
+        self._threads = threads
+        self._processes = processes
+        self.max_workers = max_workers
+        self.profiler = profiler
+
+    async def run(self) -> PipelineRun:
+        run = PipelineRun(started=time.perf_counter())
+        own_threads = own_processes = None
+        if self._threads is None and any(s.mode == "thread" for s in self.stages):
+            own_threads = ThreadPoolExecutor(self.max_workers, thread_name_prefix="stage")
+        if self._processes is None and any(s.mode == "process" for s in self.stages):
+            own_processes = ProcessPoolExecutor(self.max_workers)
+        pools = {"thread": self._threads or own_threads, "process": self._processes or own_processes}
+
+        tasks: dict[str, asyncio.Task] = {}
+        profiler = self.profiler
+        serial = asyncio.Lock() if profiler is not None else contextlib.nullcontext()
+
+        async def execute(stage: Stage):
+            args = [await tasks[dep] for dep in stage.deps]
+            async with serial:
+                if profiler is not None:
+                    profiler.stage_started(stage.name)
+                started = time.perf_counter()
+                if stage.mode == "async":
+                    result = await stage.func(*args)
+                else:
+                    loop = asyncio.get_running_loop()
+                    result = await loop.run_in_executor(pools[stage.mode], stage.func, *args)
+                finished = time.perf_counter()
+                if profiler is not None:
+                    profiler.stage_finished(stage.name)
+            run.timings[stage.name] = StageTiming(stage.name, stage.deps, stage.mode, started, finished)
+            run.results[stage.name] = result
+            return result
+
+        try:
+            for stage in self.stages:
+                tasks[stage.name] = asyncio.create_task(execute(stage), name=f"stage:{stage.name}")
+            try:
+                await asyncio.gather(*tasks.values())
+            except BaseException:
+                for task in tasks.values():
+                    task.cancel()
+                await asyncio.gather(*tasks.values(), return_exceptions=True)
+                raise
+        finally:
+            run.finished = time.perf_counter()
+            for pool in (own_threads, own_processes):
+                if pool is not None:
+                    pool.shutdown(wait=False, cancel_futures=True)
+        return run
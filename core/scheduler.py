@@ -0,0 +1,414 @@
+"""
+Адаптивный опрос источников.
+
+Вместо опроса всех фидов дважды в день каждый фид опрашивается
+в своём ритме: интервал публикаций оценивается по датам записей
+(медиана промежутков, сглаженная EWMA), фид опрашивается примерно
+дважды за интервал публикаций в пределах [MIN_POLL_INTERVAL, MAX_POLL_INTERVAL].
+Очередь — heap по времени следующего опроса. Новые записи складываются
+в буфер db.pending, дайджест в 10:00/20:00 забирает их оттуда.
+"""
+
+import asyncio
+import heapq
+import random
+import statistics
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Awaitable, Callable, Optional
+
+from collectors.articles import FeedSpec, advance_cursor, parse_rss, feed_publish_times
+from collectors.fetch import fetch_feed, new_session
+from collectors.fundraising import (
+    fetch_defillama_raises,
+    parse_defillama_raises,
+    parse_fundraising_rss,
+)
+from collectors.scraper import SiteSpec, scrape_site
+from collectors.websub import discover_hub
+from core.config import RuntimeConfig, get_config
+from core.deadline import Deadline, run_budgeted
+from db.aio import async_db
+from db.feeds import FeedState, load_feed_states, save_feed_state
+from db.health import SourceHealth, write_health
+from db.leases import claim_sources, heartbeat, register_sources, release, release_all
+from db.pending import add_pending_articles, add_pending_fundraising
+from db.store import get_store
+
+MIN_POLL_INTERVAL = timedelta(minutes=10).total_seconds()
+MAX_POLL_INTERVAL = timedelta(hours=12).total_seconds()
+POLLS_PER_PUBLISH = 2        # опросов на один интервал публикаций
+SMOOTHING = 0.3              # вес нового наблюдения в EWMA
+PUBLISH_SAMPLE = 20          # сколько последних записей учитывать
+JITTER = 0.1                 # ±10%, чтобы фиды не синхронизировались
+
+DEFILLAMA_INTERVAL = timedelta(hours=1).total_seconds()
+SCRAPE_INTERVAL = timedelta(hours=3).total_seconds()
+ARTICLE_HOURS = 24
+
+
+@dataclass
+class PollResult:
+    new_items: list
+    publish_times: list[datetime]
+    hub: Optional[tuple[str, str]] = None   # (hub, topic) из <link rel="hub">
+
+
+@dataclass
+class PollJob:
+    source: str                                   # ключ как в source_health
+    poll: Callable[..., Awaitable[PollResult]]    # poll(session, timeout)
+    timeout: float
+    fixed_interval: Optional[float] = None        # API/скрейп — без обучения
+
+
+def estimate_publish_interval(times: list[datetime]) -> Optional[float]:
+    """Медианный промежуток между последними записями, секунды"""
+    times = sorted(set(times), reverse=True)[:PUBLISH_SAMPLE]
+    gaps = [(a - b).total_seconds() for a, b in zip(times, times[1:])]
+    gaps = [g for g in gaps if g > 0]
+    if not gaps:
+        return None
+    return statistics.median(gaps)
+
+
+def update_feed_state(state: FeedState, publish_times: list[datetime], now: datetime,
+                      fixed_interval: Optional[float] = None) -> FeedState:
+    """Учесть результат опроса и назначить следующий"""
+    state.last_polled_at = now
+    if publish_times:
+        newest = max(publish_times)
+        if state.last_entry_at is None or newest > state.last_entry_at:
+            state.last_entry_at = newest
+
+    if fixed_interval is not None:
+        interval = fixed_interval
+    else:
+        observed = estimate_publish_interval(publish_times)
+        if observed is not None:
+            if state.publish_interval_s is None:
+                state.publish_interval_s = observed
+            else:
+                state.publish_interval_s += SMOOTHING * (observed - state.publish_interval_s)
+
+        if state.publish_interval_s is None:
+            interval = MAX_POLL_INTERVAL
+        else:
+            interval = state.publish_interval_s / POLLS_PER_PUBLISH
+        interval = min(max(interval, MIN_POLL_INTERVAL), MAX_POLL_INTERVAL)
+
+    state.poll_interval_s = interval
+    jitter = 1 + random.uniform(-JITTER, JITTER)
+    state.next_poll_at = now + timedelta(seconds=interval * jitter)
+    return state
+
+
+async def poll_feed(spec: FeedSpec, session, timeout: float) -> PollResult:
+    feed = await fetch_feed(session, spec.url, timeout)
+    cursor = await async_db.read(get_store().load_cursor, f"{spec.category}:{spec.name}")
+    hours = spec.hours or ARTICLE_HOURS
+    articles = parse_rss(feed, spec.name, spec.source_type, hours=hours, is_vip=spec.is_vip, cursor=cursor)
+    new = await async_db.write(add_pending_articles, spec.category, articles, hours)
+    # Курсор — только после того, как записи легли в буфер
+    await async_db.store_write(get_store().save_cursor, advance_cursor(cursor, feed))
+    return PollResult(new, feed_publish_times(feed), discover_hub(feed))
+
+
+async def poll_fundraising_feed(name: str, url: str, hours: int, session, timeout: float) -> PollResult:
+    feed = await fetch_feed(session, url, timeout)
+    cursor = await async_db.read(get_store().load_cursor, f"fundraising_news:{name}")
+    rounds = parse_fundraising_rss(feed, name, hours, cursor=cursor)
+    new = await async_db.write(add_pending_fundraising, rounds, hours)
+    await async_db.store_write(get_store().save_cursor, advance_cursor(cursor, feed))
+    return PollResult(new, feed_publish_times(feed))
+
+
+async def poll_defillama(hours: int, session, timeout: float) -> PollResult:
+    raw_raises = await fetch_defillama_raises(session, timeout)
+    rounds = parse_defillama_raises(raw_raises, hours)
+    new = await async_db.write(add_pending_fundraising, rounds, hours)
+    return PollResult(new, [r.date for r in rounds if r.date])
+
+
+async def poll_scraper(site: SiteSpec, session, timeout: float) -> PollResult:
+    scraped = await scrape_site(site, session, timeout)
+    articles = [s.to_article() for s in scraped]
+    new = await async_db.write(add_pending_articles, "institutional_scrape", articles, site.hours)
+    return PollResult(new, [s.published_at for s in scraped if s.published_at])
+
+
+def build_jobs(config: RuntimeConfig) -> dict[str, PollJob]:
+    """Все опрашиваемые источники из конфига"""
+    collection = config.collection
+    jobs = [
+        PollJob(f"{spec.category}:{spec.name}", partial(poll_feed, spec), collection.feed_timeout)
+        for spec in config.feeds
+    ]
+    jobs += [
+        PollJob(
+            f"fundraising_news:{name}",
+            partial(poll_fundraising_feed, name, url, config.fundraising_hours),
+            collection.feed_timeout
+        )
+        for name, url in config.fundraising_feeds.items()
+    ]
+    jobs.append(PollJob(
+        "fundraising:defillama",
+        partial(poll_defillama, config.fundraising_hours),
+        collection.api_timeout,
+        fixed_interval=DEFILLAMA_INTERVAL
+    ))
+    jobs += [
+        PollJob(f"scrape:{site.name}", partial(poll_scraper, site), collection.scrape_timeout,
+                fixed_interval=SCRAPE_INTERVAL)
+        for site in config.scrapers
+    ]
+    return {job.source: job for job in jobs}
+
+
+class FeedScheduler:
+    """
+    Фоновый опрос источников по очереди с приоритетом по времени.
+
+    on_new_items(source, items) вызывается для каждого опроса, принёсшего
+    новые записи (статьи или раунды). is_pushed(source) — источник приходит
+    push'ем (WebSub) и не опрашивается; on_hub_discovered(source, hub, topic)
+    получает найденные в фидах hub'ы.
+    """
+
+    def __init__(self, on_new_items: Callable = None, is_pushed: Callable = None,
+                 on_hub_discovered: Callable = None):
+        self.on_new_items = on_new_items
+        self.is_pushed = is_pushed
+        self.on_hub_discovered = on_hub_discovered
+        self.states = load_feed_states()
+        self.health = SourceHealth()
+        self.jobs: dict[str, PollJob] = {}
+        self.queue: list[tuple[datetime, str]] = []
+        self.in_flight: set[str] = set()
+        self.tasks: set[asyncio.Task] = set()
+        self._config = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _reload_jobs(self):
+        config = get_config()
+        if config is self._config:
+            return
+        self._config = config
+        self._semaphore = asyncio.Semaphore(config.collection.concurrency)
+        self.jobs = build_jobs(config)
+
+        now = datetime.now()
+        self.queue = []
+        for source in self.jobs:
+            state = self.states.get(source)
+            if state is None:
+                # Новый источник: опросить сразу, но с разбросом по первой минуте
+                state = FeedState(source, MAX_POLL_INTERVAL, now + timedelta(seconds=random.uniform(0, 60)))
+                self.states[source] = state
+            heapq.heappush(self.queue, (state.next_poll_at, source))
+        print(f"Scheduler: {len(self.jobs)} sources, next poll at {self.queue[0][0]:%H:%M:%S}"
+              if self.queue else "Scheduler: no sources")
+
+    async def _poll(self, session, job: PollJob) -> Optional[PollResult]:
+        try:
+            async with self._semaphore:
+                result = await run_budgeted(
+                    job.source, job.poll(session, job.timeout),
+                    Deadline(health=self.health), job.timeout, default=None
+                )
+            await async_db.write(write_health, *self.health.take())
+
+            now = datetime.now()
+            state = self.states[job.source]
+            publish_times = result.publish_times if result else []
+            update_feed_state(state, publish_times, now, job.fixed_interval)
+            await async_db.write(save_feed_state, state)
+            self._reschedule(job.source, state)
+
+            if result and result.new_items:
+                print(f"  [{now:%H:%M}] {job.source}: {len(result.new_items)} new, "
+                      f"next poll in {state.poll_interval_s / 60:.0f} min")
+                if self.on_new_items:
+                    await self.on_new_items(job.source, result.new_items)
+            if result and result.hub and self.on_hub_discovered:
+                await self.on_hub_discovered(job.source, *result.hub)
+            return result
+        except Exception as e:
+            print(f"  Scheduler error polling {job.source}: {e}")
+        finally:
+            self.in_flight.discard(job.source)
+
+    def _reschedule(self, source: str, state: FeedState):
+        if source in self.jobs:
+            heapq.heappush(self.queue, (state.next_poll_at, source))
+
+    async def run(self, stop: asyncio.Event = None):
+        stop = stop or asyncio.Event()
+        async with new_session() as session:
+            while not stop.is_set():
+                self._reload_jobs()
+
+                now = datetime.now()
+                while self.queue and self.queue[0][0] <= now:
+                    when, source = heapq.heappop(self.queue)
+                    job = self.jobs.get(source)
+                    if job is None or source in self.in_flight:
+                        continue
+                    state = self.states[source]
+                    if when != state.next_poll_at:
+                        # Устаревшая запись: _reload_jobs пересобрал очередь, пока шёл опрос,
+                        # и _reschedule уже поставил источник на новое время
+                        continue
+                    if self.is_pushed and self.is_pushed(source) and state.last_polled_at:
+                        # Контент приходит push'ем: страховочный опрос раз в MAX_POLL_INTERVAL
+                        fallback_at = state.last_polled_at + timedelta(seconds=MAX_POLL_INTERVAL)
+                        if fallback_at > now:
+                            state.next_poll_at = fallback_at
+                            heapq.heappush(self.queue, (fallback_at, source))
+                            continue
+                    self.in_flight.add(source)
+                    task = asyncio.create_task(self._poll(session, job))
+                    self.tasks.add(task)
+                    task.add_done_callback(self.tasks.discard)
+
+                # Просыпаемся к ближайшему опросу, но не реже раза в минуту (hot reload)
+                sleep_s = 60.0
+                if self.queue:
+                    sleep_s = min(max((self.queue[0][0] - now).total_seconds(), 1.0), 60.0)
+                try:
+                    await asyncio.wait_for(stop.wait(), sleep_s)
+                except asyncio.TimeoutError:
+                    pass
+
+            for task in list(self.tasks):
+                task.cancel()
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+
+class LeasedScheduler(FeedScheduler):
+    """
+    Воркер общего пула сбора (python main.py --worker).
+
+    Источники не делятся между процессами заранее: каждый воркер берёт в
+    аренду (db.leases) столько источников, которым пора опрашиваться,
+    сколько у него свободных слотов concurrency, и отпускает их после
+    опроса. Очередь — feed_schedule в общей БД, а не heap процесса:
+    следующий опрос назначает тот, кто опрашивал, берёт — любой свободный.
+
+    build_jobs подменяется в бенчмарке синтетическими источниками.
+    """
+
+    IDLE_SECONDS = 5.0    # как часто заглядывать в очередь, когда всё разобрано
+
+    def __init__(self, worker_id: str, on_new_items: Callable = None, is_pushed: Callable = None,
+                 on_hub_discovered: Callable = None, build: Callable[[RuntimeConfig], dict] = build_jobs):
+        super().__init__(on_new_items, is_pushed, on_hub_discovered)
+        self.states = {}          # только взятые в аренду, свежие из БД
+        self.worker_id = worker_id
+        self.build = build
+        self.polls = 0
+        self.items = 0
+        self._freed: Optional[asyncio.Event] = None
+
+    def _reload_jobs(self) -> bool:
+        config = get_config()
+        if config is self._config:
+            return False
+        self._config = config
+        self._semaphore = asyncio.Semaphore(config.collection.concurrency)
+        self.jobs = self.build(config)
+        print(f"Worker {self.worker_id}: {len(self.jobs)} sources in the pool, "
+              f"up to {config.collection.concurrency} at a time")
+        return True
+
+    def _reschedule(self, source: str, state: FeedState):
+        pass    # следующий опрос уже в feed_schedule — его возьмёт любой воркер
+
+    async def _poll(self, session, job: PollJob) -> Optional[PollResult]:
+        try:
+            result = await super()._poll(session, job)
+            self.polls += 1
+            if result:
+                self.items += len(result.new_items)
+            return result
+        finally:
+            await async_db.write(release, self.worker_id, job.source)
+            self.states.pop(job.source, None)
+            self._freed.set()
+
+    async def _claim(self, session) -> int:
+        free = self._config.collection.concurrency - len(self.in_flight)
+        if free <= 0:
+            return 0
+        claimed, stolen = await async_db.write(
+            claim_sources, self.worker_id, list(self.jobs), free, self._config.workers.lease_seconds
+        )
+        if not claimed:
+            return 0
+        if stolen:
+            print(f"  Worker {self.worker_id}: took over {stolen} expired lease(s)")
+
+        now = datetime.now()
+        states = await async_db.read(load_feed_states, claimed)
+        for source in claimed:
+            state = states.get(source) or FeedState(source, MAX_POLL_INTERVAL, now)
+            if self.is_pushed and self.is_pushed(source) and state.last_polled_at:
+                fallback_at = state.last_polled_at + timedelta(seconds=MAX_POLL_INTERVAL)
+                if fallback_at > now:
+                    state.next_poll_at = fallback_at
+                    await async_db.write(save_feed_state, state)
+                    await async_db.write(release, self.worker_id, source)
+                    continue
+            self.states[source] = state
+            self.in_flight.add(source)
+            task = asyncio.create_task(self._poll(session, self.jobs[source]))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+        return len(claimed)
+
+    async def _heartbeat(self):
+        polls, items = self.polls, self.items
+        self.polls = self.items = 0
+        in_flight = set(self.in_flight)
+        held = await async_db.write(heartbeat, self.worker_id, in_flight, self._config.workers.lease_seconds,
+                                    polls, items)
+        for source in in_flight - held:
+            if source in self.in_flight:
+                print(f"  Worker {self.worker_id}: lease on {source} expired mid-poll, another worker owns it now")
+
+    async def run(self, stop: asyncio.Event = None):
+        stop = stop or asyncio.Event()
+        self._freed = asyncio.Event()
+        self._reload_jobs()
+        await async_db.write(register_sources, list(self.jobs))
+        await self._heartbeat()
+        beat_at = time.monotonic()
+
+        async with new_session() as session:
+            try:
+                while not stop.is_set():
+                    if self._reload_jobs():
+                        await async_db.write(register_sources, list(self.jobs))
+                    self._freed.clear()
+                    await self._claim(session)
+
+                    heartbeat_s = self._config.workers.heartbeat_seconds
+                    if time.monotonic() - beat_at >= heartbeat_s:
+                        await self._heartbeat()
+                        beat_at = time.monotonic()
+
+                    # Просыпаемся, когда освободился слот, или раз в IDLE_SECONDS
+                    wait_s = min(self.IDLE_SECONDS, max(heartbeat_s - (time.monotonic() - beat_at), 0.1))
+                    waiters = [asyncio.ensure_future(stop.wait()), asyncio.ensure_future(self._freed.wait())]
+                    await asyncio.wait(waiters, timeout=wait_s, return_when=asyncio.FIRST_COMPLETED)
+                    for waiter in waiters:
+                        waiter.cancel()
+            finally:
+                for task in list(self.tasks):
+                    task.cancel()
+                await asyncio.gather(*self.tasks, return_exceptions=True)
+                await self._heartbeat()
+                await async_db.write(release_all, self.worker_id)
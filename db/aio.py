@@ -0,0 +1,214 @@
+"""
+Неблокирующий доступ к SQLite из event loop.
+
+Синхронные функции db.* вызываются из корутин (планировщик, алерты,
+воркеры доставки) — каждая такая запись или проверка останавливала
+цикл, пока остальные фиды ждали сети. AsyncDB выносит их в потоки:
+
+    read(fn, ...)   — пул читателей (READERS потоков, у каждого своё
+                      долгоживущее соединение в autocommit)
+    write(fn, ...)  — очередь единственного писателя: всё, что успело
+                      накопиться (до MAX_BATCH), выполняется одной
+                      транзакцией, каждая запись в своём SAVEPOINT —
+                      ошибка одной откатывает только её
+
+fn — обычная функция db.*: внутри потоков AsyncDB get_connection()
+возвращает соединение потока, а commit() / close() становятся no-op —
+транзакцией управляет AsyncDB. База переводится в WAL, чтобы читатели
+не ждали писателя.
+
+Порядок записей сохраняется; когда write() вернул управление, запись
+уже закоммичена и видна читателям.
+"""
+
+import asyncio
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable
+
+import db.database as database
+from db.store import get_store
+
+READERS = 4
+MAX_BATCH = 256
+BUSY_TIMEOUT_MS = 5000
+
+
+class _ThreadConnection:
+    """Соединение потока AsyncDB под видом обычного: commit/close — no-op"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+        self.savepoint = None    # у писателя — точка отката текущей записи
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+    def rollback(self):
+        if self.savepoint:
+            self._conn.execute(f"ROLLBACK TO {self.savepoint}")
+
+
+def _open() -> sqlite3.Connection:
+    database.DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(database.DB_PATH, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    return conn
+
+
+def _settle(future: asyncio.Future, ok: bool, value):
+    if future.done():
+        return
+    if ok:
+        future.set_result(value)
+    else:
+        future.set_exception(value)
+
+
+class AsyncDB:
+    """Потоки стартуют при первом обращении; один экземпляр на процесс — async_db"""
+
+    def __init__(self, readers: int = READERS, max_batch: int = MAX_BATCH):
+        self.readers = readers
+        self.max_batch = max_batch
+        self.batches = 0
+        self.writes = 0
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._pool = None
+        self._writer = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        if self._writer is not None:
+            return
+        with self._lock:
+            if self._writer is None:
+                self._pool = ThreadPoolExecutor(self.readers, thread_name_prefix="db-read",
+                                                initializer=self._init_reader)
+                writer = threading.Thread(target=self._write_loop, name="db-write", daemon=True)
+                writer.start()
+                self._writer = writer
+
+    @staticmethod
+    def _init_reader():
+        database._thread.connection = _ThreadConnection(_open())
+
+    async def read(self, func: Callable, *args, **kwargs):
+        """Чтение (или любая блокирующая работа с БД вне очереди записи)"""
+        self._start()
+        return await asyncio.get_running_loop().run_in_executor(self._pool, partial(func, *args, **kwargs))
+
+    async def write(self, func: Callable, *args, **kwargs):
+        """Запись через очередь писателя; результат func"""
+        self._start()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put((partial(func, *args, **kwargs), future))
+        return await future
+
+    async def store_write(self, func: Callable, *args, **kwargs):
+        """
+        Запись в хранилище истории (db/store.py). SQLite — очередью писателя,
+        как любая запись; kv / memory — в своём потоке: HTTP-вызов внутри
+        транзакции писателя держал бы блокировку записи всей БД.
+        """
+        if get_store().in_db:
+            return await self.write(func, *args, **kwargs)
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+    # === Пакетные проверки и вставки ===
+
+    # История — в хранилище из store (db/store.py): при SQLite это те же
+    # функции db.database в потоках AsyncDB
+
+    async def articles_sent(self, urls: list[str]) -> set[str]:
+        return await self.read(get_store().sent_article_urls, urls)
+
+    async def fundraising_sent(self, keys: list[tuple[str, str]]) -> set[tuple[str, str]]:
+        return await self.read(get_store().sent_fundraising_keys, keys)
+
+    async def mark_articles_sent(self, rows: list[tuple[str, str, str]]):
+        await self.store_write(get_store().mark_articles_sent, rows)
+
+    async def mark_rounds_sent(self, rows: list[tuple]):
+        await self.store_write(get_store().mark_rounds_sent, rows)
+
+    # === Писатель ===
+
+    def _write_loop(self):
+        conn = _open()
+        conn.execute("PRAGMA journal_mode = WAL")
+        shared = _ThreadConnection(conn)
+        database._thread.connection = shared
+        stop = False
+        while not stop:
+            job = self._queue.get()
+            if job is None:
+                break
+            batch = [job]
+            while len(batch) < self.max_batch:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    stop = True
+                    break
+                batch.append(job)
+
+            results = self._run_batch(conn, shared, [func for func, _ in batch])
+            self.batches += 1
+            self.writes += len(batch)
+            for (_, future), (ok, value) in zip(batch, results):
+                try:
+                    future.get_loop().call_soon_threadsafe(_settle, future, ok, value)
+                except RuntimeError:
+                    pass    # цикл уже закрыт — ждать результата некому
+        conn.close()
+
+    @staticmethod
+    def _run_batch(conn: sqlite3.Connection, shared: _ThreadConnection, funcs: list[Callable]) -> list[tuple]:
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for i, func in enumerate(funcs):
+                shared.savepoint = f"write_{i}"
+                conn.execute(f"SAVEPOINT write_{i}")
+                try:
+                    value = func()
+                except Exception as e:
+                    conn.execute(f"ROLLBACK TO write_{i}")
+                    results.append((False, e))
+                else:
+                    results.append((True, value))
+                conn.execute(f"RELEASE write_{i}")
+            conn.execute("COMMIT")
+        except Exception as e:
+            # Не удалось закоммитить пакет — ни одна запись не прошла
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            results = [(False, e)] * len(funcs)
+        finally:
+            shared.savepoint = None
+        return results
+
+    def close(self):
+        """Дождаться записи очереди и остановить потоки"""
+        if self._writer is None:
+            return
+        self._queue.put(None)
+        self._writer.join()
+        self._pool.shutdown()
+        self._writer = self._pool = None
+
+
+async_db = AsyncDB()
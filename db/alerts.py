@@ -0,0 +1,75 @@
+"""
+Журнал алертов: что ушло вне дайджеста и с какой задержкой
+от публикации до доставки.
+"""
+
+from datetime import datetime, timedelta
+from typing import Optional
+
+from db.database import get_connection
+
+
+def init_alert_tables():
+    conn = get_connection()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS alert_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            item_key TEXT NOT NULL,
+            source TEXT,
+            score REAL,
+            published_at TIMESTAMP,
+            delivered_at TIMESTAMP NOT NULL,
+            latency_s REAL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_alert_delivered ON alert_log(delivered_at)")
+    conn.commit()
+    conn.close()
+
+
+def log_alert(kind: str, item_key: str, source: str, score: float,
+              published_at: Optional[datetime], delivered_at: datetime, latency_s: Optional[float]):
+    conn = get_connection()
+    try:
+        conn.execute(
+            """INSERT INTO alert_log (kind, item_key, source, score, published_at, delivered_at, latency_s)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (kind, item_key, source, score, published_at, delivered_at, latency_s)
+        )
+        conn.commit()
+    except Exception as e:
+        print(f"DB error logging alert: {e}")
+    finally:
+        conn.close()
+
+
+def alert_latency_stats(days: int = 7) -> dict:
+    """Число алертов и задержка публикация → доставка (p50/p95/max) за N дней"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cutoff = datetime.now() - timedelta(days=days)
+    cursor.execute(
+        "SELECT latency_s FROM alert_log WHERE delivered_at >= ? AND latency_s IS NOT NULL ORDER BY latency_s",
+        (cutoff,)
+    )
+    latencies = [row[0] for row in cursor.fetchall()]
+    cursor.execute("SELECT COUNT(*) FROM alert_log WHERE delivered_at >= ?", (cutoff,))
+    count = cursor.fetchone()[0]
+    conn.close()
+
+    def percentile(p: float) -> Optional[float]:
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+    return {
+        "alerts": count,
+        "p50_s": percentile(0.5),
+        "p95_s": percentile(0.95),
+        "max_s": latencies[-1] if latencies else None,
+    }
+
+
+# Инициализация при импорте
+init_alert_tables()
@@ -0,0 +1,234 @@
+"""
+Архив дайджестов для JSON API (core/api.py).
+
+digest_archive — один отрендеренный дайджест прогона: документ целиком
+(ответ GET /api/digests/{id}) и краткая сводка для списка, оба JSON-
+строками, собранными один раз при записи. digest_archive_items —
+материалы по секциям, по строке на материал: архивные выборки по
+секции, источнику, теме и дате с пагинацией по id (курсор — id
+последней отданной строки).
+"""
+
+import json
+from datetime import datetime, timedelta
+from typing import Optional
+
+from collectors.articles import Article
+from collectors.fundraising import FundraisingRound
+from db.database import get_connection
+
+SECTIONS = ("fundraising", "research", "protocols", "news")
+
+
+def init_archive_tables():
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS digest_archive (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_id TEXT NOT NULL,
+            created_at TIMESTAMP NOT NULL,
+            chats TEXT NOT NULL,
+            summary TEXT NOT NULL,
+            document TEXT NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS digest_archive_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            digest_id INTEGER NOT NULL,
+            section TEXT NOT NULL,
+            source TEXT,
+            published_at TIMESTAMP,
+            payload TEXT NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_archive_created ON digest_archive(created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_archive_items_digest ON digest_archive_items(digest_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_archive_items_section ON digest_archive_items(section, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_archive_items_source ON digest_archive_items(source, id)")
+
+    conn.commit()
+    conn.close()
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def article_doc(a: Article) -> dict:
+    return {
+        "kind": "article",
+        "url": a.url,
+        "title": a.title,
+        "source": a.source,
+        "source_type": a.source_type,
+        "author": a.author,
+        "published_at": _iso(a.published_at),
+        "summary": a.summary,
+        "tags": a.tags,
+        "score": round(a.score, 2),
+    }
+
+
+def round_doc(r: FundraisingRound) -> dict:
+    return {
+        "kind": "fundraising",
+        "project": r.project,
+        "amount": r.amount,
+        "round_type": r.round_type,
+        "lead_investors": r.lead_investors,
+        "other_investors": r.other_investors,
+        "category": r.category,
+        "date": _iso(r.date),
+        "source_url": r.source_url,
+        "source": r.source,
+        "tags": r.tags,
+        "score": round(r.score, 2),
+    }
+
+
+def archive_digest(run_id: str, created_at: datetime, language: str, sections: dict[str, list],
+                   chats: list[str], trending: list[dict]) -> int:
+    """
+    sections — {секция: статьи или раунды} в порядке дайджеста. Документ
+    и строки материалов пишутся одной транзакцией.
+
+    Returns:
+        id дайджеста в архиве
+    """
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        digest_id = cursor.execute(
+            "INSERT INTO digest_archive (run_id, created_at, chats, summary, document) VALUES (?, ?, ?, '', '')",
+            (run_id, created_at, json.dumps(chats))
+        ).lastrowid
+
+        items = {}
+        for section, section_items in sections.items():
+            docs = items[section] = []
+            for item in section_items:
+                doc = round_doc(item) if isinstance(item, FundraisingRound) else article_doc(item)
+                doc["digest_id"], doc["section"] = digest_id, section
+                docs.append(doc)
+            cursor.executemany(
+                """INSERT INTO digest_archive_items (digest_id, section, source, published_at, payload)
+                   VALUES (?, ?, ?, ?, ?)""",
+                [(digest_id, section, doc["source"], doc.get("published_at") or doc.get("date"),
+                  json.dumps(doc, ensure_ascii=False)) for doc in docs]
+            )
+
+        summary = {
+            "id": digest_id,
+            "run_id": run_id,
+            "created_at": created_at.isoformat(),
+            "language": language,
+            "chats": chats,
+            "counts": {section: len(docs) for section, docs in items.items()},
+        }
+        document = {**summary, "trending": trending, "sections": items}
+        cursor.execute(
+            "UPDATE digest_archive SET summary = ?, document = ? WHERE id = ?",
+            (json.dumps(summary, ensure_ascii=False), json.dumps(document, ensure_ascii=False), digest_id)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return digest_id
+
+
+def archive_generation() -> int:
+    """id последнего дайджеста: поменялся — ответы API надо пересобрать"""
+    conn = get_connection()
+    try:
+        return conn.execute("SELECT COALESCE(MAX(id), 0) FROM digest_archive").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _chat_filter(chat: Optional[str]) -> tuple[str, tuple]:
+    if chat is None:
+        return "", ()
+    return " AND EXISTS (SELECT 1 FROM json_each(chats) WHERE value = ?)", (chat,)
+
+
+def latest_digest_id(chat: str = None) -> Optional[int]:
+    where, params = _chat_filter(chat)
+    conn = get_connection()
+    try:
+        row = conn.execute(f"SELECT MAX(id) FROM digest_archive WHERE 1{where}", params).fetchone()
+    finally:
+        conn.close()
+    return row[0]
+
+
+def load_document(digest_id: int) -> Optional[str]:
+    """Документ дайджеста — готовой JSON-строкой"""
+    conn = get_connection()
+    try:
+        row = conn.execute("SELECT document FROM digest_archive WHERE id = ?", (digest_id,)).fetchone()
+    finally:
+        conn.close()
+    return row["document"] if row else None
+
+
+def list_digests(before_id: int = None, limit: int = 50, chat: str = None) -> list[tuple[int, str]]:
+    """(id, сводка JSON-строкой) от новых к старым, id < before_id"""
+    where, params = _chat_filter(chat)
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            f"SELECT id, summary FROM digest_archive WHERE id < ?{where} ORDER BY id DESC LIMIT ?",
+            (before_id if before_id is not None else 2 ** 63 - 1, *params, limit)
+        ).fetchall()
+    finally:
+        conn.close()
+    return [(row["id"], row["summary"]) for row in rows]
+
+
+def query_items(section: str = None, source: str = None, topic: str = None, since: datetime = None,
+                before_id: int = None, limit: int = 50) -> list[tuple[int, str]]:
+    """(id, материал JSON-строкой) от новых к старым по фильтрам, id < before_id"""
+    where = ["id < ?"]
+    params: list = [before_id if before_id is not None else 2 ** 63 - 1]
+    if section:
+        where.append("section = ?")
+        params.append(section)
+    if source:
+        where.append("source = ?")
+        params.append(source)
+    if since:
+        where.append("published_at >= ?")
+        params.append(since.isoformat())
+    if topic:
+        where.append("EXISTS (SELECT 1 FROM json_each(payload, '$.tags') WHERE lower(value) = ?)")
+        params.append(topic.lower())
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            f"""SELECT id, payload FROM digest_archive_items
+                WHERE {' AND '.join(where)} ORDER BY id DESC LIMIT ?""",
+            (*params, limit)
+        ).fetchall()
+    finally:
+        conn.close()
+    return [(row["id"], row["payload"]) for row in rows]
+
+
+def cleanup_archive(days: int = 30):
+    """Дайджесты старше N дней вместе с материалами"""
+    conn = get_connection()
+    cutoff = datetime.now() - timedelta(days=days)
+    conn.execute(
+        "DELETE FROM digest_archive_items WHERE digest_id IN (SELECT id FROM digest_archive WHERE created_at < ?)",
+        (cutoff,)
+    )
+    conn.execute("DELETE FROM digest_archive WHERE created_at < ?", (cutoff,))
+    conn.commit()
+    conn.close()
+
+
+# Инициализация при импорте
+init_archive_tables()
@@ -0,0 +1,147 @@
+"""
+Дедупликация по чатам: что уже ушло в каждый чат.
+
+sent_articles / sent_fundraising остаются общей историей (статистика,
+отчёт по источникам, алерты); chat_sent отвечает на вопрос «видел ли
+этот чат материал». Проверка идёт одним запросом на все чаты сразу;
+пишется chat_sent при доставке (core/delivery.py). chat_sent — такая же
+помесячно партиционированная история (db/database.py), как sent_articles,
+и уходит вместе с ней через drop_expired_partitions().
+
+Новый чат историю не копирует: в chat_seeded ставится отметка времени,
+и всё, что ушло в общую историю до неё, для чата считается отправленным.
+
+Здесь — реализация для store.backend = sqlite; снаружи к ней обращаются
+через хранилище (db/store.py), у kv и memory своя.
+"""
+
+from datetime import datetime
+
+from db.database import current_partition, get_connection
+
+KIND_ARTICLE = "article"
+KIND_FUNDRAISING = "fundraising"
+
+# SQLite по умолчанию допускает 999 параметров в запросе
+CHUNK = 500
+
+
+def init_audience_tables():
+    # chat_sent и его партиции создаёт init_db (db/database.py)
+    conn = get_connection()
+    # seeded_at = NULL: чат получил копию истории до перехода на отметки,
+    # общая история ему больше не нужна
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chat_seeded'").fetchone():
+        conn.execute("""
+            CREATE TABLE chat_seeded (
+                chat_id TEXT PRIMARY KEY,
+                seeded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.execute("INSERT INTO chat_seeded (chat_id, seeded_at) SELECT DISTINCT chat_id, NULL FROM chat_sent")
+    conn.commit()
+    conn.close()
+
+
+def fundraising_sent_key(project: str, round_type: str) -> str:
+    """Тот же ключ, что у sent_fundraising: (project lower, round_type)"""
+    return f"{project.lower()}|{round_type or 'unknown'}"
+
+
+def seed_chat_history(chat_ids: list[str]):
+    """
+    Чат без истории (новый или первый прогон после перехода на профили)
+    видит общую историю до этого момента как уже отправленную — иначе ему
+    пришло бы всё уже отправленное. Уже отмеченные чаты не трогаются.
+    """
+    conn = get_connection()
+    try:
+        conn.executemany(
+            "INSERT OR IGNORE INTO chat_seeded (chat_id) VALUES (?)",
+            [(chat_id,) for chat_id in chat_ids]
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def mark_chat_sent(chat_id: str, rows: list[tuple[str, str]], now: datetime = None):
+    """Пачка (kind, item_key), доставленных в чат"""
+    now = now or datetime.utcnow()
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        # В партицию текущего месяца, если этого ключа у чата нет во всей истории
+        table = current_partition(cursor, "chat_sent")
+        cursor.executemany(
+            f"""INSERT OR IGNORE INTO {table} (chat_id, kind, item_key, sent_at) SELECT ?, ?, ?, ?
+                WHERE NOT EXISTS (SELECT 1 FROM chat_sent WHERE chat_id = ? AND kind = ? AND item_key = ?)""",
+            [(chat_id, kind, key, now, chat_id, kind, key) for kind, key in rows]
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _shared_sent_at(conn, kind: str, chunk: list[str]):
+    """(item_key, sent_at) из общей истории для ключей chunk"""
+    if kind == KIND_ARTICLE:
+        return conn.execute(
+            f"SELECT url, sent_at FROM sent_articles WHERE url IN ({','.join('?' * len(chunk))})",
+            chunk
+        )
+    projects = list({key.rpartition("|")[0] for key in chunk})
+    wanted = set(chunk)
+    rows = conn.execute(
+        f"""SELECT project || '|' || COALESCE(round_type, 'unknown'), sent_at FROM sent_fundraising
+            WHERE project IN ({','.join('?' * len(projects))})""",
+        projects
+    )
+    return [row for row in rows if row[0] in wanted]
+
+
+def sent_keys(chat_ids: list[str], kind: str, keys: list[str]) -> dict[str, set[str]]:
+    """Для каждого чата — какие из keys он уже получил (свои + общая история до отметки)"""
+    result = {chat_id: set() for chat_id in chat_ids}
+    if not keys or not chat_ids:
+        return result
+    wanted = set(chat_ids)
+    conn = get_connection()
+    try:
+        seeded = {}
+        ids = list(wanted)
+        for i in range(0, len(ids), CHUNK):
+            chunk = ids[i:i + CHUNK]
+            seeded.update(
+                (row["chat_id"], row["seeded_at"]) for row in conn.execute(
+                    f"""SELECT chat_id, seeded_at FROM chat_seeded
+                        WHERE seeded_at IS NOT NULL AND chat_id IN ({','.join('?' * len(chunk))})""",
+                    chunk
+                )
+            )
+
+        keys = list(dict.fromkeys(keys))
+        for i in range(0, len(keys), CHUNK):
+            chunk = keys[i:i + CHUNK]
+            rows = conn.execute(
+                f"""SELECT chat_id, item_key FROM chat_sent
+                    WHERE kind = ? AND item_key IN ({','.join('?' * len(chunk))})""",
+                (kind, *chunk)
+            )
+            for row in rows:
+                if row["chat_id"] in wanted:
+                    result[row["chat_id"]].add(row["item_key"])
+            if not seeded:
+                continue
+            # sent_at и seeded_at — оба CURRENT_TIMESTAMP, строки сравнимы
+            for item_key, sent_at in _shared_sent_at(conn, kind, chunk):
+                for chat_id, seeded_at in seeded.items():
+                    if sent_at and sent_at <= seeded_at:
+                        result[chat_id].add(item_key)
+    finally:
+        conn.close()
+    return result
+
+
+# Инициализация при импорте
+init_audience_tables()
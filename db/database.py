@@ -1,60 +1,215 @@
 """
 SQLite база для хранения отправленных материалов.
 Защита от дублей между дайджестами.
+История — помесячными партициями за view (PARTITIONED).
+
+Путь к файлу — MARKET_PULSE_DB из окружения процесса, иначе
+data/market_pulse.db. Таблицы создаются при импорте, так что путь
+должен быть задан до первого импорта db.* (так делают бенчмарки).
 """
 
+import json
+import os
 import sqlite3
+import threading
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Optional
 
-DB_PATH = Path(__file__).parent.parent / "data" / "market_pulse.db"
+DB_PATH = Path(os.environ.get("MARKET_PULSE_DB") or Path(__file__).parent.parent / "data" / "market_pulse.db")
+CHUNK = 500
+
+
+# Потоки db/aio.py подставляют сюда своё долгоживущее соединение
+_thread = threading.local()
 
 
 def get_connection() -> sqlite3.Connection:
-    """Получить соединение с БД"""
+    """Получить соединение с БД (в потоках db/aio.py — соединение потока)"""
+    shared = getattr(_thread, "connection", None)
+    if shared is not None:
+        return shared
     DB_PATH.parent.mkdir(parents=True, exist_ok=True)
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
     return conn
 
 
+# Таблицы истории хранятся помесячными партициями (sent_articles_202510, ...)
+# за одноимёнными view: очистка — DROP TABLE целого месяца вместо DELETE
+# по всей истории. Уникальность url / (project, round_type) — по всей истории,
+# её проверяют функции записи. chat_sent (что ушло в какой чат, db/audience.py)
+# растёт как чаты × история и чистится так же.
+PARTITIONED = {
+    "sent_articles": (
+        ("url", "title", "source", "sent_at"),
+        """url TEXT UNIQUE NOT NULL,
+           title TEXT NOT NULL,
+           source TEXT,
+           sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP""",
+    ),
+    "sent_fundraising": (
+        ("project", "round_type", "amount", "source_url", "sent_at", "source", "lead_investors"),
+        """project TEXT NOT NULL,
+           round_type TEXT,
+           amount REAL,
+           source_url TEXT,
+           sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+           source TEXT,
+           lead_investors TEXT,
+           UNIQUE(project, round_type)""",
+    ),
+    "chat_sent": (
+        ("chat_id", "kind", "item_key", "sent_at"),
+        """chat_id TEXT NOT NULL,
+           kind TEXT NOT NULL,
+           item_key TEXT NOT NULL,
+           sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+           PRIMARY KEY (chat_id, kind, item_key)""",
+    ),
+}
+# Индексы партиций, кроме sent_at и тех, что дают UNIQUE / PRIMARY KEY
+PARTITION_INDEXES = {
+    "chat_sent": {"key": "kind, item_key"},
+}
+VACUUM_STEP_PAGES = 2048     # страниц за одну транзакцию incremental_vacuum
+
+
 def init_db():
     """Инициализация таблиц"""
     conn = get_connection()
     cursor = conn.cursor()
 
-    # Таблица отправленных статей
+    # Освобождённые DROP TABLE страницы возвращаются incremental_vacuum();
+    # для уже существующей базы режим включается одним полным VACUUM
+    if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        if cursor.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchone():
+            print("Database: one-time VACUUM to enable incremental vacuum...")
+            cursor.execute("VACUUM")
+
+    # Каталог партиций и миграция — одной транзакцией
+    cursor.execute("BEGIN IMMEDIATE")
     cursor.execute("""
-        CREATE TABLE IF NOT EXISTS sent_articles (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            url TEXT UNIQUE NOT NULL,
-            title TEXT NOT NULL,
-            source TEXT,
-            sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        CREATE TABLE IF NOT EXISTS history_partitions (
+            table_name TEXT PRIMARY KEY,
+            base TEXT NOT NULL,
+            month TEXT NOT NULL,
+            rows INTEGER NOT NULL DEFAULT 0
         )
     """)
-
-    # Таблица отправленных fundraising
+    # Триггеры других модулей (db/stats.py), которые ставятся на каждую новую партицию
     cursor.execute("""
-        CREATE TABLE IF NOT EXISTS sent_fundraising (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            project TEXT NOT NULL,
-            round_type TEXT,
-            amount REAL,
-            source_url TEXT,
-            sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(project, round_type)
+        CREATE TABLE IF NOT EXISTS partition_triggers (
+            name TEXT PRIMARY KEY,
+            base TEXT NOT NULL,
+            body TEXT NOT NULL
         )
     """)
 
-    # Индексы для быстрого поиска
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_articles_url ON sent_articles(url)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_articles_sent ON sent_articles(sent_at)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_fundraising_project ON sent_fundraising(project)")
+    migrated = False
+    for base in PARTITIONED:
+        # Миграция: обычная таблица истории → помесячные партиции
+        if cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (base,)).fetchone():
+            _migrate_to_partitions(cursor, base)
+            migrated = True
+        current_partition(cursor, base)
 
     conn.commit()
     conn.close()
+    if migrated:
+        incremental_vacuum()     # страницы старых таблиц
+
+
+def partition_month(at: datetime = None) -> str:
+    """Месяц партиции; sent_at пишется CURRENT_TIMESTAMP, то есть в UTC"""
+    return (at or datetime.utcnow()).strftime("%Y%m")
+
+
+def _create_partition(cursor, base: str, month: str) -> str:
+    table = f"{base}_{month}"
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} ({PARTITIONED[base][1]})")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_sent ON {table}(sent_at)")
+    for name, columns in PARTITION_INDEXES.get(base, {}).items():
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{name} ON {table}({columns})")
+    cursor.execute("INSERT OR IGNORE INTO history_partitions (table_name, base, month) VALUES (?, ?, ?)",
+                   (table, base, month))
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_rows AFTER INSERT ON {table} BEGIN
+                           UPDATE history_partitions SET rows = rows + 1 WHERE table_name = '{table}';
+                       END""")
+    for row in cursor.execute("SELECT name, body FROM partition_triggers WHERE base = ?", (base,)).fetchall():
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {row[0]}_{table} AFTER INSERT ON {table} BEGIN {row[1]} END")
+    return table
+
+
+def _partitions(cursor, base: str) -> list[tuple[str, str]]:
+    """(таблица, месяц) от старых к новым"""
+    return [(row[0], row[1]) for row in cursor.execute(
+        "SELECT table_name, month FROM history_partitions WHERE base = ? ORDER BY month", (base,)
+    )]
+
+
+def _rebuild_view(cursor, base: str):
+    columns = ", ".join(PARTITIONED[base][0])
+    union = " UNION ALL ".join(f"SELECT {columns} FROM {table}" for table, _ in _partitions(cursor, base))
+    cursor.execute(f"DROP VIEW IF EXISTS {base}")
+    cursor.execute(f"CREATE VIEW {base} AS {union}")
+
+
+def current_partition(cursor, base: str) -> str:
+    """Партиция текущего месяца; в начале месяца создаётся (и пересобирается view)"""
+    month = partition_month()
+    table = f"{base}_{month}"
+    if cursor.execute("SELECT 1 FROM history_partitions WHERE table_name = ?", (table,)).fetchone() is None:
+        _create_partition(cursor, base, month)
+        _rebuild_view(cursor, base)
+    return table
+
+
+def _migrate_to_partitions(cursor, base: str):
+    # В старых базах части колонок ещё нет (source, lead_investors)
+    existing = {row[1] for row in cursor.execute(f"PRAGMA table_info({base})")}
+    columns = ", ".join(c for c in PARTITIONED[base][0] if c in existing)
+    # Пустая или нечитаемая дата — в текущий месяц
+    month_of = "COALESCE(strftime('%Y%m', sent_at), strftime('%Y%m', 'now'))"
+    months = [row[0] for row in cursor.execute(f"SELECT DISTINCT {month_of} FROM {base}")]
+    print(f"Database: moving {base} into {len(months)} monthly partition(s)...")
+    for month in months:
+        table = _create_partition(cursor, base, month)
+        cursor.execute(
+            f"""INSERT OR IGNORE INTO {table} ({columns}) SELECT {columns} FROM {base}
+                WHERE {month_of} = ?""",
+            (month,)
+        )
+    _create_partition(cursor, base, partition_month())
+    # Старая таблица уходит вместе со своими индексами и триггерами
+    cursor.execute(f"DROP TABLE {base}")
+    _rebuild_view(cursor, base)
+
+
+def register_partition_trigger(cursor, base: str, name: str, body: str):
+    """
+    AFTER INSERT-триггер на все партиции base, нынешние и будущие.
+    body — тело между BEGIN и END (строка — NEW).
+    """
+    row = cursor.execute("SELECT body FROM partition_triggers WHERE name = ?", (name,)).fetchone()
+    changed = row is not None and row[0] != body
+    cursor.execute("INSERT OR REPLACE INTO partition_triggers (name, base, body) VALUES (?, ?, ?)",
+                   (name, base, body))
+    for table, _ in _partitions(cursor, base):
+        if changed:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}_{table}")
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name}_{table} AFTER INSERT ON {table} BEGIN {body} END")
+
+
+def history_counts() -> dict[str, int]:
+    """Строк в каждой таблице истории — из каталога партиций, без COUNT(*)"""
+    conn = get_connection()
+    try:
+        rows = conn.execute("SELECT base, SUM(rows) AS n FROM history_partitions GROUP BY base").fetchall()
+    finally:
+        conn.close()
+    return {row["base"]: row["n"] for row in rows}
 
 
 def is_article_sent(url: str) -> bool:
@@ -85,10 +240,7 @@ def mark_article_sent(url: str, title: str, source: str):
     conn = get_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute(
-            "INSERT OR IGNORE INTO sent_articles (url, title, source) VALUES (?, ?, ?)",
-            (url, title, source)
-        )
+        _insert_articles(cursor, [(url, title, source)])
         conn.commit()
     except Exception as e:
         print(f"DB error marking article: {e}")
@@ -96,16 +248,13 @@ def mark_article_sent(url: str, title: str, source: str):
         conn.close()
 
 
-def mark_fundraising_sent(project: str, round_type: str, amount: Optional[float], source_url: str):
+def mark_fundraising_sent(project: str, round_type: str, amount: Optional[float], source_url: str,
+                          source: str = None, lead_investors: list[str] = None):
     """Пометить fundraising как отправленный"""
     conn = get_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute(
-            """INSERT OR IGNORE INTO sent_fundraising
-               (project, round_type, amount, source_url) VALUES (?, ?, ?, ?)""",
-            (project.lower(), round_type, amount, source_url)
-        )
+        _insert_rounds(cursor, [(project, round_type, amount, source_url, source, lead_investors)])
         conn.commit()
     except Exception as e:
         print(f"DB error marking fundraising: {e}")
@@ -113,38 +262,140 @@ def mark_fundraising_sent(project: str, round_type: str, amount: Optional[float]
         conn.close()
 
 
-def cleanup_old_records(days: int = 30):
-    """Удалить старые записи (старше N дней)"""
+def sent_article_urls(urls: list[str]) -> set[str]:
+    """Какие из urls уже отправлены — один запрос на пачку"""
+    found = set()
+    urls = list(dict.fromkeys(urls))
     conn = get_connection()
-    cursor = conn.cursor()
-    cutoff = datetime.now() - timedelta(days=days)
+    try:
+        for i in range(0, len(urls), CHUNK):
+            chunk = urls[i:i + CHUNK]
+            rows = conn.execute(
+                f"SELECT url FROM sent_articles WHERE url IN ({','.join('?' * len(chunk))})", chunk
+            )
+            found.update(row["url"] for row in rows)
+    finally:
+        conn.close()
+    return found
 
-    cursor.execute("DELETE FROM sent_articles WHERE sent_at < ?", (cutoff,))
-    cursor.execute("DELETE FROM sent_fundraising WHERE sent_at < ?", (cutoff,))
 
-    conn.commit()
-    conn.close()
+def sent_fundraising_keys(keys: list[tuple[str, str]]) -> set[tuple[str, str]]:
+    """Какие из (project, round_type) уже отправлены; project — как в mark_fundraising_sent"""
+    wanted = {(project.lower(), round_type) for project, round_type in keys}
+    projects = list({project for project, _ in wanted})
+    found = set()
+    conn = get_connection()
+    try:
+        for i in range(0, len(projects), CHUNK):
+            chunk = projects[i:i + CHUNK]
+            rows = conn.execute(
+                f"SELECT project, round_type FROM sent_fundraising WHERE project IN ({','.join('?' * len(chunk))})",
+                chunk
+            )
+            found.update(key for key in ((row["project"], row["round_type"]) for row in rows) if key in wanted)
+    finally:
+        conn.close()
+    return found
+
 
-    print(f"Cleaned up records older than {days} days")
+def _insert_articles(cursor, rows: list[tuple[str, str, str]]):
+    """В партицию текущего месяца, если url нет во всей истории"""
+    table = current_partition(cursor, "sent_articles")
+    cursor.executemany(
+        f"""INSERT OR IGNORE INTO {table} (url, title, source) SELECT ?, ?, ?
+            WHERE NOT EXISTS (SELECT 1 FROM sent_articles WHERE url = ?)""",
+        [(url, title, source, url) for url, title, source in rows]
+    )
 
 
-def get_stats() -> dict:
-    """Получить статистику БД"""
+def _insert_rounds(cursor, rows: list[tuple]):
+    table = current_partition(cursor, "sent_fundraising")
+    cursor.executemany(
+        f"""INSERT OR IGNORE INTO {table}
+            (project, round_type, amount, source_url, source, lead_investors) SELECT ?, ?, ?, ?, ?, ?
+            WHERE NOT EXISTS (SELECT 1 FROM sent_fundraising WHERE project = ? AND round_type = ?)""",
+        [(project.lower(), round_type, amount, source_url, source,
+          json.dumps(lead_investors or [], ensure_ascii=False), project.lower(), round_type)
+         for project, round_type, amount, source_url, source, lead_investors in rows]
+    )
+
+
+def mark_articles_sent(rows: list[tuple[str, str, str]]):
+    """Пачка (url, title, source) — одной транзакцией"""
     conn = get_connection()
-    cursor = conn.cursor()
+    try:
+        _insert_articles(conn.cursor(), rows)
+        conn.commit()
+    finally:
+        conn.close()
 
-    cursor.execute("SELECT COUNT(*) FROM sent_articles")
-    articles_count = cursor.fetchone()[0]
 
-    cursor.execute("SELECT COUNT(*) FROM sent_fundraising")
-    fundraising_count = cursor.fetchone()[0]
+def mark_rounds_sent(rows: list[tuple]):
+    """Пачка (project, round_type, amount, source_url, source, lead_investors) — одной транзакцией"""
+    conn = get_connection()
+    try:
+        _insert_rounds(conn.cursor(), rows)
+        conn.commit()
+    finally:
+        conn.close()
 
-    conn.close()
 
-    return {
-        "articles": articles_count,
-        "fundraising": fundraising_count
-    }
+def drop_expired_partitions(days: int = 30) -> list[str]:
+    """
+    Удалить месяцы истории, целиком старше N дней, — DROP TABLE, без
+    сканов. Месяц, в который попадает граница, живёт до конца, так что
+    история хранится от N до N + 31 дня.
+    """
+    cutoff = partition_month(datetime.utcnow() - timedelta(days=days))
+    current = partition_month()
+    dropped = []
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        for base in PARTITIONED:
+            expired = [table for table, month in _partitions(cursor, base) if month < cutoff and month != current]
+            for table in expired:
+                cursor.execute(f"DROP TABLE {table}")
+                cursor.execute("DELETE FROM history_partitions WHERE table_name = ?", (table,))
+            if expired:
+                _rebuild_view(cursor, base)
+            dropped += expired
+        conn.commit()
+    finally:
+        conn.close()
+    return dropped
+
+
+def incremental_vacuum(step_pages: int = VACUUM_STEP_PAGES, max_steps: Optional[int] = None) -> int:
+    """
+    Вернуть ОС свободные страницы порциями по step_pages — каждая порция
+    своей короткой транзакцией, писатели между ними не ждут. Вызывать на
+    своём соединении, не через db/aio.py: executescript коммитит.
+
+    Returns:
+        сколько страниц освобождено
+    """
+    conn = get_connection()
+    freed = 0
+    try:
+        steps = 0
+        while max_steps is None or steps < max_steps:
+            free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if not free:
+                break
+            # execute() делает один шаг прагмы — одну страницу; executescript — всю порцию
+            conn.executescript(f"PRAGMA incremental_vacuum({min(free, step_pages)})")
+            freed += free - conn.execute("PRAGMA freelist_count").fetchone()[0]
+            steps += 1
+    finally:
+        conn.close()
+    return freed
+
+
+def cleanup_old_records(days: int = 30):
+    """Удалить старые записи (месяцы старше N дней); место возвращает incremental_vacuum()"""
+    dropped = drop_expired_partitions(days)
+    print(f"Cleaned up records older than {days} days ({len(dropped)} monthly partition(s) dropped)")
 
 
 # Инициализация при импорте
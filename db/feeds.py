@@ -0,0 +1,151 @@
+"""
+Состояние опроса фидов: выученный интервал публикаций и время следующего опроса.
+Переживает рестарты планировщика.
+
+feed_cursors — курсор фида: GUID записей, уже разобранных при прошлом
+опросе, и дата самой новой из них. Записи до курсора пропускаются
+до того, как из них собирается Article (см. collectors.articles.parse_rss).
+"""
+
+import json
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Optional
+
+from db.database import get_connection
+
+# Запись без знакомого GUID, но старше самой новой разобранной на столько, —
+# старая запись, выпавшая из окна GUID (или GUID сменился), а не новая
+CURSOR_GRACE = timedelta(days=1)
+CURSOR_GUIDS = 100
+
+
+def init_feed_tables():
+    conn = get_connection()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS feed_schedule (
+            source TEXT PRIMARY KEY,
+            poll_interval_s REAL NOT NULL,
+            publish_interval_s REAL,
+            next_poll_at TIMESTAMP NOT NULL,
+            last_polled_at TIMESTAMP,
+            last_entry_at TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS feed_cursors (
+            source TEXT PRIMARY KEY,
+            guids TEXT NOT NULL,
+            newest_at TIMESTAMP,
+            updated_at TIMESTAMP NOT NULL
+        )
+    """)
+    conn.commit()
+    conn.close()
+
+
+@dataclass
+class FeedState:
+    source: str
+    poll_interval_s: float
+    next_poll_at: datetime
+    publish_interval_s: Optional[float] = None
+    last_polled_at: Optional[datetime] = None
+    last_entry_at: Optional[datetime] = None
+
+
+@dataclass(frozen=True)
+class FeedCursor:
+    source: str
+    guids: tuple[str, ...] = ()    # новые первыми, не больше CURSOR_GUIDS
+    newest_at: Optional[datetime] = None
+    _known: frozenset = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "_known", frozenset(self.guids))
+
+    def seen(self, guid: str, published: Optional[datetime]) -> bool:
+        if guid in self._known:
+            return True
+        return published is not None and self.newest_at is not None and published < self.newest_at - CURSOR_GRACE
+
+
+def _parse_ts(value) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def load_feed_states(sources: Optional[list[str]] = None) -> dict[str, FeedState]:
+    """Все состояния или только sources (воркер — только что взятые в аренду)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    if sources is None:
+        cursor.execute("SELECT * FROM feed_schedule")
+    else:
+        cursor.execute(f"SELECT * FROM feed_schedule WHERE source IN ({','.join('?' * len(sources))})", sources)
+    states = {
+        row["source"]: FeedState(
+            source=row["source"],
+            poll_interval_s=row["poll_interval_s"],
+            next_poll_at=_parse_ts(row["next_poll_at"]),
+            publish_interval_s=row["publish_interval_s"],
+            last_polled_at=_parse_ts(row["last_polled_at"]),
+            last_entry_at=_parse_ts(row["last_entry_at"]),
+        )
+        for row in cursor.fetchall()
+    }
+    conn.close()
+    return states
+
+
+def save_feed_state(state: FeedState):
+    conn = get_connection()
+    try:
+        conn.execute(
+            """INSERT INTO feed_schedule
+               (source, poll_interval_s, publish_interval_s, next_poll_at, last_polled_at, last_entry_at)
+               VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT(source) DO UPDATE SET
+                   poll_interval_s = excluded.poll_interval_s,
+                   publish_interval_s = excluded.publish_interval_s,
+                   next_poll_at = excluded.next_poll_at,
+                   last_polled_at = excluded.last_polled_at,
+                   last_entry_at = excluded.last_entry_at""",
+            (state.source, state.poll_interval_s, state.publish_interval_s,
+             state.next_poll_at, state.last_polled_at, state.last_entry_at)
+        )
+        conn.commit()
+    except Exception as e:
+        print(f"DB error saving feed state: {e}")
+    finally:
+        conn.close()
+
+
+def load_cursor(source: str) -> FeedCursor:
+    conn = get_connection()
+    try:
+        row = conn.execute("SELECT guids, newest_at FROM feed_cursors WHERE source = ?", (source,)).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return FeedCursor(source)
+    return FeedCursor(source, tuple(json.loads(row["guids"])), _parse_ts(row["newest_at"]))
+
+
+def save_cursor(cursor: FeedCursor):
+    conn = get_connection()
+    try:
+        conn.execute(
+            """INSERT INTO feed_cursors (source, guids, newest_at, updated_at) VALUES (?, ?, ?, ?)
+               ON CONFLICT(source) DO UPDATE SET
+                   guids = excluded.guids,
+                   newest_at = excluded.newest_at,
+                   updated_at = excluded.updated_at""",
+            (cursor.source, json.dumps(cursor.guids), cursor.newest_at, datetime.now())
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+# Инициализация при импорте
+init_feed_tables()
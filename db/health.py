@@ -0,0 +1,261 @@
+"""
+Здоровье источников: история запросов и circuit breaker.
+
+Каждый запрос к источнику пишется в source_health (латентность, статус,
+класс ошибки, сколько записей вернул). После FAILURE_THRESHOLD ошибок
+подряд breaker открывается, и источник пропускается до open_until.
+Интервал до следующей пробы растёт экспоненциально; первая успешная
+проба закрывает breaker.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+from db.database import get_connection
+
+FAILURE_THRESHOLD = 2
+BASE_PROBE_INTERVAL = timedelta(hours=1)
+MAX_PROBE_INTERVAL = timedelta(days=7)
+
+# Статусы, которые считаются ошибкой источника
+FAILURE_STATUSES = ("error", "timeout")
+
+
+def init_health_tables():
+    """Таблицы истории и состояния breaker'ов"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS source_health (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            source TEXT NOT NULL,
+            checked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            latency_ms INTEGER,
+            status TEXT NOT NULL,
+            error_class TEXT,
+            entries INTEGER DEFAULT 0
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS source_breakers (
+            source TEXT PRIMARY KEY,
+            failures INTEGER NOT NULL DEFAULT 0,
+            open_until TIMESTAMP,
+            last_error TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_health_source ON source_health(source, checked_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_health_checked ON source_health(checked_at)")
+
+    conn.commit()
+    conn.close()
+
+
+@dataclass
+class Breaker:
+    failures: int = 0
+    open_until: Optional[datetime] = None
+    last_error: Optional[str] = None
+    dirty: bool = False
+
+
+def probe_interval(failures: int) -> timedelta:
+    """Экспоненциальный интервал до следующей пробы"""
+    steps = max(0, failures - FAILURE_THRESHOLD)
+    interval = BASE_PROBE_INTERVAL * (2 ** min(steps, 16))
+    return min(interval, MAX_PROBE_INTERVAL)
+
+
+class SourceHealth:
+    """
+    Состояние breaker'ов на время прогона.
+
+    Загружается одним запросом в начале, записи копятся в памяти
+    и пишутся одной транзакцией в flush().
+    """
+
+    def __init__(self, now: datetime = None):
+        self._now = now
+        self.breakers = load_breakers()
+        self.records: list[tuple] = []
+
+    @property
+    def now(self) -> datetime:
+        """Фиксированное время прогона или текущее (для долгоживущего планировщика)"""
+        return self._now or datetime.now()
+
+    def allow(self, source: str) -> bool:
+        """Можно ли сейчас ходить в источник (breaker закрыт или пора пробовать)"""
+        breaker = self.breakers.get(source)
+        if breaker is None or breaker.open_until is None:
+            return True
+        return breaker.open_until <= self.now
+
+    def record(self, source: str, status: str, latency_ms: int = 0,
+               error_class: str = None, entries: int = 0):
+        now = self.now
+        self.records.append((source, now, latency_ms, status, error_class, entries))
+
+        if status in FAILURE_STATUSES:
+            breaker = self.breakers.setdefault(source, Breaker())
+            breaker.failures += 1
+            breaker.last_error = error_class or status
+            if breaker.failures >= FAILURE_THRESHOLD:
+                breaker.open_until = now + probe_interval(breaker.failures)
+                print(f"    Circuit open for {source} until {breaker.open_until:%Y-%m-%d %H:%M}")
+            breaker.dirty = True
+        elif status == "ok":
+            breaker = self.breakers.get(source)
+            if breaker is not None and (breaker.failures or breaker.open_until):
+                breaker.failures = 0
+                breaker.open_until = None
+                breaker.last_error = None
+                breaker.dirty = True
+
+    def skipped(self) -> list[str]:
+        return [r[0] for r in self.records if r[3] == "skipped"]
+
+    def take(self) -> tuple[list[tuple], list[tuple]]:
+        """
+        Накопленное для записи (история, изменившиеся breaker'ы) — и сброс.
+        Снимок берётся там же, где пишутся записи, сама запись может идти
+        в другом потоке (db/aio.py).
+        """
+        breakers = [
+            (source, b.failures, b.open_until, b.last_error, self.now)
+            for source, b in self.breakers.items() if b.dirty
+        ]
+        records = self.records
+        for b in self.breakers.values():
+            b.dirty = False
+        self.records = []
+        return records, breakers
+
+    def flush(self):
+        """Записать историю и изменившиеся breaker'ы"""
+        write_health(*self.take())
+
+
+def write_health(records: list[tuple], breakers: list[tuple]):
+    """Одной транзакцией: (см. SourceHealth.take)"""
+    if not records and not breakers:
+        return
+
+    conn = get_connection()
+    try:
+        conn.executemany(
+            """INSERT INTO source_health
+               (source, checked_at, latency_ms, status, error_class, entries)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            records
+        )
+        conn.executemany(
+            """INSERT INTO source_breakers (source, failures, open_until, last_error, updated_at)
+               VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT(source) DO UPDATE SET
+                   failures = excluded.failures,
+                   open_until = excluded.open_until,
+                   last_error = excluded.last_error,
+                   updated_at = excluded.updated_at""",
+            breakers
+        )
+        conn.commit()
+    except Exception as e:
+        print(f"DB error saving source health: {e}")
+    finally:
+        conn.close()
+
+
+def load_breakers() -> dict[str, Breaker]:
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT source, failures, open_until, last_error FROM source_breakers")
+    breakers = {}
+    for row in cursor.fetchall():
+        open_until = datetime.fromisoformat(row["open_until"]) if row["open_until"] else None
+        breakers[row["source"]] = Breaker(row["failures"], open_until, row["last_error"])
+    conn.close()
+    return breakers
+
+
+def reset_breaker(source: str):
+    """Принудительно закрыть breaker источника"""
+    conn = get_connection()
+    conn.execute("DELETE FROM source_breakers WHERE source = ?", (source,))
+    conn.commit()
+    conn.close()
+
+
+def source_report(days: int = 14) -> list[dict]:
+    """
+    Стоимость vs польза по источникам за N дней.
+
+    cost — суммарное время запросов, yield — сколько материалов источника
+    реально ушло в дайджест. Сортировка: самые дорогие на единицу пользы сверху.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    cutoff = datetime.now() - timedelta(days=days)
+
+    cursor.execute(
+        """SELECT source,
+                  COUNT(*) AS runs,
+                  SUM(status = 'ok') AS ok,
+                  SUM(status IN ('error', 'timeout')) AS failed,
+                  SUM(status = 'skipped') AS skipped,
+                  AVG(CASE WHEN status != 'skipped' THEN latency_ms END) AS avg_latency_ms,
+                  SUM(latency_ms) AS total_latency_ms,
+                  SUM(entries) AS entries
+           FROM source_health
+           WHERE checked_at >= ?
+           GROUP BY source""",
+        (cutoff,)
+    )
+    rows = [dict(r) for r in cursor.fetchall()]
+
+    cursor.execute(
+        "SELECT source, COUNT(*) AS sent FROM sent_articles WHERE sent_at >= ? GROUP BY source",
+        (cutoff,)
+    )
+    sent = {r["source"]: r["sent"] for r in cursor.fetchall()}
+    cursor.execute(
+        "SELECT source, COUNT(*) AS sent FROM sent_fundraising WHERE sent_at >= ? GROUP BY source",
+        (cutoff,)
+    )
+    for r in cursor.fetchall():
+        sent[r["source"]] = sent.get(r["source"], 0) + r["sent"]
+
+    cursor.execute("SELECT source, failures, open_until, last_error FROM source_breakers")
+    breakers = {r["source"]: dict(r) for r in cursor.fetchall()}
+    conn.close()
+
+    for row in rows:
+        # "news:coindesk" → "coindesk" (так источник пишется в sent_*)
+        name = row["source"].split(":", 1)[-1]
+        row["sent"] = sent.get(name, 0)
+        row["cost_s"] = (row["total_latency_ms"] or 0) / 1000
+        row["cost_per_item_s"] = row["cost_s"] / row["sent"] if row["sent"] else None
+        breaker = breakers.get(row["source"])
+        row["open_until"] = breaker["open_until"] if breaker else None
+        row["last_error"] = breaker["last_error"] if breaker else None
+
+    rows.sort(key=lambda r: (r["sent"] > 0, -(r["cost_per_item_s"] or r["cost_s"])))
+    return rows
+
+
+def cleanup_health(days: int = 30):
+    """Удалить историю здоровья старше N дней"""
+    conn = get_connection()
+    cutoff = datetime.now() - timedelta(days=days)
+    conn.execute("DELETE FROM source_health WHERE checked_at < ?", (cutoff,))
+    conn.commit()
+    conn.close()
+
+
+# Инициализация при импорте
+init_health_tables()
@@ -0,0 +1,189 @@
+"""
+Аренда источников между воркерами сбора.
+
+Несколько процессов (python main.py --worker, на одной машине или на
+нескольких с общей БД) делят источники через source_leases: воркер
+одним UPDATE ... RETURNING забирает до N источников, которым пора
+опрашиваться и которые никто не держит, опрашивает их и отпускает.
+Пока опрос идёт, heartbeat продлевает аренду; аренда упавшего или
+зависшего воркера истекает, и источник забирает («крадёт») другой.
+
+Результаты опросов воркеры пишут в общий буфер db.pending, дайджест
+сливает их оттуда как обычно. collection_workers — кто жив и сколько
+сделал (для --stats).
+"""
+
+import json
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from db.database import get_connection
+
+
+def init_lease_tables():
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS source_leases (
+            source TEXT PRIMARY KEY,
+            owner TEXT,
+            prev_owner TEXT,
+            lease_until TIMESTAMP,
+            claimed_at TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS collection_workers (
+            worker_id TEXT PRIMARY KEY,
+            started_at TIMESTAMP NOT NULL,
+            heartbeat_at TIMESTAMP NOT NULL,
+            polls INTEGER NOT NULL DEFAULT 0,
+            items INTEGER NOT NULL DEFAULT 0,
+            stolen INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+    conn.commit()
+    conn.close()
+
+
+def register_sources(sources: Iterable[str]):
+    """Источники из конфига в таблицу аренды (уже известные не трогаются)"""
+    conn = get_connection()
+    try:
+        conn.executemany("INSERT OR IGNORE INTO source_leases (source) VALUES (?)",
+                         [(s,) for s in sources])
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def claim_sources(worker_id: str, sources: Iterable[str], limit: int, lease_seconds: float,
+                  now: datetime = None) -> tuple[list[str], int]:
+    """
+    Взять до limit свободных источников из sources, которым пора опрашиваться
+    (по feed_schedule; без состояния — сразу), самые просроченные первыми.
+
+    Returns:
+        (взятые источники, сколько из них отобрано у других по истечении аренды)
+    """
+    now = now or datetime.now()
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            """UPDATE source_leases
+               SET prev_owner = owner, owner = ?, lease_until = ?, claimed_at = ?
+               WHERE source IN (
+                   SELECT l.source FROM source_leases l
+                   LEFT JOIN feed_schedule f ON f.source = l.source
+                   WHERE l.source IN (SELECT value FROM json_each(?))
+                     AND (l.owner IS NULL OR l.lease_until < ?)
+                     AND (f.next_poll_at IS NULL OR f.next_poll_at <= ?)
+                   ORDER BY f.next_poll_at
+                   LIMIT ?
+               )
+               RETURNING source, prev_owner""",
+            (worker_id, now + timedelta(seconds=lease_seconds), now,
+             json.dumps(list(sources)), now, now, limit)
+        ).fetchall()
+        stolen = sum(1 for row in rows if row["prev_owner"] not in (None, worker_id))
+        if stolen:
+            conn.execute("UPDATE collection_workers SET stolen = stolen + ? WHERE worker_id = ?",
+                         (stolen, worker_id))
+        conn.commit()
+    finally:
+        conn.close()
+    return [row["source"] for row in rows], stolen
+
+
+def heartbeat(worker_id: str, sources: Iterable[str], lease_seconds: float,
+              polls: int = 0, items: int = 0, now: datetime = None) -> set[str]:
+    """
+    Продлить аренду источников в работе и отметиться живым; polls / items —
+    приращения счётчиков воркера.
+
+    Returns:
+        какие из sources всё ещё за этим воркером
+    """
+    now = now or datetime.now()
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            """UPDATE source_leases SET lease_until = ?
+               WHERE owner = ? AND source IN (SELECT value FROM json_each(?))
+               RETURNING source""",
+            (now + timedelta(seconds=lease_seconds), worker_id, json.dumps(list(sources)))
+        ).fetchall()
+        conn.execute(
+            """INSERT INTO collection_workers (worker_id, started_at, heartbeat_at, polls, items)
+               VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT(worker_id) DO UPDATE SET
+                   heartbeat_at = excluded.heartbeat_at,
+                   polls = polls + excluded.polls,
+                   items = items + excluded.items""",
+            (worker_id, now, now, polls, items)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return {row["source"] for row in rows}
+
+
+def release(worker_id: str, source: str):
+    """Отпустить источник после опроса (если аренду не успели отобрать)"""
+    conn = get_connection()
+    try:
+        conn.execute("UPDATE source_leases SET owner = NULL, lease_until = NULL WHERE source = ? AND owner = ?",
+                     (source, worker_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def release_all(worker_id: str):
+    """Отпустить всё при штатной остановке — не ждать истечения аренды"""
+    conn = get_connection()
+    try:
+        conn.execute("UPDATE source_leases SET owner = NULL, lease_until = NULL WHERE owner = ?", (worker_id,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def worker_report(alive_seconds: float, now: datetime = None) -> dict:
+    """Воркеры, живые за последние alive_seconds, и кто сколько источников держит"""
+    now = now or datetime.now()
+    conn = get_connection()
+    try:
+        workers = conn.execute(
+            """SELECT worker_id, started_at, heartbeat_at, polls, items, stolen FROM collection_workers
+               WHERE heartbeat_at >= ? ORDER BY worker_id""",
+            (now - timedelta(seconds=alive_seconds),)
+        ).fetchall()
+        held = conn.execute(
+            """SELECT owner, COUNT(*) AS n FROM source_leases
+               WHERE owner IS NOT NULL AND lease_until >= ? GROUP BY owner""",
+            (now,)
+        ).fetchall()
+        total = conn.execute("SELECT COUNT(*) AS n FROM source_leases").fetchone()["n"]
+    finally:
+        conn.close()
+    held = {row["owner"]: row["n"] for row in held}
+    return {
+        "sources": total,
+        "workers": [(row["worker_id"], row["polls"], row["items"], row["stolen"], held.get(row["worker_id"], 0))
+                    for row in workers],
+    }
+
+
+def cleanup_workers(days: int = 7):
+    """Записи воркеров, не отмечавшихся N дней"""
+    conn = get_connection()
+    conn.execute("DELETE FROM collection_workers WHERE heartbeat_at < ?", (datetime.now() - timedelta(days=days),))
+    conn.commit()
+    conn.close()
+
+
+# Инициализация при импорте
+init_lease_tables()
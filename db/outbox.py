@@ -0,0 +1,317 @@
+"""
+Outbox дайджестов: отрендерено и сохранено → доставлено воркерами.
+
+outbox_digests — один отрендеренный дайджест (общий для чатов с
+одинаковой подборкой) и его материалы; outbox_deliveries — доставка
+в конкретный чат со статусом:
+
+    queued → sending → sent
+               ↓  ↑
+             retry      (временная ошибка, ждём next_attempt_at)
+               ↓
+             dead       (постоянная ошибка или кончились попытки)
+             expired    (дайджест устарел, пока ждал доставки)
+
+Воркер берёт доставку, выставляя claimed_at; если процесс упал посреди
+отправки, доставка вернётся в работу, когда истечёт аренда (lease).
+document_sent / pages_sent — докуда дошла отправка: повтор продолжает
+с первой неотправленной страницы, а не шлёт дайджест заново.
+Материалы отмечаются в истории чата (db/store.py) перед подтверждением:
+упал между ними — доставка повторится, но пропуска в истории не будет.
+"""
+
+import json
+from datetime import datetime, timedelta
+from typing import Optional
+
+from db.audience import KIND_ARTICLE, KIND_FUNDRAISING
+from db.database import get_connection
+
+QUEUED = "queued"
+SENDING = "sending"
+RETRY = "retry"
+SENT = "sent"
+DEAD = "dead"
+EXPIRED = "expired"
+
+OPEN = (QUEUED, SENDING, RETRY)
+
+
+def init_outbox_tables():
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS outbox_digests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_id TEXT NOT NULL,
+            message TEXT NOT NULL,
+            pages TEXT NOT NULL DEFAULT '[]',
+            items TEXT NOT NULL,
+            created_at TIMESTAMP NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS outbox_deliveries (
+            digest_id INTEGER NOT NULL,
+            chat_id TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at TIMESTAMP NOT NULL,
+            claimed_at TIMESTAMP,
+            sent_at TIMESTAMP,
+            last_error TEXT,
+            document_sent INTEGER NOT NULL DEFAULT 0,
+            pages_sent INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (digest_id, chat_id)
+        )
+    """)
+    # Миграция: готовые страницы (≤ 4096 видимых символов) рядом с полным текстом
+    columns = {row["name"] for row in cursor.execute("PRAGMA table_info(outbox_digests)")}
+    if "pages" not in columns:
+        cursor.execute("ALTER TABLE outbox_digests ADD COLUMN pages TEXT NOT NULL DEFAULT '[]'")
+    # Миграция: прогресс отправки по частям
+    columns = {row["name"] for row in cursor.execute("PRAGMA table_info(outbox_deliveries)")}
+    for column in ("document_sent", "pages_sent"):
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE outbox_deliveries ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0")
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox_deliveries(status, next_attempt_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_outbox_run ON outbox_digests(run_id)")
+
+    conn.commit()
+    conn.close()
+
+
+def enqueue_digests(run_id: str, digests: list[tuple], now: datetime = None) -> int:
+    """
+    digests: (RenderedDigest, материалы, chat_id получателей). Всё одной транзакцией —
+    либо прогон целиком в outbox, либо ничего.
+
+    Returns:
+        число поставленных доставок
+    """
+    now = now or datetime.now()
+    conn = get_connection()
+    count = 0
+    try:
+        for digest, items, chat_ids in digests:
+            digest_id = conn.execute(
+                "INSERT INTO outbox_digests (run_id, message, pages, items, created_at) VALUES (?, ?, ?, ?, ?)",
+                (run_id, digest.text, json.dumps(digest.pages, ensure_ascii=False),
+                 json.dumps(items, ensure_ascii=False), now)
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO outbox_deliveries (digest_id, chat_id, next_attempt_at) VALUES (?, ?, ?)",
+                [(digest_id, chat_id, now) for chat_id in chat_ids]
+            )
+            count += len(chat_ids)
+        conn.commit()
+    finally:
+        conn.close()
+    return count
+
+
+def expire_stale(max_age_hours: float, now: datetime = None) -> int:
+    """Недоставленное старше max_age_hours уже не актуально"""
+    now = now or datetime.now()
+    conn = get_connection()
+    try:
+        cursor = conn.execute(
+            f"""UPDATE outbox_deliveries SET status = ?, claimed_at = NULL
+                WHERE status IN ({','.join('?' * len(OPEN))})
+                  AND digest_id IN (SELECT id FROM outbox_digests WHERE created_at < ?)""",
+            (EXPIRED, *OPEN, now - timedelta(hours=max_age_hours))
+        )
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        conn.close()
+
+
+def claim_delivery(lease_seconds: float, now: datetime = None) -> Optional[dict]:
+    """
+    Взять одну доставку в работу: готовую к отправке или брошенную
+    (sending с истёкшей арендой — процесс упал посреди отправки).
+    """
+    now = now or datetime.now()
+    conn = get_connection()
+    try:
+        row = conn.execute(
+            """UPDATE outbox_deliveries
+               SET status = ?, claimed_at = ?, attempts = attempts + 1
+               WHERE rowid = (
+                   SELECT rowid FROM outbox_deliveries
+                   WHERE (status IN (?, ?) AND next_attempt_at <= ?)
+                      OR (status = ? AND claimed_at < ?)
+                   ORDER BY next_attempt_at
+                   LIMIT 1
+               )
+               RETURNING digest_id, chat_id, attempts, document_sent, pages_sent""",
+            (SENDING, now, QUEUED, RETRY, now, SENDING, now - timedelta(seconds=lease_seconds))
+        ).fetchone()
+        conn.commit()
+        if row is None:
+            return None
+        message = conn.execute("SELECT message, pages, items, run_id FROM outbox_digests WHERE id = ?",
+                               (row["digest_id"],)).fetchone()
+    finally:
+        conn.close()
+    return {
+        "digest_id": row["digest_id"],
+        "chat_id": row["chat_id"],
+        "attempts": row["attempts"],
+        "document_sent": bool(row["document_sent"]),
+        "pages_sent": row["pages_sent"],
+        "run_id": message["run_id"],
+        "message": message["message"],
+        "pages": json.loads(message["pages"]) or [message["message"]],
+        "items": json.loads(message["items"]),
+    }
+
+
+def item_keys(items: dict) -> list[tuple[str, str]]:
+    """(kind, item_key) материалов дайджеста — для истории чата"""
+    return ([(KIND_ARTICLE, a["url"]) for a in items["articles"]]
+            + [(KIND_FUNDRAISING, r["sent_key"]) for r in items["rounds"]])
+
+
+def ack_delivery(digest_id: int, chat_id: str, now: datetime = None):
+    """Доставлено (материалы уже в истории чата — item_keys)"""
+    now = now or datetime.now()
+    conn = get_connection()
+    try:
+        conn.execute(
+            """UPDATE outbox_deliveries SET status = ?, sent_at = ?, last_error = NULL
+               WHERE digest_id = ? AND chat_id = ?""",
+            (SENT, now, digest_id, chat_id)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def save_progress(digest_id: int, chat_id: str, document_sent: bool, pages_sent: int):
+    """Часть дайджеста ушла в чат: повтор начнёт со следующей"""
+    conn = get_connection()
+    try:
+        conn.execute(
+            "UPDATE outbox_deliveries SET document_sent = ?, pages_sent = ? WHERE digest_id = ? AND chat_id = ?",
+            (int(document_sent), pages_sent, digest_id, chat_id)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def fail_delivery(digest_id: int, chat_id: str, error: str, retry_at: Optional[datetime]):
+    """retry_at=None — больше не пытаться"""
+    conn = get_connection()
+    try:
+        if retry_at is None:
+            conn.execute(
+                """UPDATE outbox_deliveries SET status = ?, claimed_at = NULL, last_error = ?
+                   WHERE digest_id = ? AND chat_id = ?""",
+                (DEAD, error[:500], digest_id, chat_id)
+            )
+        else:
+            conn.execute(
+                """UPDATE outbox_deliveries
+                   SET status = ?, claimed_at = NULL, last_error = ?, next_attempt_at = ?
+                   WHERE digest_id = ? AND chat_id = ?""",
+                (RETRY, error[:500], retry_at, digest_id, chat_id)
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def run_chats(run_id: str) -> list[str]:
+    """Все чаты прогона"""
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            """SELECT DISTINCT d.chat_id FROM outbox_deliveries d
+               JOIN outbox_digests g ON g.id = d.digest_id
+               WHERE g.run_id = ?""",
+            (run_id,)
+        ).fetchall()
+    finally:
+        conn.close()
+    return [r["chat_id"] for r in rows]
+
+
+def delivered_items(run_id: str) -> list[dict]:
+    """Материалы дайджестов прогона, доставленных хотя бы в один чат"""
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            """SELECT items FROM outbox_digests g
+               WHERE g.run_id = ?
+                 AND EXISTS (SELECT 1 FROM outbox_deliveries d WHERE d.digest_id = g.id AND d.status = ?)""",
+            (run_id, SENT)
+        ).fetchall()
+    finally:
+        conn.close()
+    return [json.loads(r["items"]) for r in rows]
+
+
+def next_attempt_at(lease_seconds: float, run_id: str = None) -> Optional[datetime]:
+    """Когда станет готова следующая открытая доставка (всего outbox или одного прогона)"""
+    query = f"""SELECT d.status, MIN(CASE WHEN d.status = ? THEN d.claimed_at ELSE d.next_attempt_at END) AS due
+                FROM outbox_deliveries d JOIN outbox_digests g ON g.id = d.digest_id
+                WHERE d.status IN ({','.join('?' * len(OPEN))})"""
+    params = [SENDING, *OPEN]
+    if run_id is not None:
+        query += " AND g.run_id = ?"
+        params.append(run_id)
+    conn = get_connection()
+    try:
+        rows = conn.execute(query + " GROUP BY d.status = ?", (*params, SENDING)).fetchall()
+    finally:
+        conn.close()
+    due = []
+    for row in rows:
+        at = datetime.fromisoformat(row["due"])
+        # Взятая в работу доставка освободится, когда истечёт аренда
+        due.append(at + timedelta(seconds=lease_seconds) if row["status"] == SENDING else at)
+    return min(due, default=None)
+
+
+def outbox_counts(run_id: str = None) -> dict[str, int]:
+    """Доставки по статусам"""
+    query = """SELECT d.status, COUNT(*) AS n FROM outbox_deliveries d
+               JOIN outbox_digests g ON g.id = d.digest_id"""
+    params = ()
+    if run_id is not None:
+        query += " WHERE g.run_id = ?"
+        params = (run_id,)
+    conn = get_connection()
+    try:
+        rows = conn.execute(query + " GROUP BY d.status", params).fetchall()
+    finally:
+        conn.close()
+    return {r["status"]: r["n"] for r in rows}
+
+
+def cleanup_outbox(days: int = 30):
+    """Закрытые дайджесты старше N дней (открытые не трогаем)"""
+    conn = get_connection()
+    cutoff = datetime.now() - timedelta(days=days)
+    conn.execute(
+        f"""DELETE FROM outbox_deliveries
+            WHERE status NOT IN ({','.join('?' * len(OPEN))})
+              AND digest_id IN (SELECT id FROM outbox_digests WHERE created_at < ?)""",
+        (*OPEN, cutoff)
+    )
+    conn.execute(
+        """DELETE FROM outbox_digests WHERE created_at < ?
+           AND id NOT IN (SELECT digest_id FROM outbox_deliveries)""",
+        (cutoff,)
+    )
+    conn.commit()
+    conn.close()
+
+
+# Инициализация при импорте
+init_outbox_tables()
@@ -0,0 +1,182 @@
+"""
+Состояние страниц, которые собираются scraping'ом (collectors/scraper.py).
+
+scraped_pages — что видели на странице в прошлый раз: хеш ответа, хеш
+области с карточками и максимальный lastmod из sitemap. Совпало — страница
+не разбирается, статьи берутся отсюда же.
+
+scraped_urls — каждая статья со списка и когда она впервые там появилась:
+у сайтов без дат это и есть дата публикации для свежести и ранжирования.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from db.database import get_connection
+
+
+def init_page_tables():
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS scraped_pages (
+            site TEXT PRIMARY KEY,
+            body_hash TEXT,
+            region_hash TEXT,
+            sitemap_lastmod TIMESTAMP,
+            checked_at TIMESTAMP,
+            listed_at TIMESTAMP,
+            parsed INTEGER NOT NULL DEFAULT 0,
+            skipped INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS scraped_urls (
+            site TEXT NOT NULL,
+            url TEXT NOT NULL,
+            title TEXT NOT NULL,
+            published_at TIMESTAMP,
+            first_seen_at TIMESTAMP NOT NULL,
+            last_seen_at TIMESTAMP NOT NULL,
+            position INTEGER NOT NULL,
+            PRIMARY KEY (site, url)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_scraped_urls_seen ON scraped_urls(site, last_seen_at)")
+
+    conn.commit()
+    conn.close()
+
+
+@dataclass
+class PageState:
+    site: str
+    body_hash: Optional[str] = None
+    region_hash: Optional[str] = None
+    sitemap_lastmod: Optional[datetime] = None
+    checked_at: Optional[datetime] = None
+    listed_at: Optional[datetime] = None    # когда список карточек последний раз разбирался
+
+
+@dataclass
+class ListedUrl:
+    url: str
+    title: str
+    published_at: Optional[datetime]
+    first_seen_at: datetime
+
+
+def _parse_ts(value) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def load_page_state(site: str) -> PageState:
+    conn = get_connection()
+    try:
+        row = conn.execute("SELECT * FROM scraped_pages WHERE site = ?", (site,)).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return PageState(site)
+    return PageState(
+        site=site,
+        body_hash=row["body_hash"],
+        region_hash=row["region_hash"],
+        sitemap_lastmod=_parse_ts(row["sitemap_lastmod"]),
+        checked_at=_parse_ts(row["checked_at"]),
+        listed_at=_parse_ts(row["listed_at"]),
+    )
+
+
+def save_page_state(state: PageState, parsed: bool):
+    """parsed — страница разбиралась (иначе счётчик пропусков +1)"""
+    conn = get_connection()
+    try:
+        conn.execute(
+            """INSERT INTO scraped_pages
+               (site, body_hash, region_hash, sitemap_lastmod, checked_at, listed_at, parsed, skipped)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT(site) DO UPDATE SET
+                   body_hash = excluded.body_hash,
+                   region_hash = excluded.region_hash,
+                   sitemap_lastmod = excluded.sitemap_lastmod,
+                   checked_at = excluded.checked_at,
+                   listed_at = excluded.listed_at,
+                   parsed = parsed + excluded.parsed,
+                   skipped = skipped + excluded.skipped""",
+            (state.site, state.body_hash, state.region_hash, state.sitemap_lastmod,
+             state.checked_at, state.listed_at, int(parsed), int(not parsed))
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def record_listing(site: str, items: Iterable[tuple[str, str, Optional[datetime]]],
+                   now: datetime) -> list[ListedUrl]:
+    """
+    Карточки (url, title, published_at) текущего списка по порядку;
+    first_seen_at уже известных URL не меняется, published_at — самая
+    ранняя из виденных дат.
+
+    Returns:
+        список, как его вернёт listed_urls(site, now)
+    """
+    rows = [(site, url, title, published_at, now, now, position)
+            for position, (url, title, published_at) in enumerate(items)]
+    conn = get_connection()
+    try:
+        conn.executemany(
+            """INSERT INTO scraped_urls (site, url, title, published_at, first_seen_at, last_seen_at, position)
+               VALUES (?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT(site, url) DO UPDATE SET
+                   title = excluded.title,
+                   published_at = COALESCE(MIN(published_at, excluded.published_at),
+                                           published_at, excluded.published_at),
+                   last_seen_at = excluded.last_seen_at,
+                   position = excluded.position""",
+            rows
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return listed_urls(site, now)
+
+
+def listed_urls(site: str, listed_at: datetime) -> list[ListedUrl]:
+    """Карточки, бывшие на странице при последнем разборе, в порядке списка"""
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            """SELECT url, title, published_at, first_seen_at FROM scraped_urls
+               WHERE site = ? AND last_seen_at = ? ORDER BY position""",
+            (site, listed_at)
+        ).fetchall()
+    finally:
+        conn.close()
+    return [ListedUrl(row["url"], row["title"], _parse_ts(row["published_at"]), _parse_ts(row["first_seen_at"]))
+            for row in rows]
+
+
+def page_report() -> list[tuple]:
+    """(site, разборов, пропусков, listed_at) — для --stats"""
+    conn = get_connection()
+    try:
+        rows = conn.execute("SELECT site, parsed, skipped, listed_at FROM scraped_pages ORDER BY site").fetchall()
+    finally:
+        conn.close()
+    return [(row["site"], row["parsed"], row["skipped"], _parse_ts(row["listed_at"])) for row in rows]
+
+
+def cleanup_scraped_urls(days: int = 30):
+    """URL, пропавшие со страниц больше N дней назад"""
+    conn = get_connection()
+    conn.execute("DELETE FROM scraped_urls WHERE last_seen_at < ?", (datetime.utcnow() - timedelta(days=days),))
+    conn.commit()
+    conn.close()
+
+
+# Инициализация при импорте
+init_page_tables()
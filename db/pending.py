@@ -0,0 +1,235 @@
+"""
+Буфер собранных, но ещё не отправленных материалов.
+
+Планировщик (core.scheduler) складывает сюда новые записи фидов
+по мере опроса, дайджест забирает всё актуальное одним запросом.
+Запись живёт до expires_at (дата публикации + окно источника)
+или пока не уйдёт в дайджест. Кэш команд бота (bot/commands.py)
+дочитывает отсюда новое по id — AUTOINCREMENT, номера после удалений
+не переиспользуются (rowid переиспользовался бы, и кэш пропускал записи).
+"""
+
+import json
+from dataclasses import asdict
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from collectors.articles import Article
+from collectors.fundraising import FundraisingRound
+from db.database import get_connection
+
+KIND_ARTICLE = "article"
+KIND_FUNDRAISING = "fundraising"
+
+
+def init_pending_tables():
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    # Миграция: старая таблица без id (кэш читал по rowid) пересобирается
+    columns = {row["name"] for row in cursor.execute("PRAGMA table_info(pending_items)")}
+    if columns and "id" not in columns:
+        cursor.execute("ALTER TABLE pending_items RENAME TO pending_items_old")
+        cursor.execute("DROP INDEX IF EXISTS idx_pending_expires")
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS pending_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            item_key TEXT NOT NULL,
+            source TEXT NOT NULL,
+            category TEXT,
+            payload TEXT NOT NULL,
+            published_at TIMESTAMP,
+            collected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMP NOT NULL,
+            UNIQUE (kind, item_key, source)
+        )
+    """)
+    if columns and "id" not in columns:
+        cursor.execute("""
+            INSERT INTO pending_items
+                (kind, item_key, source, category, payload, published_at, collected_at, expires_at)
+            SELECT kind, item_key, source, category, payload, published_at, collected_at, expires_at
+            FROM pending_items_old ORDER BY rowid
+        """)
+        cursor.execute("DROP TABLE pending_items_old")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_pending_expires ON pending_items(expires_at)")
+
+    conn.commit()
+    conn.close()
+
+
+def article_to_json(a: Article) -> str:
+    data = asdict(a)
+    data["published_at"] = a.published_at.isoformat()
+    return json.dumps(data, ensure_ascii=False)
+
+
+def article_from_json(payload: str) -> Article:
+    data = json.loads(payload)
+    data["published_at"] = datetime.fromisoformat(data["published_at"])
+    return Article(**data)
+
+
+def round_to_json(r: FundraisingRound) -> str:
+    data = asdict(r)
+    data["date"] = r.date.isoformat() if r.date else None
+    return json.dumps(data, ensure_ascii=False)
+
+
+def round_from_json(payload: str) -> FundraisingRound:
+    data = json.loads(payload)
+    data["date"] = datetime.fromisoformat(data["date"]) if data["date"] else None
+    return FundraisingRound(**data)
+
+
+def fundraising_key(r: FundraisingRound) -> str:
+    return r.project.lower().strip()
+
+
+def _add_pending(kind: str, rows: list[tuple]) -> set[tuple[str, str]]:
+    """
+    Upsert строк (item_key, source, category, payload, published_at, expires_at).
+
+    Returns:
+        {(item_key, source)} которых раньше не было в буфере
+    """
+    if not rows:
+        return set()
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        existing = set()
+        for source in {row[1] for row in rows}:
+            keys = [row[0] for row in rows if row[1] == source]
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                cursor.execute(
+                    f"""SELECT item_key FROM pending_items
+                        WHERE kind = ? AND source = ? AND item_key IN ({','.join('?' * len(chunk))})""",
+                    (kind, source, *chunk)
+                )
+                existing.update((r["item_key"], source) for r in cursor.fetchall())
+
+        cursor.executemany(
+            """INSERT INTO pending_items
+               (kind, item_key, source, category, payload, published_at, expires_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT(kind, item_key, source) DO UPDATE SET
+                   payload = excluded.payload,
+                   expires_at = excluded.expires_at""",
+            [(kind, *row) for row in rows]
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    return {(row[0], row[1]) for row in rows} - existing
+
+
+def add_pending_articles(category: str, articles: list[Article], hours: int) -> list[Article]:
+    """Положить статьи фида в буфер. Возвращает новые (ранее не виденные)"""
+    rows = [
+        (a.url, a.source, category, article_to_json(a), a.published_at,
+         a.published_at + timedelta(hours=hours))
+        for a in articles
+    ]
+    new_keys = _add_pending(KIND_ARTICLE, rows)
+    return [a for a in articles if (a.url, a.source) in new_keys]
+
+
+def add_pending_fundraising(rounds: list[FundraisingRound], hours: int) -> list[FundraisingRound]:
+    """Положить раунды в буфер. Возвращает новые (ранее не виденные)"""
+    rows = []
+    for r in rounds:
+        date = r.date or datetime.now()
+        rows.append((fundraising_key(r), r.source, "fundraising", round_to_json(r), date,
+                     date + timedelta(hours=hours)))
+    new_keys = _add_pending(KIND_FUNDRAISING, rows)
+    return [r for r in rounds if (fundraising_key(r), r.source) in new_keys]
+
+
+def drain_pending(now: datetime = None) -> tuple[list[tuple[str, list[Article]]], list[FundraisingRound]]:
+    """
+    Забрать всё актуальное из буфера (просроченное удаляется).
+
+    Returns:
+        (батчи статей [(категория, статьи источника)] для merge_articles, раунды)
+    """
+    now = now or datetime.now()
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("DELETE FROM pending_items WHERE expires_at <= ?", (now,))
+    cursor.execute(
+        """SELECT kind, source, category, payload FROM pending_items
+           ORDER BY kind, category, source, id"""
+    )
+    rows = cursor.fetchall()
+    conn.commit()
+    conn.close()
+
+    batches = {}
+    rounds = []
+    for row in rows:
+        if row["kind"] == KIND_ARTICLE:
+            batches.setdefault((row["category"], row["source"]), []).append(article_from_json(row["payload"]))
+        else:
+            rounds.append(round_from_json(row["payload"]))
+
+    return [(category, articles) for (category, _), articles in batches.items()], rounds
+
+
+def pending_after(last_id: int = 0, now: datetime = None) -> tuple[int, list[Article], list[FundraisingRound]]:
+    """
+    Добавленное в буфер после записи last_id (просроченное не трогается и
+    не возвращается) — для кэша команд бота, без удаления.
+
+    Returns:
+        (последний id, статьи, раунды)
+    """
+    now = now or datetime.now()
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            """SELECT id, kind, payload FROM pending_items
+               WHERE id > ? AND expires_at > ? ORDER BY id""",
+            (last_id, now)
+        ).fetchall()
+    finally:
+        conn.close()
+
+    articles, rounds = [], []
+    for row in rows:
+        if row["kind"] == KIND_ARTICLE:
+            articles.append(article_from_json(row["payload"]))
+        else:
+            rounds.append(round_from_json(row["payload"]))
+    return (rows[-1]["id"] if rows else last_id), articles, rounds
+
+
+def remove_pending(kind: str, keys: Iterable[str]):
+    """Убрать отправленные материалы из буфера"""
+    keys = list(keys)
+    if not keys:
+        return
+    conn = get_connection()
+    conn.executemany(
+        "DELETE FROM pending_items WHERE kind = ? AND item_key = ?",
+        [(kind, key) for key in keys]
+    )
+    conn.commit()
+    conn.close()
+
+
+def pending_count() -> int:
+    conn = get_connection()
+    count = conn.execute("SELECT COUNT(*) FROM pending_items").fetchone()[0]
+    conn.close()
+    return count
+
+
+# Инициализация при импорте
+init_pending_tables()
@@ -0,0 +1,173 @@
+"""
+Словарь TF-IDF для релевантности тем (filters/relevance.py).
+
+relevance_df — document frequency по терминам, relevance_meta — число
+документов, relevance_docs — какие материалы уже учтены (повторный
+опрос фида не должен считать статью дважды). Дообучение инкрементальное:
+в словарь добавляются только новые документы, в БД пишется приращение.
+
+При первом запуске словарь засевается архивом — заголовками уже
+отправленных статей и содержимым буфера.
+"""
+
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from db.database import get_connection
+from db.pending import KIND_ARTICLE, article_from_json
+from filters.relevance import TopicScorer, Vocabulary
+
+CHUNK = 500
+
+_vocabulary: Vocabulary = None
+_scorers: dict[tuple, TopicScorer] = {}
+_lock = threading.Lock()
+
+
+def init_relevance_tables():
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS relevance_df (
+            term TEXT PRIMARY KEY,
+            df INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS relevance_meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS relevance_docs (
+            item_key TEXT PRIMARY KEY,
+            fitted_at TIMESTAMP NOT NULL
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_relevance_docs_at ON relevance_docs(fitted_at)")
+
+    conn.commit()
+    conn.close()
+
+
+def load_vocabulary() -> Vocabulary:
+    conn = get_connection()
+    try:
+        df = {row["term"]: row["df"] for row in conn.execute("SELECT term, df FROM relevance_df")}
+        row = conn.execute("SELECT value FROM relevance_meta WHERE key = 'n_docs'").fetchone()
+    finally:
+        conn.close()
+    return Vocabulary(df, row["value"] if row else 0)
+
+
+def save_fit(delta: Counter, keys: list[str]):
+    """Приращение df и учтённые документы — одной транзакцией"""
+    if not keys:
+        return
+    now = datetime.now()
+    conn = get_connection()
+    try:
+        conn.executemany(
+            """INSERT INTO relevance_df (term, df) VALUES (?, ?)
+               ON CONFLICT(term) DO UPDATE SET df = df + excluded.df""",
+            delta.items()
+        )
+        conn.execute(
+            """INSERT INTO relevance_meta (key, value) VALUES ('n_docs', ?)
+               ON CONFLICT(key) DO UPDATE SET value = value + excluded.value""",
+            (len(keys),)
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO relevance_docs (item_key, fitted_at) VALUES (?, ?)",
+            [(key, now) for key in keys]
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def fitted_keys(keys: list[str]) -> set[str]:
+    """Какие из keys уже учтены в словаре"""
+    found = set()
+    conn = get_connection()
+    try:
+        keys = list(dict.fromkeys(keys))
+        for i in range(0, len(keys), CHUNK):
+            chunk = keys[i:i + CHUNK]
+            rows = conn.execute(
+                f"SELECT item_key FROM relevance_docs WHERE item_key IN ({','.join('?' * len(chunk))})",
+                chunk
+            )
+            found.update(row["item_key"] for row in rows)
+    finally:
+        conn.close()
+    return found
+
+
+def archive_documents() -> list[tuple[str, str]]:
+    """(ключ, текст) архива: отправленные статьи (заголовки) и буфер (заголовок + анонс)"""
+    conn = get_connection()
+    try:
+        sent = conn.execute("SELECT url, title FROM sent_articles").fetchall()
+        pending = conn.execute("SELECT payload FROM pending_items WHERE kind = ?", (KIND_ARTICLE,)).fetchall()
+    finally:
+        conn.close()
+    documents = {row["url"]: row["title"] for row in sent}
+    for row in pending:
+        a = article_from_json(row["payload"])
+        documents[a.url] = f"{a.title} {a.summary}"
+    return list(documents.items())
+
+
+def get_vocabulary() -> Vocabulary:
+    """Словарь процесса: из БД один раз, пустой — засевается архивом"""
+    global _vocabulary
+    with _lock:
+        if _vocabulary is None:
+            vocabulary = load_vocabulary()
+            if not vocabulary.n_docs:
+                documents = archive_documents()
+                if documents:
+                    scorer = TopicScorer((), vocabulary)
+                    save_fit(scorer.fit(text for _, text in documents), [key for key, _ in documents])
+                    print(f"Relevance vocabulary seeded from {len(documents)} archived items")
+            _vocabulary = vocabulary
+        return _vocabulary
+
+
+def scorer_for(topics: Iterable[str]) -> TopicScorer:
+    """Скорер тем поверх общего словаря (кэш по набору тем)"""
+    topics = tuple(dict.fromkeys(topics))
+    vocabulary = get_vocabulary()
+    scorer = _scorers.get(topics)
+    if scorer is None or scorer.vocabulary is not vocabulary:
+        scorer = _scorers[topics] = TopicScorer(topics, vocabulary)
+    return scorer
+
+
+def fit_new(scorer: TopicScorer, keys: list[str], documents: list[set[str]]):
+    """Дообучить словарь на ещё не учтённых документах (термины уже выделены)"""
+    with _lock:
+        known = fitted_keys(keys)
+        new = {}
+        for key, terms in zip(keys, documents):
+            if key not in known and key not in new:
+                new[key] = terms
+        if new:
+            save_fit(scorer.vocabulary.partial_fit(new.values()), list(new))
+
+
+def cleanup_relevance_docs(days: int = 30):
+    """Отметки «учтён» старше N дней: такие материалы уже не вернутся в фиды"""
+    conn = get_connection()
+    conn.execute("DELETE FROM relevance_docs WHERE fitted_at < ?", (datetime.now() - timedelta(days=days),))
+    conn.commit()
+    conn.close()
+
+
+# Инициализация при импорте
+init_relevance_tables()
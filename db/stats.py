@@ -0,0 +1,188 @@
+"""
+Материализованная статистика истории.
+
+Агрегаты ведут триггеры на партициях sent_articles / sent_fundraising
+(db.database.register_partition_trigger — ставятся и на каждый новый
+месяц) в той же транзакции, что и вставка, так что они не расходятся с
+историей и никакой отчёт не сканирует многомиллионные таблицы:
+
+    stats_daily      — отправлено по дням, источникам и видам
+    stats_rounds     — раунды и суммы по типу раунда
+    stats_investors  — раунды и суммы по лид-инвесторам
+
+Сколько строк в истории сейчас, знает каталог партиций (get_stats).
+Агрегаты очистку истории переживают. stats_dedupe пишет стадия
+sent_state дайджеста: сколько кандидатов проверено и сколько из них
+чат уже получал.
+
+При первом запуске агрегаты один раз досчитываются по существующей
+истории.
+"""
+
+from datetime import date, datetime, timedelta
+
+from db.database import get_connection, register_partition_trigger
+from db.store import get_store
+
+# (база, имя, тело AFTER INSERT-триггера партиции)
+TRIGGERS = [
+    ("sent_articles", "stats_article_insert", """
+        INSERT INTO stats_daily (day, kind, source, sent)
+        VALUES (date(NEW.sent_at), 'article', COALESCE(NEW.source, ''), 1)
+        ON CONFLICT(day, kind, source) DO UPDATE SET sent = sent + 1;
+    """),
+    ("sent_fundraising", "stats_fundraising_insert", """
+        INSERT INTO stats_daily (day, kind, source, sent)
+        VALUES (date(NEW.sent_at), 'fundraising', COALESCE(NEW.source, ''), 1)
+        ON CONFLICT(day, kind, source) DO UPDATE SET sent = sent + 1;
+        INSERT INTO stats_rounds (round_type, rounds, amount)
+        VALUES (COALESCE(NEW.round_type, 'unknown'), 1, COALESCE(NEW.amount, 0))
+        ON CONFLICT(round_type) DO UPDATE SET rounds = rounds + 1, amount = amount + excluded.amount;
+        INSERT INTO stats_investors (investor, rounds, amount)
+        SELECT value, 1, COALESCE(NEW.amount, 0) FROM json_each(COALESCE(NEW.lead_investors, '[]')) WHERE true
+        ON CONFLICT(investor) DO UPDATE SET rounds = rounds + 1, amount = amount + excluded.amount;
+    """),
+]
+
+
+def init_stats_tables():
+    conn = get_connection()
+    cursor = conn.cursor()
+    # Таблицы, триггеры и досчёт — одной транзакцией: между досчётом и
+    # триггерами никакая вставка не проскочит
+    cursor.execute("BEGIN IMMEDIATE")
+
+    # Итоги раньше вели триггеры удаления; теперь — каталог партиций
+    cursor.execute("DROP TABLE IF EXISTS stats_totals")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stats_daily (
+            day TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            source TEXT NOT NULL,
+            sent INTEGER NOT NULL,
+            PRIMARY KEY (day, kind, source)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stats_rounds (
+            round_type TEXT PRIMARY KEY,
+            rounds INTEGER NOT NULL,
+            amount REAL NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stats_investors (
+            investor TEXT PRIMARY KEY,
+            rounds INTEGER NOT NULL,
+            amount REAL NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stats_dedupe (
+            day TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            checked INTEGER NOT NULL,
+            duplicates INTEGER NOT NULL,
+            PRIMARY KEY (day, kind)
+        ) WITHOUT ROWID
+    """)
+
+    # Пустые дневные агрегаты при непустой истории — досчёта ещё не было
+    if cursor.execute("SELECT 1 FROM stats_daily LIMIT 1").fetchone() is None:
+        _backfill(cursor)
+    for base, name, body in TRIGGERS:
+        register_partition_trigger(cursor, base, name, body)
+
+    conn.commit()
+    conn.close()
+
+
+def _backfill(cursor):
+    """Агрегаты по уже накопленной истории (один раз)"""
+    cursor.execute("""INSERT INTO stats_daily (day, kind, source, sent)
+                      SELECT date(sent_at), 'article', COALESCE(source, ''), COUNT(*)
+                      FROM sent_articles GROUP BY 1, 3""")
+    cursor.execute("""INSERT INTO stats_daily (day, kind, source, sent)
+                      SELECT date(sent_at), 'fundraising', COALESCE(source, ''), COUNT(*)
+                      FROM sent_fundraising GROUP BY 1, 3""")
+    cursor.execute("""INSERT INTO stats_rounds (round_type, rounds, amount)
+                      SELECT COALESCE(round_type, 'unknown'), COUNT(*), COALESCE(SUM(amount), 0)
+                      FROM sent_fundraising GROUP BY 1""")
+    cursor.execute("""INSERT INTO stats_investors (investor, rounds, amount)
+                      SELECT j.value, COUNT(*), COALESCE(SUM(f.amount), 0)
+                      FROM sent_fundraising f, json_each(COALESCE(f.lead_investors, '[]')) j
+                      GROUP BY 1""")
+
+
+def get_stats() -> dict:
+    """Сколько материалов в истории — у SQLite из каталога партиций, без COUNT(*)"""
+    counts = get_store().history_counts()
+    return {
+        "articles": counts.get("sent_articles", 0),
+        "fundraising": counts.get("sent_fundraising", 0),
+    }
+
+
+def record_dedupe(kind: str, checked: int, duplicates: int, day: date = None):
+    """Проверено кандидатов × чатов и сколько из них уже было отправлено"""
+    if not checked:
+        return
+    conn = get_connection()
+    try:
+        conn.execute(
+            """INSERT INTO stats_dedupe (day, kind, checked, duplicates) VALUES (?, ?, ?, ?)
+               ON CONFLICT(day, kind) DO UPDATE SET
+                   checked = checked + excluded.checked,
+                   duplicates = duplicates + excluded.duplicates""",
+            ((day or datetime.utcnow().date()).isoformat(), kind, checked, duplicates)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def stats_report(days: int = 7, top: int = 10) -> dict:
+    """
+    Отчёт для --stats: отправки по источникам и дням за days дней,
+    доля дублей, раунды по типам и топ лид-инвесторов — всё из агрегатов.
+    """
+    since = (datetime.utcnow().date() - timedelta(days=days - 1)).isoformat()
+    conn = get_connection()
+    try:
+        daily = conn.execute(
+            "SELECT day, kind, source, sent FROM stats_daily WHERE day >= ? ORDER BY day", (since,)
+        ).fetchall()
+        dedupe = conn.execute(
+            """SELECT kind, SUM(checked) AS checked, SUM(duplicates) AS duplicates
+               FROM stats_dedupe WHERE day >= ? GROUP BY kind""",
+            (since,)
+        ).fetchall()
+        rounds = conn.execute(
+            "SELECT round_type, rounds, amount FROM stats_rounds ORDER BY rounds DESC, amount DESC"
+        ).fetchall()
+        investors = conn.execute(
+            "SELECT investor, rounds, amount FROM stats_investors ORDER BY rounds DESC, amount DESC LIMIT ?",
+            (top,)
+        ).fetchall()
+    finally:
+        conn.close()
+
+    days_list = [(datetime.utcnow().date() - timedelta(days=i)).isoformat() for i in range(days - 1, -1, -1)]
+    sources: dict[tuple[str, str], dict[str, int]] = {}
+    for row in daily:
+        sources.setdefault((row["kind"], row["source"]), {})[row["day"]] = row["sent"]
+
+    return {
+        "days": days_list,
+        "sources": sorted(
+            ((kind, source, [per_day.get(d, 0) for d in days_list]) for (kind, source), per_day in sources.items()),
+            key=lambda s: (-sum(s[2]), s[0], s[1])
+        ),
+        "dedupe": {row["kind"]: (row["checked"], row["duplicates"]) for row in dedupe},
+        "rounds": [(row["round_type"], row["rounds"], row["amount"]) for row in rounds],
+        "investors": [(row["investor"], row["rounds"], row["amount"]) for row in investors],
+    }
+
+
+# Инициализация при импорте
+init_stats_tables()
@@ -0,0 +1,387 @@
+"""
+Хранилище состояния дедупликации: общая история отправленного
+(sent_articles / sent_fundraising), что ушло в какой чат (chat_sent),
+курсоры фидов и счётчики истории.
+
+Бэкенд — settings.json → store.backend:
+
+    sqlite  — data/market_pulse.db, как раньше (db/database.py, db/feeds.py)
+    memory  — словари в процессе: тесты, бенчмарки, прогон без диска
+    kv      — HTTP-сервер ключ-значение, общий для нескольких реплик;
+              локальная заглушка — python scripts/local_kv_server.py
+
+Всё остальное (outbox, буфер, аренды, агрегаты --stats) остаётся в
+SQLite каждой реплики. Методы синхронные, как функции db.*: из event loop — чтение
+через async_db.read, запись через async_db.store_write (kv не ходит в
+сеть внутри транзакции писателя SQLite).
+"""
+
+import http.client
+import json
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Optional
+from urllib.parse import urlsplit
+
+import db.audience as audience
+import db.database as database
+import db.feeds as feeds
+from db.audience import KIND_ARTICLE
+from db.feeds import FeedCursor
+
+ARTICLES = "sent_articles"
+FUNDRAISING = "sent_fundraising"
+
+
+def _round_key(project: str, round_type: str) -> tuple[str, str]:
+    # Как в sent_fundraising: project в нижнем регистре
+    return project.lower(), round_type
+
+
+class StateStore(ABC):
+    """Интерфейс хранилища; реализации ниже. Без любого из методов бэкенд не создать"""
+
+    name = ""
+    in_db = False    # история в той же SQLite: писать очередью писателя AsyncDB
+
+    @abstractmethod
+    def sent_article_urls(self, urls: list[str]) -> set[str]:
+        """Какие из urls уже отправлены"""
+
+    @abstractmethod
+    def sent_fundraising_keys(self, keys: list[tuple[str, str]]) -> set[tuple[str, str]]:
+        """Какие из (project, round_type) уже отправлены; project в ответе — lower()"""
+
+    @abstractmethod
+    def mark_articles_sent(self, rows: list[tuple[str, str, str]]):
+        """Пачка (url, title, source); уже известные url не трогаются"""
+
+    @abstractmethod
+    def mark_rounds_sent(self, rows: list[tuple]):
+        """Пачка (project, round_type, amount, source_url, source, lead_investors)"""
+
+    @abstractmethod
+    def seed_chats(self, chat_ids: list[str]):
+        """Отметка для чата без истории: общая история до неё считается отправленной ему"""
+
+    @abstractmethod
+    def chat_sent_keys(self, chat_ids: list[str], kind: str, keys: list[str]) -> dict[str, set[str]]:
+        """Для каждого чата — какие из keys (url / fundraising_sent_key) он уже получил"""
+
+    @abstractmethod
+    def mark_chat_sent(self, chat_id: str, rows: list[tuple[str, str]]):
+        """Пачка (kind, item_key), доставленных в чат"""
+
+    @abstractmethod
+    def load_cursor(self, source: str) -> FeedCursor:
+        ...
+
+    @abstractmethod
+    def save_cursor(self, cursor: FeedCursor):
+        ...
+
+    @abstractmethod
+    def history_counts(self) -> dict[str, int]:
+        """{sent_articles: n, sent_fundraising: n}"""
+
+    @abstractmethod
+    def cleanup(self, days: int = 30):
+        """Забыть историю старше N дней"""
+
+
+class SqliteStore(StateStore):
+    """Локальная БД: функции db.database / db.audience / db.feeds как есть"""
+
+    name = "sqlite"
+    in_db = True
+
+    def sent_article_urls(self, urls):
+        return database.sent_article_urls(urls)
+
+    def sent_fundraising_keys(self, keys):
+        return database.sent_fundraising_keys(keys)
+
+    def mark_articles_sent(self, rows):
+        database.mark_articles_sent(rows)
+
+    def mark_rounds_sent(self, rows):
+        database.mark_rounds_sent(rows)
+
+    def seed_chats(self, chat_ids):
+        audience.seed_chat_history(chat_ids)
+
+    def chat_sent_keys(self, chat_ids, kind, keys):
+        return audience.sent_keys(chat_ids, kind, keys)
+
+    def mark_chat_sent(self, chat_id, rows):
+        audience.mark_chat_sent(chat_id, rows)
+
+    def load_cursor(self, source):
+        return feeds.load_cursor(source)
+
+    def save_cursor(self, cursor):
+        feeds.save_cursor(cursor)
+
+    def history_counts(self):
+        return database.history_counts()
+
+    def cleanup(self, days=30):
+        # chat_sent — тоже партиции истории, уходит тем же DROP
+        database.cleanup_old_records(days)
+
+
+class MemoryStore(StateStore):
+    """Словари в процессе; живут, пока жив процесс"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._articles: dict[str, datetime] = {}
+        self._rounds: dict[tuple[str, str], datetime] = {}
+        self._chats: dict[str, dict[tuple[str, str], datetime]] = {}    # chat → (kind, key) → когда
+        self._seeded: dict[str, datetime] = {}     # chat → общая история до этого момента — его
+        self._cursors: dict[str, FeedCursor] = {}
+
+    def sent_article_urls(self, urls):
+        with self._lock:
+            return {url for url in urls if url in self._articles}
+
+    def sent_fundraising_keys(self, keys):
+        wanted = {_round_key(project, round_type) for project, round_type in keys}
+        with self._lock:
+            return {key for key in wanted if key in self._rounds}
+
+    def mark_articles_sent(self, rows):
+        now = datetime.utcnow()
+        with self._lock:
+            for url, _, _ in rows:
+                self._articles.setdefault(url, now)
+
+    def mark_rounds_sent(self, rows):
+        now = datetime.utcnow()
+        with self._lock:
+            for project, round_type, *_ in rows:
+                self._rounds.setdefault(_round_key(project, round_type), now)
+
+    def seed_chats(self, chat_ids):
+        now = datetime.utcnow()
+        with self._lock:
+            for chat_id in chat_ids:
+                self._seeded.setdefault(chat_id, now)
+
+    def chat_sent_keys(self, chat_ids, kind, keys):
+        with self._lock:
+            if kind == KIND_ARTICLE:
+                shared = {key: self._articles.get(key) for key in keys}
+            else:
+                shared = {}
+                for key in keys:
+                    project, _, round_type = key.rpartition("|")
+                    # 'unknown' в ключе — это и round_type = None
+                    shared[key] = self._rounds.get((project, round_type)) or (
+                        round_type == "unknown" and self._rounds.get((project, None)) or None)
+            result = {}
+            for chat_id in chat_ids:
+                own = self._chats.get(chat_id, {})
+                seeded_at = self._seeded.get(chat_id)
+                result[chat_id] = {key for key in keys if (kind, key) in own or (
+                    seeded_at and shared[key] and shared[key] <= seeded_at)}
+            return result
+
+    def mark_chat_sent(self, chat_id, rows):
+        now = datetime.utcnow()
+        with self._lock:
+            history = self._chats.setdefault(chat_id, {})
+            for row in rows:
+                history.setdefault(tuple(row), now)
+
+    def load_cursor(self, source):
+        with self._lock:
+            return self._cursors.get(source) or FeedCursor(source)
+
+    def save_cursor(self, cursor):
+        with self._lock:
+            self._cursors[cursor.source] = cursor
+
+    def history_counts(self):
+        with self._lock:
+            return {ARTICLES: len(self._articles), FUNDRAISING: len(self._rounds)}
+
+    def cleanup(self, days=30):
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        with self._lock:
+            self._articles = {k: at for k, at in self._articles.items() if at >= cutoff}
+            self._rounds = {k: at for k, at in self._rounds.items() if at >= cutoff}
+            self._chats = {chat_id: {k: at for k, at in history.items() if at >= cutoff}
+                           for chat_id, history in self._chats.items()}
+
+
+class KVError(Exception):
+    """Сервер ключ-значение недоступен или ответил ошибкой"""
+
+
+class KVStore(StateStore):
+    """
+    Клиент HTTP-сервера ключ-значение (протокол — scripts/local_kv_server.py).
+
+    Ключи: a:<url>, f:<project>|<round_type>, c:<source>, n:<таблица>;
+    по чатам — s:<chat>|<kind>|<key> и k:<chat> (когда чат получил общую
+    историю: отмеченное в a:/f: не позже этого момента чат уже «видел»,
+    как и в остальных бэкендах — история не копируется).
+    Запись истории — «добавить, если нет» с TTL retention_days, так что
+    очистку делает сервер; счётчики n:* считают всё когда-либо отмеченное.
+    Соединение keep-alive, своё у каждого потока.
+    """
+
+    name = "kv"
+
+    def __init__(self, url: str, timeout: float = 5, retention_days: int = 30):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.https = parts.scheme == "https"
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.ttl = retention_days * 86400
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            conn = self._local.conn = cls(self.host, self.port, timeout=self.timeout)
+        return conn
+
+    def _call(self, op: str, payload: dict) -> dict:
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        headers = {"Content-Type": "application/json"}
+        # Второй заход — если сервер закрыл простаивавшее keep-alive соединение
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request("POST", f"{self.prefix}/{op}", body, headers)
+                resp = conn.getresponse()
+                data = resp.read()
+            except (http.client.HTTPException, OSError) as e:
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise KVError(f"kv {op}: {type(e).__name__}: {e}") from e
+                continue
+            if resp.status != 200:
+                raise KVError(f"kv {op}: HTTP {resp.status} {data[:200]!r}")
+            return json.loads(data)
+
+    def _get(self, keys: list[str]) -> list:
+        if not keys:
+            return []
+        return self._call("get", {"keys": keys})["values"]
+
+    def _add(self, items: dict[str, str], counter: str = None, ttl: Optional[int] = None):
+        if not items:
+            return
+        added = self._call("add", {"items": items, "ttl": self.ttl if ttl is None else ttl})["added"]
+        if added and counter:
+            self._call("incr", {"counters": {f"n:{counter}": len(added)}})
+
+    def sent_article_urls(self, urls):
+        urls = list(dict.fromkeys(urls))
+        values = self._get([f"a:{url}" for url in urls])
+        return {url for url, value in zip(urls, values) if value is not None}
+
+    def sent_fundraising_keys(self, keys):
+        wanted = list({_round_key(project, round_type) for project, round_type in keys})
+        values = self._get([f"f:{project}|{round_type}" for project, round_type in wanted])
+        return {key for key, value in zip(wanted, values) if value is not None}
+
+    def mark_articles_sent(self, rows):
+        now = datetime.utcnow().isoformat()
+        self._add({f"a:{url}": now for url, _, _ in rows}, ARTICLES)
+
+    def mark_rounds_sent(self, rows):
+        now = datetime.utcnow().isoformat()
+        keys = (_round_key(project, round_type) for project, round_type, *_ in rows)
+        self._add({f"f:{project}|{round_type}": now for project, round_type in keys}, FUNDRAISING)
+
+    def seed_chats(self, chat_ids):
+        # Без TTL: отметка нужна, пока жив чат; add не сдвигает уже стоящую
+        self._add({f"k:{chat_id}": datetime.utcnow().isoformat() for chat_id in chat_ids}, ttl=0)
+
+    def chat_sent_keys(self, chat_ids, kind, keys):
+        keys = list(dict.fromkeys(keys))
+        result = {chat_id: set() for chat_id in chat_ids}
+        if not keys or not chat_ids:
+            return result
+        shared = "a" if kind == KIND_ARTICLE else "f"
+        values = self._get([f"k:{chat_id}" for chat_id in chat_ids]
+                           + [f"{shared}:{key}" for key in keys]
+                           + [f"s:{chat_id}|{kind}|{key}" for chat_id in chat_ids for key in keys])
+        seeded = values[:len(chat_ids)]
+        marked = values[len(chat_ids):len(chat_ids) + len(keys)]
+        own = iter(values[len(chat_ids) + len(keys):])
+        for chat_id, seeded_at in zip(chat_ids, seeded):
+            seeded_at = datetime.fromisoformat(seeded_at) if seeded_at else None
+            for key, marked_at in zip(keys, marked):
+                if next(own) is not None or (
+                        seeded_at and marked_at and datetime.fromisoformat(marked_at) <= seeded_at):
+                    result[chat_id].add(key)
+        return result
+
+    def mark_chat_sent(self, chat_id, rows):
+        now = datetime.utcnow().isoformat()
+        self._add({f"s:{chat_id}|{kind}|{key}": now for kind, key in rows})
+
+    def load_cursor(self, source):
+        value, = self._get([f"c:{source}"])
+        if value is None:
+            return FeedCursor(source)
+        data = json.loads(value)
+        newest_at = datetime.fromisoformat(data["newest_at"]) if data["newest_at"] else None
+        return FeedCursor(source, tuple(data["guids"]), newest_at)
+
+    def save_cursor(self, cursor):
+        value = json.dumps({
+            "guids": list(cursor.guids),
+            "newest_at": cursor.newest_at.isoformat() if cursor.newest_at else None,
+        }, ensure_ascii=False)
+        self._call("set", {"items": {f"c:{cursor.source}": value}})
+
+    def history_counts(self):
+        articles, rounds = self._get([f"n:{ARTICLES}", f"n:{FUNDRAISING}"])
+        return {ARTICLES: int(articles or 0), FUNDRAISING: int(rounds or 0)}
+
+    def cleanup(self, days=30):
+        # История истекает на сервере по TTL (store.retention_days)
+        pass
+
+
+def open_store(backend: str = "sqlite", url: str = "", timeout: float = 5, retention_days: int = 30) -> StateStore:
+    if backend == "memory":
+        return MemoryStore()
+    if backend == "kv":
+        return KVStore(url, timeout, retention_days)
+    return SqliteStore()
+
+
+_store: Optional[StateStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> StateStore:
+    """Хранилище процесса по store из settings.json (создаётся при первом обращении)"""
+    global _store
+    if _store is None:
+        from core.config import get_config    # core.config сам тянет db.* при импорте
+        with _store_lock:
+            if _store is None:
+                settings = get_config().store
+                _store = open_store(settings.backend, settings.url, settings.timeout, settings.retention_days)
+    return _store
+
+
+def set_store(store: StateStore):
+    """Подменить хранилище процесса (тесты, бенчмарки)"""
+    global _store
+    _store = store
@@ -0,0 +1,198 @@
+"""
+Счётчики трендов по часовым корзинам.
+
+trend_counts — (измерение, ключ, час) → число материалов: темы статей,
+источники, инвесторы раундов. Счётчики только прибавляются по мере
+сбора, поэтому окно любого размера — сумма нескольких корзин, а не
+пересчёт истории. trend_seen помнит учтённые материалы: один и тот же
+материал приходит и в алерты, и в каждый дайджест, пока лежит в буфере.
+
+Тренд — всплеск текущего окна против прошлых окон того же размера:
+z = (сейчас − среднее) / отклонение. Для редких ключей отклонение не
+меньше √среднего (шум пуассоновского счёта) и не меньше 1, иначе
+«было 0, стало 1» выглядело бы бесконечным ростом.
+"""
+
+import calendar
+import math
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from db.database import get_connection
+
+DIM_TOPIC = "topic"
+DIM_SOURCE = "source"
+DIM_INVESTOR = "investor"
+
+CHUNK = 500
+
+
+@dataclass(frozen=True)
+class Trend:
+    key: str
+    count: int        # в текущем окне
+    mean: float       # в среднем за прошлые окна
+    z: float
+
+
+def init_trend_tables():
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS trend_counts (
+            dim TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            key TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (dim, bucket, key)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS trend_seen (
+            item_key TEXT PRIMARY KEY,
+            seen_at TIMESTAMP NOT NULL
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_trend_seen_at ON trend_seen(seen_at)")
+
+    conn.commit()
+    conn.close()
+
+
+def bucket_of(at: datetime) -> int:
+    """Номер часа от эпохи; naive — UTC, как даты из фидов"""
+    return calendar.timegm(at.utctimetuple()) // 3600
+
+
+def record_items(items: Iterable[tuple[str, datetime, list[tuple[str, str]]]],
+                 now: datetime = None) -> int:
+    """
+    items: (ключ материала, время, [(измерение, ключ счётчика)]).
+    Уже учтённые материалы пропускаются; время из будущего — как now.
+
+    Returns:
+        число новых материалов
+    """
+    now = now or datetime.utcnow()
+    items = {key: (at, keys) for key, at, keys in items}
+    if not items:
+        return 0
+
+    conn = get_connection()
+    try:
+        keys = list(items)
+        seen = set()
+        for i in range(0, len(keys), CHUNK):
+            chunk = keys[i:i + CHUNK]
+            rows = conn.execute(
+                f"SELECT item_key FROM trend_seen WHERE item_key IN ({','.join('?' * len(chunk))})",
+                chunk
+            )
+            seen.update(row["item_key"] for row in rows)
+
+        new = [key for key in keys if key not in seen]
+        counts = Counter()
+        for key in new:
+            at, dims = items[key]
+            bucket = bucket_of(min(at or now, now))
+            counts.update((dim, bucket, k) for dim, k in set(dims))
+
+        conn.executemany(
+            """INSERT INTO trend_counts (dim, bucket, key, count) VALUES (?, ?, ?, ?)
+               ON CONFLICT(dim, bucket, key) DO UPDATE SET count = count + excluded.count""",
+            [(*k, n) for k, n in counts.items()]
+        )
+        conn.executemany("INSERT INTO trend_seen (item_key, seen_at) VALUES (?, ?)",
+                         [(key, now) for key in new])
+        conn.commit()
+    finally:
+        conn.close()
+    return len(new)
+
+
+def record_collected(articles: list, topics: list[list[str]], rounds: list, now: datetime = None) -> int:
+    """Статьи (с их темами) и раунды в счётчики"""
+    items = [
+        (f"article:{a.url}", a.published_at,
+         [(DIM_TOPIC, t) for t in a_topics] + [(DIM_SOURCE, a.source)])
+        for a, a_topics in zip(articles, topics)
+    ]
+    items += [
+        (f"fundraising:{r.project.lower().strip()}:{(r.round_type or 'unknown').lower()}", r.date,
+         [(DIM_INVESTOR, i) for i in r.lead_investors + r.other_investors if i] + [(DIM_SOURCE, r.source)])
+        for r in rounds
+    ]
+    return record_items(items, now)
+
+
+def bucket_counts(dim: str, since: int) -> dict[str, dict[int, int]]:
+    """ключ → {час: число} начиная с часа since"""
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            "SELECT bucket, key, count FROM trend_counts WHERE dim = ? AND bucket >= ?",
+            (dim, since)
+        ).fetchall()
+    finally:
+        conn.close()
+    counts: dict[str, dict[int, int]] = defaultdict(dict)
+    for row in rows:
+        counts[row["key"]][row["bucket"]] = row["count"]
+    return counts
+
+
+def window_stats(buckets: dict[int, int], now_bucket: int, window_hours: int,
+                 windows: int) -> tuple[int, float, float]:
+    """
+    (текущее окно, среднее и отклонение прошлых окон) за один проход по
+    непустым корзинам ключа — O(корзин).
+    """
+    totals = [0] * (windows + 1)     # 0 — текущее окно, 1..windows — прошлые
+    for bucket, count in buckets.items():
+        i = (now_bucket - bucket) // window_hours
+        if 0 <= i <= windows:
+            totals[i] += count
+    past = totals[1:]
+    mean = sum(past) / windows
+    std = math.sqrt(sum((x - mean) ** 2 for x in past) / windows)
+    return totals[0], mean, std
+
+
+def trending(dim: str, window_hours: int = 24, history_days: int = 7, min_count: int = 3,
+             min_z: float = 2.0, top: int = 5, keys: Optional[Iterable[str]] = None,
+             now: datetime = None) -> list[Trend]:
+    """Растущие ключи измерения по убыванию z; keys — ограничить набором (темы)"""
+    now_bucket = bucket_of(now or datetime.utcnow())
+    windows = max(history_days * 24 // window_hours, 1)
+    counts = bucket_counts(dim, now_bucket - window_hours * (windows + 1) + 1)
+    wanted = None if keys is None else set(keys)
+
+    trends = []
+    for key, buckets in counts.items():
+        if wanted is not None and key not in wanted:
+            continue
+        count, mean, std = window_stats(buckets, now_bucket, window_hours, windows)
+        if count < min_count:
+            continue
+        z = (count - mean) / max(std, math.sqrt(mean), 1.0)
+        if z >= min_z:
+            trends.append(Trend(key, count, mean, z))
+    trends.sort(key=lambda t: (-t.z, -t.count, t.key))
+    return trends[:top]
+
+
+def cleanup_trends(days: int = 30):
+    """Корзины и отметки старше N дней (N не меньше истории трендов)"""
+    conn = get_connection()
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    conn.execute("DELETE FROM trend_counts WHERE bucket < ?", (bucket_of(cutoff),))
+    conn.execute("DELETE FROM trend_seen WHERE seen_at < ?", (cutoff,))
+    conn.commit()
+    conn.close()
+
+
+# Инициализация при импорте
+init_trend_tables()
@@ -0,0 +1,130 @@
+"""
+Подписки WebSub: фид (topic) → hub, секрет для подписи, срок аренды.
+"""
+
+import secrets
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from db.database import get_connection
+
+STATE_PENDING = "pending"
+STATE_ACTIVE = "active"
+STATE_DENIED = "denied"
+STATE_UNSUBSCRIBED = "unsubscribed"
+
+
+def init_websub_tables():
+    conn = get_connection()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS websub_subscriptions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            source TEXT UNIQUE NOT NULL,
+            topic TEXT NOT NULL,
+            hub TEXT NOT NULL,
+            secret TEXT NOT NULL,
+            state TEXT NOT NULL DEFAULT 'pending',
+            lease_expires_at TIMESTAMP,
+            requested_at TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.commit()
+    conn.close()
+
+
+@dataclass
+class Subscription:
+    id: int
+    source: str
+    topic: str
+    hub: str
+    secret: str
+    state: str
+    lease_expires_at: Optional[datetime]
+    requested_at: Optional[datetime]
+
+    def is_active(self, now: datetime = None) -> bool:
+        now = now or datetime.now()
+        return (self.state == STATE_ACTIVE and self.lease_expires_at is not None
+                and self.lease_expires_at > now)
+
+
+def _row_to_subscription(row) -> Subscription:
+    return Subscription(
+        id=row["id"],
+        source=row["source"],
+        topic=row["topic"],
+        hub=row["hub"],
+        secret=row["secret"],
+        state=row["state"],
+        lease_expires_at=datetime.fromisoformat(row["lease_expires_at"]) if row["lease_expires_at"] else None,
+        requested_at=datetime.fromisoformat(row["requested_at"]) if row["requested_at"] else None,
+    )
+
+
+def upsert_subscription(source: str, topic: str, hub: str) -> Subscription:
+    """
+    Запомнить hub фида. Если hub/topic не изменились — подписка остаётся как есть,
+    иначе сбрасывается в pending с новым секретом.
+    """
+    conn = get_connection()
+    try:
+        row = conn.execute("SELECT * FROM websub_subscriptions WHERE source = ?", (source,)).fetchone()
+        if row is None:
+            conn.execute(
+                "INSERT INTO websub_subscriptions (source, topic, hub, secret) VALUES (?, ?, ?, ?)",
+                (source, topic, hub, secrets.token_hex(20))
+            )
+        elif row["topic"] != topic or row["hub"] != hub:
+            conn.execute(
+                """UPDATE websub_subscriptions
+                   SET topic = ?, hub = ?, secret = ?, state = ?, lease_expires_at = NULL,
+                       requested_at = NULL, updated_at = ?
+                   WHERE source = ?""",
+                (topic, hub, secrets.token_hex(20), STATE_PENDING, datetime.now(), source)
+            )
+        conn.commit()
+        row = conn.execute("SELECT * FROM websub_subscriptions WHERE source = ?", (source,)).fetchone()
+    finally:
+        conn.close()
+    return _row_to_subscription(row)
+
+
+def get_subscription(sub_id: int) -> Optional[Subscription]:
+    conn = get_connection()
+    row = conn.execute("SELECT * FROM websub_subscriptions WHERE id = ?", (sub_id,)).fetchone()
+    conn.close()
+    return _row_to_subscription(row) if row else None
+
+
+def list_subscriptions() -> list[Subscription]:
+    conn = get_connection()
+    rows = conn.execute("SELECT * FROM websub_subscriptions").fetchall()
+    conn.close()
+    return [_row_to_subscription(r) for r in rows]
+
+
+def mark_requested(sub_id: int, when: datetime = None):
+    conn = get_connection()
+    conn.execute(
+        "UPDATE websub_subscriptions SET requested_at = ?, updated_at = ? WHERE id = ?",
+        (when or datetime.now(), datetime.now(), sub_id)
+    )
+    conn.commit()
+    conn.close()
+
+
+def set_state(sub_id: int, state: str, lease_expires_at: Optional[datetime] = None):
+    conn = get_connection()
+    conn.execute(
+        "UPDATE websub_subscriptions SET state = ?, lease_expires_at = ?, updated_at = ? WHERE id = ?",
+        (state, lease_expires_at, datetime.now(), sub_id)
+    )
+    conn.commit()
+    conn.close()
+
+
+# Инициализация при импорте
+init_websub_tables()
@@ -1,6 +1,9 @@
 """Scoring and ranking of content."""
 
 from collectors.twitter import Tweet
+from filters.relevance import score_texts
+
+TOPIC_WEIGHT = 40    # × sum of topic cosines (a typical hit ≈ 0.25, i.e. ~10)
 
 
 def rank_tweets(
@@ -11,7 +14,7 @@ def rank_tweets(
     """
     Score = likes + retweets*3 + replies*2
     + category bonus
-    + topic match bonus
+    + topic relevance bonus (TF-IDF cosine)
     """
     if category_bonuses is None:
         category_bonuses = {
@@ -22,18 +25,16 @@ def rank_tweets(
             "founder": 1.2,
         }
 
-    for tweet in tweets:
+    rows = score_texts(priority_topics, [tweet.text for tweet in tweets])
+
+    for tweet, row in zip(tweets, rows):
         base_score = tweet.likes + tweet.retweets * 3 + tweet.replies * 2
 
         # Category multiplier
         multiplier = category_bonuses.get(tweet.author_category, 1.0)
 
         # Topic bonus
-        topic_bonus = 0
-        text = tweet.text.lower()
-        for topic in priority_topics:
-            if topic.lower() in text:
-                topic_bonus += 10
+        topic_bonus = sum(row.values()) * TOPIC_WEIGHT
 
         tweet.score = base_score * multiplier + topic_bonus
 
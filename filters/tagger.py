@@ -1,20 +1,48 @@
 """Content tagging by priority topics."""
 
 
-def tag_content(text: str, topics: list[str]) -> list[str]:
+class TopicMatcher:
     """
-    Return list of found topics in text.
+    Priority topics with precomputed lowercase forms.
+
+    Built once per config load instead of lowering every topic per item.
     """
-    text_lower = text.lower()
-    found = []
 
-    for topic in topics:
-        if topic.lower() in text_lower:
-            found.append(topic)
+    __slots__ = ("topics", "_pairs")
+
+    def __init__(self, topics: list[str]):
+        self.topics = tuple(topics)
+        self._pairs = tuple((t, t.lower()) for t in self.topics)
+
+    def find(self, text_lower: str) -> list[str]:
+        """Topics found in already lowercased text."""
+        return [t for t, low in self._pairs if low in text_lower]
+
+    def count(self, text_lower: str) -> int:
+        """Number of topics found in already lowercased text."""
+        return sum(1 for _, low in self._pairs if low in text_lower)
+
+    def __iter__(self):
+        return iter(self.topics)
+
+    def __len__(self):
+        return len(self.topics)
 
-    return found
+
+def as_matcher(topics) -> TopicMatcher:
+    """Accept either a TopicMatcher or a plain list of topics."""
+    if isinstance(topics, TopicMatcher):
+        return topics
+    return TopicMatcher(topics or [])
+
+
+def tag_content(text: str, topics) -> list[str]:
+    """
+    Return list of found topics in text.
+    """
+    return as_matcher(topics).find(text.lower())
 
 
-def is_priority(text: str, topics: list[str]) -> bool:
+def is_priority(text: str, topics) -> bool:
     """Check if text contains priority topics."""
     return len(tag_content(text, topics)) > 0
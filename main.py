@@ -4,191 +4,330 @@ Market Pulse Bot — с SQLite дедупликацией
 
 import asyncio
 import argparse
-import json
 import os
-import time
+import socket
+import sys
 from datetime import datetime
-from pathlib import Path
+from typing import Optional
 
-import pytz
 import schedule
 from dotenv import load_dotenv
 
-from collectors.fundraising import collect_fundraising
-from collectors.articles import collect_articles, rank_articles, Article
-from collectors.scraper import collect_scraped_articles
-from filters.tagger import tag_content
-from bot.telegram import format_digest, send_digest
-from db.database import (
-    is_article_sent,
-    is_fundraising_sent,
-    mark_article_sent,
-    mark_fundraising_sent,
-    cleanup_old_records,
-    get_stats
-)
+from collectors.websub import WebSubReceiver
+from bot.alerts import AlertPipeline
+from bot.commands import CommandServer
+from core.api import ApiServer
+from core.config import get_config
+from core.delivery import DeliveryWorkers
+from core.digest import digest_stages
+from core.memprof import MemoryBudgetExceeded, MemoryProfiler
+from core.pipeline import Pipeline
+from core.scheduler import FeedScheduler, LeasedScheduler
+from db.database import incremental_vacuum
+from db.alerts import alert_latency_stats
+from db.archive import cleanup_archive
+from db.health import cleanup_health, source_report
+from db.leases import cleanup_workers, worker_report
+from db.outbox import cleanup_outbox, outbox_counts
+from db.pages import cleanup_scraped_urls, page_report
+from db.relevance import cleanup_relevance_docs
+from db.stats import get_stats, stats_report
+from db.store import get_store
+from db.trends import DIM_INVESTOR, DIM_SOURCE, DIM_TOPIC, cleanup_trends, trending
 
 load_dotenv()
 
-BASE_DIR = Path(__file__).parent
-CONFIG_DIR = BASE_DIR / "config"
 
-
-def load_json(path):
-    with open(path, encoding="utf-8") as f:
-        return json.load(f)
+def telegram_targets() -> tuple[Optional[str], list[str]]:
+    """Токен бота и список chat_id из окружения"""
+    bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
+    chat_ids_str = os.getenv("TELEGRAM_CHAT_IDS") or os.getenv("TELEGRAM_CHAT_ID") or ""
+    chat_ids = [cid.strip() for cid in chat_ids_str.split(",") if cid.strip()]
+    return bot_token, chat_ids
 
 
-async def run_digest():
+async def run_digest(deadline_seconds: Optional[float] = None, from_pending: bool = False,
+                     profile_mem: bool = False, mem_budget_mb: Optional[float] = None,
+                     delivery: Optional[DeliveryWorkers] = None):
     print(f"\n{'='*50}")
     print(f"[{datetime.now()}] Running digest...")
     print(f"{'='*50}")
 
-    # Load configs
-    rss_sources = load_json(CONFIG_DIR / "rss_sources.json")
-    topics = load_json(CONFIG_DIR / "topics.json")
-    settings = load_json(CONFIG_DIR / "settings.json")
-
-    priority_topics = topics.get("priority_topics", [])
-    fundraising_hours = settings.get("fundraising_hours", 168)
+    # Config (compiled once, reloaded only when files change)
+    config = get_config()
 
     # DB stats
     stats = get_stats()
     print(f"DB stats: {stats['articles']} articles, {stats['fundraising']} fundraising in history")
 
-    # === COLLECT ===
+    # collect → dedupe → rank → tag → format → outbox → deliver, независимые стадии параллельно
+    bot_token, chat_ids = telegram_targets()
+    profiler = None
+    if profile_mem:
+        # Стадии идут по одной, иначе память не разнести по стадиям
+        profiler = MemoryProfiler(budget_mb=mem_budget_mb or config.limits.memory_budget_mb)
+        profiler.start()
+    pipeline = Pipeline(digest_stages(config, bot_token, chat_ids, deadline_seconds, from_pending, delivery),
+                        profiler=profiler)
+    try:
+        run = await pipeline.run()
+        print(f"\n{run.report()}")
+    finally:
+        if profiler is not None:
+            print(f"\n{profiler.report()}")
+            profiler.stop()
+
+
+async def deliver_outbox():
+    """Дослать то, что осталось в outbox (например, после падения посреди рассылки)"""
+    bot_token, _ = telegram_targets()
+    if not bot_token:
+        print("TELEGRAM_BOT_TOKEN not set")
+        return
+    workers = DeliveryWorkers(bot_token, get_config().delivery)
+    report = await workers.deliver_due()
+    print(f"Outbox: {report}")
 
-    # Fundraising
-    print("\nCollecting fundraising...")
-    fundraising_feeds = rss_sources.get("fundraising_news", {})
-    all_fundraising = await collect_fundraising(
-        hours=fundraising_hours,
-        rss_feeds=fundraising_feeds
-    )
 
-    # Filter out already sent
-    fundraising = []
-    for f in all_fundraising:
-        if not is_fundraising_sent(f.project, f.round_type or "unknown"):
-            fundraising.append(f)
-    print(f"   New fundraising: {len(fundraising)} (filtered {len(all_fundraising) - len(fundraising)} duplicates)")
-
-    # Articles (VIP + regular)
-    print("\nCollecting articles...")
-    vip_articles, regular_articles = collect_articles(rss_sources, hours=24)
-
-    # Scrape institutional
-    print("\nScraping institutional sources...")
-    scraped = await collect_scraped_articles()
-    for s in scraped:
-        vip_articles.append(Article(
-            title=s.title,
-            author=s.author,
-            url=s.url,
-            source=s.source,
-            source_type="vip",
-            published_at=s.published_at or datetime.now(),
-            is_vip=True
-        ))
-
-    # Filter out already sent articles
-    vip_filtered = [a for a in vip_articles if not is_article_sent(a.url)]
-    regular_filtered = [a for a in regular_articles if not is_article_sent(a.url)]
-
-    print(f"   VIP: {len(vip_filtered)} new (filtered {len(vip_articles) - len(vip_filtered)} duplicates)")
-    print(f"   Regular: {len(regular_filtered)} new (filtered {len(regular_articles) - len(regular_filtered)} duplicates)")
-
-    # Rank regular
-    regular_filtered = rank_articles(regular_filtered, priority_topics)
-
-    # Tag
-    for a in vip_filtered + regular_filtered:
-        a.tags = tag_content(a.title + " " + (a.summary or ""), priority_topics)
-
-    # === FORMAT ===
-    msk = pytz.timezone("Europe/Moscow")
-    now = datetime.now(msk)
-    is_morning = now.hour < 14
-
-    message = format_digest(
-        fundraising[:10],
-        vip_filtered,
-        regular_filtered[:10],
-        is_morning=is_morning,
-        priority_topics=priority_topics
-    )
+def format_latency(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "—"
+    if seconds < 120:
+        return f"{seconds:.0f}s"
+    return f"{seconds / 60:.0f}m"
 
-    # === SEND ===
-    bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
-    chat_ids_str = os.getenv("TELEGRAM_CHAT_IDS") or os.getenv("TELEGRAM_CHAT_ID")
 
-    if not bot_token or not chat_ids_str:
-        print("\nTELEGRAM_BOT_TOKEN or TELEGRAM_CHAT_IDS not set")
-        print("\n--- PREVIEW ---\n")
-        print(message)
+def print_stats(days: int):
+    """--stats: всё из материализованных агрегатов, без сканов истории"""
+    stats = get_stats()
+    print(f"Database stats:")
+    print(f"  Articles sent: {stats['articles']}")
+    print(f"  Fundraising sent: {stats['fundraising']}")
+    alert_stats = alert_latency_stats(days=7)
+    if alert_stats["alerts"]:
+        print(f"  Alerts (7d): {alert_stats['alerts']}, publish → delivery "
+              f"p50 {format_latency(alert_stats['p50_s'])}, "
+              f"p95 {format_latency(alert_stats['p95_s'])}, "
+              f"max {format_latency(alert_stats['max_s'])}")
+    outbox = outbox_counts()
+    if outbox:
+        print("  Outbox: " + ", ".join(f"{n} {status}" for status, n in sorted(outbox.items())))
+
+    report = stats_report(days=days)
+    for kind, (checked, duplicates) in sorted(report["dedupe"].items()):
+        print(f"  Dedupe ({days}d, {kind}): {duplicates}/{checked} already sent ({duplicates / checked:.0%})")
+
+    if report["sources"]:
+        print(f"\nSent per source per day (last {days} days, oldest first):")
+        for kind, source, per_day in report["sources"]:
+            print(f"  {kind:<12} {source or '—':<30} {sum(per_day):>6}  " + " ".join(f"{n:>5}" for n in per_day))
+
+    if report["rounds"]:
+        print("\nFundraising by round type:")
+        for round_type, rounds, amount in report["rounds"]:
+            print(f"  {round_type:<20} {rounds:>6} rounds  ${amount:>10,.1f}M")
+
+    if report["investors"]:
+        print("\nTop lead investors:")
+        for investor, rounds, amount in report["investors"]:
+            print(f"  {investor:<30} {rounds:>6} rounds  ${amount:>10,.1f}M")
+
+    workers = worker_report(alive_seconds=get_config().workers.lease_seconds)
+    if workers["workers"]:
+        print(f"\nCollection workers ({len(workers['workers'])} alive, {workers['sources']} sources in the pool):")
+        for worker_id, polls, items, stolen, held in workers["workers"]:
+            print(f"  {worker_id:<30} {polls:>7} polls {items:>7} items {stolen:>5} taken over  {held:>3} leased now")
+
+    pages = page_report()
+    if pages:
+        print("\nScraped pages (change detection):")
+        for site, parsed, skipped, listed_at in pages:
+            print(f"  {site:<30} {parsed:>6} parsed {skipped:>6} skipped  last change seen {listed_at:%Y-%m-%d %H:%M} UTC")
+
+    settings = get_config().trending
+    for dim, title in ((DIM_TOPIC, "topics"), (DIM_SOURCE, "sources"), (DIM_INVESTOR, "investors")):
+        trends = trending(dim, settings.window_hours, settings.history_days, settings.min_count,
+                          settings.min_z, settings.top)
+        if trends:
+            print(f"\nTrending {title} ({settings.window_hours}h): "
+                  + ", ".join(f"{t.key} {t.count} vs {t.mean:.1f} (z={t.z:.1f})" for t in trends))
+
+
+def print_source_report(days: int):
+    rows = source_report(days=days)
+    if not rows:
+        print("No source health data yet")
         return
 
-    chat_ids = [cid.strip() for cid in chat_ids_str.split(",")]
-    for chat_id in chat_ids:
-        await send_digest(bot_token, chat_id, message)
-        print(f"   Sent to chat_id: {chat_id}")
-
-    # === MARK AS SENT ===
-    print("\nSaving to database...")
+    print(f"Sources over the last {days} days (worst cost/yield first):")
+    print(f"  {'source':<40} {'runs':>5} {'fail':>5} {'skip':>5} {'avg ms':>7} {'cost s':>7} {'entries':>8} {'sent':>5} {'s/item':>7}  breaker")
+    for r in rows:
+        per_item = f"{r['cost_per_item_s']:.1f}" if r["cost_per_item_s"] is not None else "—"
+        avg_latency = f"{r['avg_latency_ms']:.0f}" if r["avg_latency_ms"] is not None else "—"
+        breaker = f"open until {r['open_until']} ({r['last_error']})" if r["open_until"] else ""
+        print(
+            f"  {r['source']:<40} {r['runs']:>5} {r['failed']:>5} {r['skipped']:>5} "
+            f"{avg_latency:>7} {r['cost_s']:>7.1f} {r['entries'] or 0:>8} {r['sent']:>5} {per_item:>7}  {breaker}"
+        )
+
+
+async def run_adaptive_scheduler():
+    """
+    Фоновый адаптивный опрос источников + дайджесты по расписанию,
+    которые только забирают накопленный буфер.
+    """
+    config = get_config()
+    loop = asyncio.get_running_loop()
+
+    def report_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception():
+            print(f"Digest failed: {task.exception()}")
+
+    bot_token, chat_ids = telegram_targets()
+    # Дайджест только ставится в outbox, доставка — фоновыми воркерами
+    delivery = DeliveryWorkers(bot_token, config.delivery) if bot_token else None
+    if delivery is not None:
+        asyncio.create_task(delivery.run())
+
+    def digest_job():
+        loop.create_task(run_digest(from_pending=True, delivery=delivery)).add_done_callback(report_failure)
+
+    for at in config.schedule.times:
+        schedule.every().day.at(at, config.schedule.timezone).do(digest_job)
+
+    alerts = AlertPipeline(bot_token, chat_ids)
+    commands = None
+    if config.commands.enabled and bot_token:
+        # Команды отвечают из кэша, который пополняют те же опросы, что и алерты
+        commands = CommandServer(bot_token, chat_ids)
+        asyncio.create_task(commands.run())
+
+    async def notify_all(source: str, items: list):
+        await commands.on_new_items(source, items)
+        await alerts.on_new_items(source, items)
+
+    on_new_items = notify_all if commands else alerts.on_new_items
+
+    if config.api.enabled:
+        asyncio.create_task(ApiServer(config.api).run())
+
+    receiver = None
+    if config.websub.enabled:
+        receiver = WebSubReceiver(config.websub, on_new_items=on_new_items)
+        await receiver.refresh_active()
+        asyncio.create_task(receiver.run())
+
+    hooks = dict(
+        on_new_items=on_new_items,
+        is_pushed=receiver.is_pushed if receiver else None,
+        on_hub_discovered=receiver.on_hub_discovered if receiver else None
+    )
+    # В пуле воркеров планировщик берёт источники в аренду наравне с --worker
+    scheduler = LeasedScheduler(worker_id(), **hooks) if config.workers.enabled else FeedScheduler(**hooks)
+    poller = asyncio.create_task(scheduler.run())
+
+    if commands:
+        print("Commands on: /latest, /fundraising, /topic, /search (long polling)")
+    if config.alerts.enabled:
+        print(f"Breaking alerts on (articles ≥ {config.alerts.article_score:g}, "
+              f"fundraising ≥ {config.alerts.fundraising_score:g}, VIP: {config.alerts.vip})")
+    print(f"Scheduler running: adaptive polling, digests at {', '.join(config.schedule.times)} "
+          f"{config.schedule.timezone}")
+    print("Press Ctrl+C to stop")
 
-    for f in fundraising[:10]:
-        mark_fundraising_sent(f.project, f.round_type or "unknown", f.amount, f.source_url)
+    while not poller.done():
+        schedule.run_pending()
+        await asyncio.sleep(30)
+    poller.result()
 
-    for a in vip_filtered:
-        mark_article_sent(a.url, a.title, a.source)
 
-    for a in regular_filtered[:10]:
-        mark_article_sent(a.url, a.title, a.source)
+def run_scheduler():
+    asyncio.run(run_adaptive_scheduler())
 
-    print(f"\nDigest sent!")
-    print(f"   Fundraising: {len(fundraising[:10])}")
-    print(f"   VIP articles: {len(vip_filtered)}")
-    print(f"   Regular articles: {min(len(regular_filtered), 10)}")
 
-    # Cleanup old records (once a day)
-    if now.hour == 10:
-        cleanup_old_records(days=30)
+def run_api():
+    """Только JSON API: архив дайджестов читается из общей БД"""
+    try:
+        asyncio.run(ApiServer(get_config().api).run())
+    except KeyboardInterrupt:
+        pass
 
 
-def run_scheduler():
-    schedule.every().day.at("07:00").do(lambda: asyncio.run(run_digest()))
-    schedule.every().day.at("17:00").do(lambda: asyncio.run(run_digest()))
+def worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
 
-    print("Scheduler running (07:00, 17:00 UTC = 10:00, 20:00 MSK)")
-    print("Press Ctrl+C to stop")
 
-    while True:
-        schedule.run_pending()
-        time.sleep(60)
+def run_worker():
+    """
+    Только сбор: источники берутся в аренду из общего пула, новое — в
+    общий буфер, откуда его заберёт дайджест процесса --schedule.
+    """
+    print(f"Collection worker {worker_id()} started, press Ctrl+C to stop")
+    try:
+        asyncio.run(LeasedScheduler(worker_id()).run())
+    except KeyboardInterrupt:
+        pass
 
 
 def main():
     parser = argparse.ArgumentParser(description="Market Pulse Bot")
-    parser.add_argument("--schedule", action="store_true", help="Run on schedule")
-    parser.add_argument("--stats", action="store_true", help="Show DB stats")
+    parser.add_argument("--schedule", action="store_true",
+                        help="Poll sources adaptively and send digests on schedule")
+    parser.add_argument("--worker", action="store_true",
+                        help="Run a collection worker that shares sources with other workers via leases")
+    parser.add_argument("--stats", type=int, nargs="?", const=7, metavar="DAYS",
+                        help="Show DB stats and analytics (default 7 days)")
     parser.add_argument("--cleanup", type=int, help="Cleanup records older than N days")
+    parser.add_argument("--sources", type=int, nargs="?", const=14, metavar="DAYS",
+                        help="Show source cost vs yield report (default 14 days)")
+    parser.add_argument("--api", action="store_true",
+                        help="Serve the read-only JSON API over archived digests")
+    parser.add_argument("--deliver", action="store_true",
+                        help="Deliver what is left in the outbox and exit")
+    parser.add_argument("--deadline", type=float, help="Collection deadline in seconds (overrides settings.json)")
+    parser.add_argument("--profile-mem", action="store_true",
+                        help="Trace memory per digest stage (stages run one at a time)")
+    parser.add_argument("--mem-budget", type=float, metavar="MB",
+                        help="Fail --profile-mem run if a stage peaks above MB (default limits.memory_budget_mb)")
     args = parser.parse_args()
 
     if args.stats:
-        stats = get_stats()
-        print(f"Database stats:")
-        print(f"  Articles sent: {stats['articles']}")
-        print(f"  Fundraising sent: {stats['fundraising']}")
+        print_stats(args.stats)
+        return
+
+    if args.sources:
+        print_source_report(args.sources)
         return
 
     if args.cleanup:
-        cleanup_old_records(days=args.cleanup)
+        get_store().cleanup(days=args.cleanup)
+        cleanup_outbox(days=args.cleanup)
+        cleanup_health(days=args.cleanup)
+        cleanup_relevance_docs(days=args.cleanup)
+        cleanup_trends(days=args.cleanup)
+        cleanup_workers(days=args.cleanup)
+        cleanup_scraped_urls(days=args.cleanup)
+        cleanup_archive(days=args.cleanup)
+        print(f"Vacuum: {incremental_vacuum()} free page(s) returned")
+        return
+
+    if args.deliver:
+        asyncio.run(deliver_outbox())
         return
 
-    if args.schedule:
+    if args.api:
+        run_api()
+    elif args.worker:
+        run_worker()
+    elif args.schedule:
         run_scheduler()
     else:
-        asyncio.run(run_digest())
+        try:
+            asyncio.run(run_digest(deadline_seconds=args.deadline, profile_mem=args.profile_mem,
+                                   mem_budget_mb=args.mem_budget))
+        except MemoryBudgetExceeded as e:
+            print(f"\nMemory budget exceeded: {e}")
+            sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,111 @@
+"""
+Локальный сервер ключ-значение для store.backend = "kv" без внешних сервисов.
+
+    python scripts/local_kv_server.py --port 8091
+    # в config/settings.json: "store": {"backend": "kv", "url": "http://127.0.0.1:8091"}
+
+Все операции — POST с JSON, значения — строки:
+
+    /get   {"keys": [...]}                     → {"values": [значение или null, ...]}
+    /add   {"items": {k: v}, "ttl": секунды}   → {"added": [ключи, которых не было]}
+    /set   {"items": {k: v}, "ttl": секунды}   → {"ok": true}     (ttl необязателен)
+    /incr  {"counters": {k: n}}                → {"values": {k: новое значение}}
+
+Данные живут в памяти процесса; ключ с истёкшим TTL считается
+отсутствующим и раз в минуту вычищается.
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Optional
+
+from aiohttp import web
+
+SWEEP_SECONDS = 60
+
+# key → (value, expires_at monotonic или None)
+DATA: dict[str, tuple[str, float]] = {}
+
+
+def _get(key: str):
+    entry = DATA.get(key)
+    if entry is None:
+        return None
+    value, expires = entry
+    if expires is not None and expires <= time.monotonic():
+        del DATA[key]
+        return None
+    return value
+
+
+def _expires(ttl) -> Optional[float]:
+    return time.monotonic() + ttl if ttl else None
+
+
+async def handle_get(request: web.Request) -> web.Response:
+    keys = (await request.json())["keys"]
+    return web.json_response({"values": [_get(key) for key in keys]})
+
+
+async def handle_add(request: web.Request) -> web.Response:
+    body = await request.json()
+    expires = _expires(body.get("ttl"))
+    added = []
+    for key, value in body["items"].items():
+        if _get(key) is None:
+            DATA[key] = (value, expires)
+            added.append(key)
+    return web.json_response({"added": added})
+
+
+async def handle_set(request: web.Request) -> web.Response:
+    body = await request.json()
+    expires = _expires(body.get("ttl"))
+    for key, value in body["items"].items():
+        DATA[key] = (value, expires)
+    return web.json_response({"ok": True})
+
+
+async def handle_incr(request: web.Request) -> web.Response:
+    values = {}
+    for key, by in (await request.json())["counters"].items():
+        values[key] = int(_get(key) or 0) + by
+        DATA[key] = (str(values[key]), None)
+    return web.json_response({"values": values})
+
+
+async def sweep(app: web.Application):
+    async def loop():
+        while True:
+            await asyncio.sleep(SWEEP_SECONDS)
+            now = time.monotonic()
+            for key in [k for k, (_, expires) in DATA.items() if expires is not None and expires <= now]:
+                del DATA[key]
+
+    task = asyncio.create_task(loop())
+    yield
+    task.cancel()
+
+
+def make_app() -> web.Application:
+    app = web.Application(client_max_size=64 * 2 ** 20)
+    app.router.add_post("/get", handle_get)
+    app.router.add_post("/add", handle_add)
+    app.router.add_post("/set", handle_set)
+    app.router.add_post("/incr", handle_incr)
+    app.cleanup_ctx.append(sweep)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local key-value server for store.backend = kv")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8091)
+    args = parser.parse_args()
+    print(f"kv: listening on http://{args.host}:{args.port}")
+    web.run_app(make_app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Локальный WebSub hub для проверки приёмника без внешних сервисов.
+
+    python scripts/local_websub_hub.py --port 8090
+    # в config/settings.json: websub.callback_url = "http://127.0.0.1:8080"
+
+Hub принимает подписки (POST /, hub.mode=subscribe), подтверждает их
+GET'ом с hub.challenge на callback и рассылает контент:
+
+    curl -X POST --data-binary @feed.xml "http://127.0.0.1:8090/publish?topic=<url фида>"
+
+Тело подписывается X-Hub-Signature: sha256=<hmac> секретом подписчика.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import secrets
+
+import aiohttp
+from aiohttp import web
+
+# topic → {callback: secret}
+SUBSCRIBERS: dict[str, dict[str, str]] = {}
+
+
+async def verify_intent(mode: str, topic: str, callback: str, lease: str) -> bool:
+    challenge = secrets.token_hex(8)
+    params = {"hub.mode": mode, "hub.topic": topic, "hub.challenge": challenge}
+    if mode == "subscribe":
+        params["hub.lease_seconds"] = lease
+    async with aiohttp.ClientSession() as session:
+        async with session.get(callback, params=params) as resp:
+            return resp.status == 200 and (await resp.text()) == challenge
+
+
+async def handle_subscribe(request: web.Request) -> web.Response:
+    form = await request.post()
+    mode = form.get("hub.mode")
+    topic = form.get("hub.topic")
+    callback = form.get("hub.callback")
+    if mode not in ("subscribe", "unsubscribe") or not topic or not callback:
+        return web.Response(status=400, text="bad request")
+
+    async def confirm():
+        if not await verify_intent(mode, topic, callback, form.get("hub.lease_seconds", "86400")):
+            print(f"hub: {mode} not confirmed by {callback}")
+            return
+        if mode == "subscribe":
+            SUBSCRIBERS.setdefault(topic, {})[callback] = form.get("hub.secret", "")
+        else:
+            SUBSCRIBERS.get(topic, {}).pop(callback, None)
+        print(f"hub: {mode} {topic} -> {callback}")
+
+    # Как настоящий hub: 202 сразу, подтверждение асинхронно
+    task = asyncio.create_task(confirm())
+    request.app["tasks"].add(task)
+    task.add_done_callback(request.app["tasks"].discard)
+    return web.Response(status=202)
+
+
+async def handle_publish(request: web.Request) -> web.Response:
+    topic = request.query.get("topic")
+    body = await request.read()
+    delivered = 0
+    async with aiohttp.ClientSession() as session:
+        for callback, secret in SUBSCRIBERS.get(topic, {}).items():
+            headers = {"Content-Type": request.content_type or "application/atom+xml"}
+            if secret:
+                signature = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+                headers["X-Hub-Signature"] = f"sha256={signature}"
+            async with session.post(callback, data=body, headers=headers) as resp:
+                print(f"hub: pushed {len(body)} bytes to {callback}: HTTP {resp.status}")
+                delivered += 1
+    return web.json_response({"topic": topic, "delivered": delivered})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local WebSub hub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    args = parser.parse_args()
+
+    app = web.Application()
+    app["tasks"] = set()
+    app.router.add_post("/", handle_subscribe)
+    app.router.add_post("/publish", handle_publish)
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()